@@ -0,0 +1,158 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Priority classes. Each has its own pool of concurrency slots and a
+# bounded queue, so a burst of expensive requests in one class cannot take
+# the workers and database connections the others need.
+WRITES = "writes"
+READS = "reads"
+SCANS = "scans"
+STREAMS = "streams"
+
+# class -> slot pool settings, plus the rate limit tokens a request costs.
+DEFAULT_CLASSES = {
+    WRITES: {"slots": 8, "queue_depth": 32, "queue_timeout": 5.0, "retry_after": 1, "cost": 1},
+    READS: {"slots": 8, "queue_depth": 32, "queue_timeout": 2.0, "retry_after": 1, "cost": 1},
+    SCANS: {"slots": 2, "queue_depth": 4, "queue_timeout": 1.0, "retry_after": 5, "cost": 10},
+    STREAMS: {"slots": 16, "queue_depth": 0, "queue_timeout": 0.0, "retry_after": 30, "cost": 1},
+}
+
+
+class Rejected(Exception):
+    def __init__(self, status, message, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+class SlotPool:
+    # At most `slots` requests at once; up to `queue_depth` more wait (in
+    # arrival order) for at most `queue_timeout` seconds. Anything beyond
+    # that is shed straight away rather than left to time out later.
+    def __init__(self, name, slots, queue_depth=0, queue_timeout=0.0, retry_after=1):
+        if slots < 1 or queue_depth < 0:
+            raise ValueError("A slot pool needs slots >= 1 and queue_depth >= 0")
+        self.name = name
+        self.slots = slots
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_use = 0
+        self.waiting = 0
+        self._available = threading.Condition()
+        self._stats = {"admitted": 0, "queued": 0, "queue_full": 0, "timeout": 0, "wait_seconds_total": 0.0}
+
+    def acquire(self):
+        with self._available:
+            # Newcomers do not overtake queued requests for a freed slot.
+            if self.in_use < self.slots and not self.waiting:
+                self.in_use += 1
+                self._stats["admitted"] += 1
+                return
+            if self.waiting >= self.queue_depth:
+                self._stats["queue_full"] += 1
+                raise Rejected(503, f"Too many {self.name} requests in progress, please retry", self.retry_after)
+
+            self.waiting += 1
+            self._stats["queued"] += 1
+            started = time.monotonic()
+            deadline = started + self.queue_timeout
+            try:
+                while self.in_use >= self.slots:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeout"] += 1
+                        raise Rejected(
+                            503, f"Too many {self.name} requests in progress, please retry", self.retry_after
+                        )
+                    self._available.wait(remaining)
+            finally:
+                self.waiting -= 1
+                self._stats["wait_seconds_total"] += time.monotonic() - started
+            self.in_use += 1
+            self._stats["admitted"] += 1
+
+    def release(self):
+        with self._available:
+            self.in_use -= 1
+            self._available.notify()
+
+    def stats(self):
+        with self._available:
+            stats = dict(self._stats)
+            stats.update({
+                "slots": self.slots,
+                "queue_depth": self.queue_depth,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+            })
+        return stats
+
+
+class RateLimiter:
+    # A token bucket per client: `rate` tokens a second, holding at most
+    # `burst`. Only the `max_clients` most recently seen clients are
+    # tracked; a forgotten client starts again with a full bucket.
+    def __init__(self, rate, burst, max_clients=10000, clock=time.monotonic):
+        if rate <= 0 or burst < 1:
+            raise ValueError("A rate limit needs rate > 0 and burst >= 1")
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client, cost=1):
+        # Returns 0 when the request may go ahead, otherwise the seconds
+        # until the bucket holds enough tokens for it.
+        cost = min(cost, self.burst)
+        with self._lock:
+            now = self.clock()
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionControl:
+    def __init__(self, classes=None, rate=None, burst=None):
+        classes = DEFAULT_CLASSES if classes is None else classes
+        self.pools = {}
+        self.costs = {}
+        for name, settings in classes.items():
+            settings = dict(settings)
+            self.costs[name] = settings.pop("cost", 1)
+            self.pools[name] = SlotPool(name, **settings)
+        self.limiter = RateLimiter(rate, burst or max(1, math.ceil(rate))) if rate else None
+        self._rate_limited = dict.fromkeys(self.pools, 0)
+        self._lock = threading.Lock()
+
+    def admit(self, name, client):
+        # Returns the slot pool to release once the request is done, or
+        # raises Rejected: 429 when the client is over its rate limit, 503
+        # when the class is at capacity.
+        pool = self.pools[name]
+        if self.limiter is not None:
+            wait = self.limiter.take(client, self.costs[name])
+            if wait:
+                with self._lock:
+                    self._rate_limited[name] += 1
+                raise Rejected(429, "Rate limit exceeded, please retry later", math.ceil(wait))
+        pool.acquire()
+        return pool
+
+    def stats(self):
+        with self._lock:
+            rate_limited = dict(self._rate_limited)
+        return {name: dict(pool.stats(), rate_limited=rate_limited[name]) for name, pool in self.pools.items()}
@@ -0,0 +1,268 @@
+import math
+import os
+import threading
+import time
+from decimal import Decimal
+
+import numpy as np
+
+import balances
+import cash_flows
+
+# Per-client transaction features, kept in flat NumPy arrays (one row per
+# client) and updated incrementally as transactions are written:
+# - an exponentially weighted mean and variance of the amount, i.e. a
+#   rolling window of roughly the last 1 / ALPHA transactions
+# - an exponentially weighted mean of the days between transactions
+# - a count of transactions per product
+#
+# A transaction is scored against its client's features before they are
+# updated with it:
+#     score = |amount - mean| / std                  (how unusual the amount is)
+#           + NOVELTY_WEIGHT * (1 - product share)   (1 for a product never used)
+#           + BURST_WEIGHT * log2(usual gap / gap)   (when faster than usual)
+# Clients with fewer than MIN_HISTORY earlier transactions get no score.
+ALPHA = 0.1
+MIN_HISTORY = 5
+THRESHOLD = 6.0
+NOVELTY_WEIGHT = 2.0
+BURST_WEIGHT = 0.5
+
+# Transaction_Scores is created by migration 0005.
+UPSERT_SCORE = (
+    "INSERT INTO Transaction_Scores (Transaction_ID, Client_ID, Score, Flagged) VALUES (%s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE Client_ID = VALUES(Client_ID), Score = VALUES(Score), Flagged = VALUES(Flagged)"
+)
+
+
+def batch_arrays(rows):
+    # (transaction_id, client_id, product_id, amount, date) rows as arrays;
+    # dates become day numbers. Raises ValueError for unparseable values.
+    count = len(rows)
+    ids, clients, products, amounts, dates = zip(*rows) if rows else ((),) * 5
+    return (
+        np.fromiter((int(value) for value in ids), np.int64, count),
+        np.fromiter((int(value) for value in clients), np.int64, count),
+        np.fromiter((int(value) for value in products), np.int64, count),
+        np.fromiter((float(Decimal(str(value))) for value in amounts), np.float64, count),
+        np.array([cash_flows.as_date(value) for value in dates], dtype="datetime64[D]").astype(np.int64),
+    )
+
+
+def scores_for(count, mean, var, last_day, gap, product_count, amounts, days):
+    std = np.maximum(np.sqrt(var), np.maximum(0.01 * np.abs(mean), 0.01))
+    unusual = np.abs(amounts - mean) / std
+    novelty = 1.0 - product_count / np.maximum(count, 1)
+    interval = np.maximum(days - last_day, 0.5)
+    burst = np.where(count >= 2, np.clip(np.log2(np.maximum(gap, 0.5) / interval), 0, None), 0.0)
+    scores = unusual + NOVELTY_WEIGHT * novelty + BURST_WEIGHT * burst
+    return np.where(count >= MIN_HISTORY, scores, np.nan)
+
+
+class FeatureStore:
+    # Client features as parallel arrays indexed by a row number; roughly
+    # 48 bytes per client plus 4 bytes per client and product.
+    def __init__(self, capacity=1024):
+        self._rows = {}
+        self._columns = {}
+        self.client_ids = np.zeros(capacity, np.int64)
+        self.count = np.zeros(capacity, np.int64)
+        self.mean = np.zeros(capacity)
+        self.var = np.zeros(capacity)
+        self.last_day = np.zeros(capacity, np.int64)
+        self.gap = np.zeros(capacity)
+        self.product_ids = np.zeros(0, np.int64)
+        self.products = np.zeros((capacity, 0), np.int32)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _grow(self, rows, columns):
+        capacity = len(self.count)
+        if rows > capacity:
+            capacity = max(rows, capacity * 2)
+            for name in ("client_ids", "count", "mean", "var", "last_day", "gap"):
+                values = getattr(self, name)
+                grown = np.zeros(capacity, values.dtype)
+                grown[:len(values)] = values
+                setattr(self, name, grown)
+        if capacity != len(self.products) or columns > self.products.shape[1]:
+            grown = np.zeros((capacity, max(columns, self.products.shape[1])), np.int32)
+            grown[:len(self.products), :self.products.shape[1]] = self.products
+            self.products = grown
+
+    def _indexes(self, mapping, keys):
+        # Row (or column) numbers for keys, assigning new ones as needed.
+        unique, inverse = np.unique(keys, return_inverse=True)
+        numbers = np.empty(len(unique), np.int64)
+        for i, key in enumerate(unique.tolist()):
+            number = mapping.get(key)
+            if number is None:
+                number = mapping[key] = len(mapping)
+            numbers[i] = number
+        return numbers[inverse], unique
+
+    def evaluate(self, client_ids, product_ids, amounts, days, update=False):
+        # Scores each transaction in input order against the features as
+        # they stand before it (earlier transactions of the same batch
+        # included). Transactions of different clients are independent, so
+        # the batch runs in rounds: round r holds the r-th transaction of
+        # every client and is scored and applied as one vector operation.
+        with self._lock:
+            rows, _ = self._indexes(self._rows, client_ids)
+            columns, products = self._indexes(self._columns, product_ids)
+            self._grow(len(self._rows), len(self._columns))
+            self.client_ids[rows] = client_ids
+            if len(self.product_ids) < len(self._columns):
+                self.product_ids = np.array(sorted(self._columns, key=self._columns.get), np.int64)
+
+            touched, local = np.unique(rows, return_inverse=True)
+            count, mean, var = self.count[touched], self.mean[touched], self.var[touched]
+            last_day, gap = self.last_day[touched], self.gap[touched]
+            mix = self.products[touched]
+
+            total = len(rows)
+            order = np.argsort(local, kind="stable")
+            starts = np.flatnonzero(np.r_[True, local[order][1:] != local[order][:-1]])
+            rank = np.empty(total, np.int64)
+            rank[order] = np.arange(total) - np.repeat(starts, np.diff(np.r_[starts, total]))
+            by_round = np.argsort(rank, kind="stable")
+            bounds = np.searchsorted(rank[by_round], np.arange(rank.max() + 2 if total else 1))
+
+            scores = np.full(total, np.nan)
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                batch = by_round[start:end]
+                who, column = local[batch], columns[batch]
+                x, day = amounts[batch], days[batch]
+                scores[batch] = scores_for(
+                    count[who], mean[who], var[who], last_day[who], gap[who], mix[who, column], x, day
+                )
+
+                weight = np.maximum(ALPHA, 1.0 / (count[who] + 1))
+                diff = x - mean[who]
+                increment = weight * diff
+                mean[who] += increment
+                var[who] = (1 - weight) * (var[who] + diff * increment)
+                interval = np.maximum(day - last_day[who], 0)
+                gap[who] = np.where(count[who] == 1, interval, gap[who] + ALPHA * (interval - gap[who]))
+                last_day[who] = np.where(count[who] == 0, day, np.maximum(last_day[who], day))
+                mix[who, column] += 1
+                count[who] += 1
+
+            if update:
+                self.count[touched], self.mean[touched], self.var[touched] = count, mean, var
+                self.last_day[touched], self.gap[touched] = last_day, gap
+                self.products[touched] = mix
+        return scores
+
+    def save(self, path):
+        # Written next to the target and renamed, so readers never see a
+        # partial file.
+        size = len(self._rows)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(
+                f, client_ids=self.client_ids[:size], count=self.count[:size], mean=self.mean[:size],
+                var=self.var[:size], last_day=self.last_day[:size], gap=self.gap[:size],
+                product_ids=self.product_ids, products=self.products[:size, :len(self.product_ids)]
+            )
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            size = len(data["client_ids"])
+            store = cls(max(size, 1024))
+            store._rows = {client_id: row for row, client_id in enumerate(data["client_ids"].tolist())}
+            store._columns = {product_id: column for column, product_id in enumerate(data["product_ids"].tolist())}
+            for name in ("client_ids", "count", "mean", "var", "last_day", "gap"):
+                getattr(store, name)[:size] = data[name]
+            store.product_ids = data["product_ids"]
+            store.products = np.zeros((len(store.count), len(store.product_ids)), np.int32)
+            store.products[:size] = data["products"]
+        return store
+
+
+def flagged(scores, threshold):
+    return np.nan_to_num(scores, nan=-np.inf) >= threshold
+
+
+def score_rows(ids, client_ids, scores, flags):
+    return [
+        (transaction_id, client_id, None if math.isnan(score) else round(score, 4), int(flag))
+        for transaction_id, client_id, score, flag in zip(
+            ids.tolist(), client_ids.tolist(), scores.tolist(), flags.tolist()
+        )
+    ]
+
+
+class Scorer:
+    # The write path's view of the features: loaded from the file written by
+    # rescore (and reloaded whenever that file changes), then kept current
+    # with the writes made through this process.
+    def __init__(self, path, threshold=THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.store = FeatureStore()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _current(self):
+        try:
+            version = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            version = None
+        with self._lock:
+            if version != self._version and version is not None:
+                self.store = FeatureStore.load(self.path)
+            self._version = version
+            return self.store
+
+    def score(self, cursor, rows):
+        # Scores rows and stores the results with the caller's transaction.
+        ids, client_ids, product_ids, amounts, days = batch_arrays(rows)
+        scores = self._current().evaluate(client_ids, product_ids, amounts, days)
+        flags = flagged(scores, self.threshold)
+        cursor.executemany(UPSERT_SCORE, score_rows(ids, client_ids, scores, flags))
+        return scores, flags
+
+    def record(self, rows):
+        # Folds committed rows into the features.
+        _, client_ids, product_ids, amounts, days = batch_arrays(rows)
+        self._current().evaluate(client_ids, product_ids, amounts, days, update=True)
+
+
+def rescore(conn, path=None, batch_size=10000, threshold=THRESHOLD, write=True, echo=print):
+    # Recomputes every client's features from its full history, in date
+    # order, and (unless write is False) replaces the stored scores one
+    # client range at a time. The features are saved to path for Scorer.
+    cursor = conn.cursor()
+    store = FeatureStore()
+    total = flagged_total = 0
+    started = time.perf_counter()
+    for first_id, last_id in balances.client_batches(conn.cursor(), batch_size):
+        cursor.execute(
+            "SELECT Transaction_ID, Client_ID, Product_ID, Transaction_Amount, Transaction_Date FROM Transactions "
+            "WHERE Client_ID BETWEEN %s AND %s ORDER BY Client_ID, Transaction_Date, Transaction_ID",
+            (first_id, last_id)
+        )
+        rows = cursor.fetchall()
+        ids, client_ids, product_ids, amounts, days = batch_arrays(rows)
+        scores = store.evaluate(client_ids, product_ids, amounts, days, update=True)
+        flags = flagged(scores, threshold)
+        if write:
+            cursor.execute("DELETE FROM Transaction_Scores WHERE Client_ID BETWEEN %s AND %s", (first_id, last_id))
+            cursor.executemany(UPSERT_SCORE, score_rows(ids, client_ids, scores, flags))
+            conn.commit()
+        total += len(rows)
+        flagged_total += int(flags.sum())
+        echo(f"Scored clients {first_id}..{last_id}: {len(rows)} transactions, {int(flags.sum())} flagged")
+    if not write:
+        conn.rollback()
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        store.save(path)
+    elapsed = time.perf_counter() - started
+    echo(f"Done: {total} transactions scored, {flagged_total} flagged, "
+         f"{total / elapsed * 60 if elapsed else 0:.0f} per minute")
+    return total, flagged_total
@@ -1,388 +1,1661 @@
-from flask import Flask, request, jsonify, abort
-from flask_mysqldb import MySQL
+import csv
+import functools
+import hashlib
+import io
+import os
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import click
+from flask import Flask, Response, g, has_request_context, request, jsonify, abort, send_file, stream_with_context
+from flask.cli import AppGroup
+
+import admission
+import anomaly
+import balances
+import cache
+import cash_flows
+import changes
+import db
+import idempotency
+import jobs
+import metrics
+import resources
+import schema
+import search
+import serialization
+import snapshots
 
 app = Flask(__name__)
-app.config["MYSQL_HOST"] = "localhost"
-app.config["MYSQL_USER"] = "root"
-app.config["MYSQL_PASSWORD"] = "root"
-app.config["MYSQL_DB"] = "mini_private_banking" 
-mysql = MySQL(app)
+app.json = metrics.TimedJSONProvider(app)
+# When enabled, write handlers re-read the row after committing and deletes
+# check for the row first, instead of trusting the payload and rowcount.
+app.config["STRICT_CONSISTENCY"] = False
+app.config["BULK_BATCH_SIZE"] = 1000
+app.config["BULK_MAX_RECORDS"] = 100000
+app.config["REFERENCE_CACHE_TTL"] = 300
+app.config["REFERENCE_CACHE_MAX_ENTRIES"] = 1024
+app.config["REPORT_CACHE_TTL"] = 60
+app.config["REPORT_CACHE_MAX_ENTRIES"] = 1024
+app.config["REPORT_MAX_GROUPS"] = 10000
+# Statements slower than this many seconds are logged to the
+# "private_banking.slow_queries" logger with their parameters redacted.
+# None disables the log.
+app.config["SLOW_QUERY_SECONDS"] = None
+# Run EXPLAIN on the hot statements at startup and log a warning for each
+# one that misses its expected index.
+app.config["CHECK_INDEXES_ON_STARTUP"] = True
+app.config["IDEMPOTENCY_TTL"] = 86400
+app.config["IDEMPOTENCY_MAX_ENTRIES"] = 10000
+# Once the client search index is older than this many seconds, the client
+# changes other processes have logged since are applied to it in the
+# background. Only changed clients are read, not the whole table.
+app.config["CLIENT_SEARCH_MAX_AGE"] = 300
+app.config["CLIENT_SEARCH_BATCH_SIZE"] = 10000
+# Most recent transactions embedded per client by ?expand=transactions.
+app.config["EXPAND_TRANSACTIONS_LIMIT"] = 10
+app.config["BATCH_GET_MAX_IDS"] = 1000
+# Background jobs: state and result files live under JOBS_DIR, at most
+# JOBS_MAX_WORKERS jobs run at once, and finished jobs are deleted after
+# JOBS_RETENTION_SECONDS.
+app.config["JOBS_DIR"] = os.path.join(app.instance_path, "jobs")
+app.config["JOBS_MAX_WORKERS"] = 2
+app.config["JOBS_RETENTION_SECONDS"] = 7 * 86400
+# Columnar copies of the ledger for analytics, written by
+# 'flask snapshot dump' and read by /snapshots/reports/transactions.
+app.config["SNAPSHOT_DIR"] = os.path.join(app.instance_path, "snapshots")
+# Client features for anomaly scoring, written by 'flask anomaly rescore'.
+# Transactions scoring at or above the threshold are flagged.
+app.config["ANOMALY_FEATURES_PATH"] = os.path.join(app.instance_path, "anomaly", "features.npz")
+app.config["ANOMALY_THRESHOLD"] = anomaly.THRESHOLD
+# With read replicas configured, a client's reads go to the primary after
+# its own writes until the replicas are known to have applied them.
+app.config["READ_YOUR_WRITES"] = True
+# Change feed (GET /changes and /changes/stream). Streams are closed after
+# CHANGES_STREAM_SECONDS (clients reconnect with Last-Event-ID) and send a
+# keep-alive comment when idle for CHANGES_HEARTBEAT_SECONDS.
+app.config["CHANGES_SETTLE_SECONDS"] = changes.SETTLE_SECONDS
+app.config["CHANGES_POLL_SECONDS"] = 1.0
+app.config["CHANGES_STREAM_SECONDS"] = 300
+app.config["CHANGES_HEARTBEAT_SECONDS"] = 15
+# Admission control: each route belongs to a priority class (see
+# admission.DEFAULT_CLASSES) with its own concurrency slots and queue.
+# With RATE_LIMIT_PER_SECOND set, each client (by the
+# ADMISSION_CLIENT_HEADER header, or else its address) also gets a token
+# bucket of RATE_LIMIT_BURST tokens refilled at that rate.
+app.config["ADMISSION_CLASSES"] = admission.DEFAULT_CLASSES
+app.config["RATE_LIMIT_PER_SECOND"] = None
+app.config["RATE_LIMIT_BURST"] = None
+app.config["ADMISSION_CLIENT_HEADER"] = None
+
+# Connection settings come from the MYSQL_* environment variables.
+pool = db.ConnectionPool.from_env()
+# Read replicas from MYSQL_REPLICAS, or None to read from the primary.
+replicas = db.ReplicaSet.from_env()
+# Products and employees rarely change, so their reads are cached and every
+# write to them invalidates the affected entries. Pass backend= to share the
+# cache between worker processes. Sized from app.config by configure().
+reference_cache = cache.Cache()
+# Aggregates are not invalidated per write; they are served for up to
+# REPORT_CACHE_TTL seconds after being computed.
+report_cache = cache.Cache()
+request_metrics = metrics.RequestMetrics()
+# Responses to POST/PUT requests sent with an Idempotency-Key header. Pass
+# backend= to share them between worker processes. Sized from app.config by
+# configure().
+idempotency_store = idempotency.IdempotencyStore()
+# In-process prefix index over client names, emails and phone numbers.
+client_index = search.PrefixIndex()
+client_index_maintenance = threading.Lock()
+anomaly_scorer = anomaly.Scorer(app.config["ANOMALY_FEATURES_PATH"])
+# Built by configure() from ADMISSION_CLASSES and the RATE_LIMIT_* settings.
+admission_control = None
+# Tails the change log for the /changes/stream subscribers of this process.
+change_feed = changes.ChangeFeed(pool)
+# Reports and exports run in separate processes with their own database
+# connections, outside the request threads. Built from the JOBS_* settings
+# and started by configure(), which requeues the jobs an earlier process
+# left queued or orphaned. JOBS_MAX_WORKERS bounds this process's pool
+# only; each server process has its own.
+job_queue = None
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+EXPORT_FETCH_SIZE = 1000
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+# Column lists of the registered resources (see resources.py).
+EMPLOYEE_COLUMNS = resources.EMPLOYEES.columns
+CLIENT_COLUMNS = resources.CLIENTS.columns
+PRODUCT_COLUMNS = resources.PRODUCTS.columns
+TRANSACTION_COLUMNS = resources.TRANSACTIONS.columns
+SCORE_COLUMNS = ["Transaction_ID", "Score", "Flagged", "Scored_At"]
+SCORE_FIELDS = ["transaction_ID", "score", "flagged", "scored_At"]
+
+employee_rows = resources.EMPLOYEES.rows
+client_rows = resources.CLIENTS.rows
+product_rows = resources.PRODUCTS.rows
+transaction_rows = resources.TRANSACTIONS.rows
+transaction_score_rows = serialization.RowMapper(SCORE_FIELDS)
+
+_configured = False
+_configure_lock = threading.Lock()
+
+def configure():
+    # Builds the helpers that depend on app.config. Runs once per process,
+    # before its first request or from the entry points below, so settings
+    # changed after this module is imported still take effect.
+    global _configured, admission_control, job_queue
+    if _configured:
+        return
+    with _configure_lock:
+        if _configured:
+            return
+        reference_cache.configure(app.config["REFERENCE_CACHE_MAX_ENTRIES"], app.config["REFERENCE_CACHE_TTL"])
+        report_cache.configure(app.config["REPORT_CACHE_MAX_ENTRIES"], app.config["REPORT_CACHE_TTL"])
+        idempotency_store.configure(app.config["IDEMPOTENCY_MAX_ENTRIES"], app.config["IDEMPOTENCY_TTL"])
+        client_index.max_age = app.config["CLIENT_SEARCH_MAX_AGE"]
+        change_feed.settle_seconds = app.config["CHANGES_SETTLE_SECONDS"]
+        change_feed.poll_seconds = app.config["CHANGES_POLL_SECONDS"]
+        anomaly_scorer.path = app.config["ANOMALY_FEATURES_PATH"]
+        anomaly_scorer.threshold = app.config["ANOMALY_THRESHOLD"]
+        if admission_control is None:
+            admission_control = admission.AdmissionControl(
+                app.config["ADMISSION_CLASSES"], app.config["RATE_LIMIT_PER_SECOND"], app.config["RATE_LIMIT_BURST"]
+            )
+        if job_queue is None:
+            job_queue = jobs.JobQueue(
+                os.path.join(app.config["JOBS_DIR"], "jobs.sqlite3"), os.path.join(app.config["JOBS_DIR"], "results"),
+                db.settings_from_env(), app.config["JOBS_MAX_WORKERS"]
+            )
+        try:
+            job_queue.start()
+        except Exception:
+            # POST /jobs starts the queue again before submitting.
+            app.logger.exception("Starting the job queue failed")
+        check_indexes()
+        _configured = True
 
 def handle_error(error_msg, status_code):
     return jsonify({"error": error_msg}), status_code
 
+def request_stats():
+    if "request_stats" not in g:
+        g.request_stats = metrics.RequestStats(app.config["SLOW_QUERY_SECONDS"])
+    return g.request_stats
+
+def admission_class(name):
+    # Puts a route in an admission control class (None to exempt it).
+    # Routes without one are reads or writes according to reads_only().
+    def decorator(view):
+        view.admission_class = name
+        return view
+    return decorator
+
+def read_only(view):
+    # Marks a POST route that only reads, so it can use a replica.
+    view.read_only = True
+    return view
+
+def reads_only():
+    if request.method in ("GET", "HEAD"):
+        return True
+    return getattr(app.view_functions.get(request.endpoint), "read_only", False)
+
+def last_write_time():
+    # When this client last wrote, from the cookie set on write responses
+    # (or the same value sent back in an X-Last-Write header).
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+def replica_connection():
+    # (replica, connection) when this request may read from a replica,
+    # otherwise (None, None).
+    if replicas is None or not has_request_context() or g.get("read_primary") or not reads_only():
+        return None, None
+    written_at = last_write_time() if app.config["READ_YOUR_WRITES"] else None
+    return replicas.acquire(written_at)
+
+def get_db():
+    # One pooled connection per app context, returned at teardown. It is
+    # wrapped so every statement is counted and timed for /metrics. Reads
+    # may be served from a replica; writes always use the primary.
+    if "db" not in g:
+        stats = request_stats()
+        started = time.perf_counter()
+        replica, conn = replica_connection()
+        if conn is None:
+            replica, conn = None, pool.acquire()
+        stats.wait_seconds += time.perf_counter() - started
+        g.db_pool = pool if replica is None else replica.pool
+        g.db = metrics.InstrumentedConnection(conn, stats)
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    conn = g.pop("db", None)
+    if conn is not None:
+        g.pop("db_pool", pool).release(conn.raw)
+
+@app.before_request
+def configure_on_first_request():
+    configure()
+
+@app.before_request
+def start_request_stats():
+    request_stats()
+
+@app.before_request
+def admit_request():
+    view = app.view_functions.get(request.endpoint)
+    if view is None:
+        return None
+    name = getattr(view, "admission_class", admission.READS if reads_only() else admission.WRITES)
+    if name is None:
+        return None
+    header = app.config["ADMISSION_CLIENT_HEADER"]
+    client = (request.headers.get(header) if header else None) or request.remote_addr
+    try:
+        g.admission_slot = admission_control.admit(name, client)
+    except admission.Rejected as rejected:
+        response, status = handle_error(rejected.message, rejected.status)
+        response.headers["Retry-After"] = str(rejected.retry_after)
+        return response, status
+    return None
+
+@app.teardown_request
+def release_admission_slot(exception):
+    # Like the request metrics, runs once a streamed body has been sent.
+    slot_pool = g.pop("admission_slot", None)
+    if slot_pool is not None:
+        slot_pool.release()
+
+@app.after_request
+def record_status(response):
+    request_stats().status = response.status_code
+    return response
+
+@app.after_request
+def remember_write(response):
+    if (replicas is not None and app.config["READ_YOUR_WRITES"] and not reads_only()
+            and response.status_code < 400):
+        written_at = f"{time.time():.3f}"
+        response.headers[LAST_WRITE_HEADER] = written_at
+        response.set_cookie(
+            LAST_WRITE_COOKIE, written_at, max_age=replicas.catch_up_seconds(), httponly=True, samesite="Lax"
+        )
+    return response
+
+@app.teardown_request
+def record_request_metrics(exception):
+    # Runs after a streamed body has been fully sent, so exports are timed
+    # end to end.
+    stats = g.pop("request_stats", None)
+    if stats is not None:
+        rule = request.url_rule
+        request_metrics.record(rule.rule if rule is not None else "unmatched", request.method, stats)
+
+@app.errorhandler(db.PoolTimeout)
+def pool_timeout(error):
+    response, status = handle_error("Database is busy, please retry", 503)
+    response.headers["Retry-After"] = "1"
+    return response, status
+
+@app.errorhandler(400)
+def bad_request(error):
+    return handle_error(error.description, 400)
+
+@app.errorhandler(413)
+def payload_too_large(error):
+    return handle_error(error.description, 413)
+
+def query_arg(name, convert, args=None):
+    value = (request.args if args is None else args).get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return convert(value)
+    except (ValueError, ArithmeticError):
+        abort(400, f"Invalid value for '{name}'")
+
+def page_args(args=None):
+    after = query_arg("after", int, args)
+    limit = query_arg("limit", int, args)
+    if limit is None:
+        limit = DEFAULT_PAGE_LIMIT
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        abort(400, f"'limit' must be between 1 and {MAX_PAGE_LIMIT}")
+    return after, limit
+
+def split_page(rows, limit):
+    # Pages are fetched with limit + 1 rows; the extra row only signals that
+    # another page exists.
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1][0]
+    return rows, next_cursor
+
+def export_requested():
+    export_format = request.args.get("format")
+    if export_format in (None, "", "json"):
+        return False
+    if export_format not in EXPORT_FORMATS:
+        abort(400, f"Unsupported format '{export_format}'")
+    return True
+
+def csv_chunks(cursor, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    while True:
+        rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+        if rows:
+            writer.writerows(rows)
+        if buffer.tell():
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if not rows:
+            return
+
+def export_response(resource, conditions=None, params=None):
+    # Streams every matching row through an unbuffered server-side cursor so
+    # memory stays bounded by EXPORT_FETCH_SIZE regardless of table size.
+    export_format = request.args["format"]
+    sql, params = resource.list_query(conditions, params, query_arg("after", int))
+
+    def generate():
+        cursor = db.server_side_cursor(get_db())
+        try:
+            cursor.execute(sql, params)
+            if export_format == "csv":
+                yield from csv_chunks(cursor, resource.fields)
+            else:
+                while True:
+                    rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                    if not rows:
+                        break
+                    yield b"".join(
+                        serialization.dumps_bytes(item) + b"\n" for item in resource.rows.map(rows, cursor)
+                    )
+        finally:
+            cursor.close()
+
+    return Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[export_format])
+
+def score_transactions(cursor, rows):
+    # Stores anomaly scores for (transaction_id, client_id, product_id,
+    # amount, date) rows in the caller's database transaction. Rows the
+    # scorer cannot parse are left unscored rather than failing the write.
+    try:
+        anomaly_scorer.score(cursor, rows)
+    except (ValueError, ArithmeticError):
+        return False
+    return True
+
+def record_transactions(rows):
+    # Folds committed transactions into the client features.
+    try:
+        anomaly_scorer.record(rows)
+    except (ValueError, ArithmeticError):
+        pass
+
+def log_changes(cursor, resource, action, fields, rows):
+    # Appends written rows to the change log in the caller's database
+    # transaction.
+    changes.record(cursor, resource, action, [(row[0], dict(zip(fields, row))) for row in rows])
+
+def bulk_records():
+    if request.mimetype == "application/x-ndjson":
+        records = []
+        for number, line in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(app.json.loads(line))
+            except ValueError:
+                abort(400, f"Invalid JSON on line {number}")
+        return records
+
+    records = request.get_json()
+    if not isinstance(records, list):
+        abort(400, "Expected a JSON array of records")
+    return records
+
+def execute(sql, params):
+    # Runs one of the resource registry's prebuilt statements.
+    cursor = get_db().cursor()
+    cursor.execute(sql, params)
+    return cursor
+
+def commit_write(resource, write, before_commit=None, after_commit=None):
+    # Hooks that must land in the write's database transaction (derived
+    # totals, scores) run before the change log entry and the commit;
+    # reference cache invalidation and hooks that only make sense for
+    # committed rows (in-process indexes) run after.
+    conn = get_db()
+    cursor = conn.cursor()
+    if before_commit:
+        before_commit(cursor, write)
+    if resource.change_log:
+        if write.action == changes.DELETED:
+            changes.record(cursor, resource.name, write.action, [(key, None) for key in write.keys])
+        else:
+            log_changes(cursor, resource.name, write.action, resource.fields, write.rows)
+    conn.commit()
+    if resource.cached:
+        for key in write.keys:
+            reference_cache.invalidate(resource.name, key)
+    if after_commit:
+        after_commit(write)
+
+def bulk_insert(resource, before_commit=None, after_commit=None):
+    # Validates every record before touching the database, then writes them
+    # with multi-row INSERTs (executemany) inside a single transaction.
+    records = bulk_records()
+    if not records:
+        return handle_error("No records supplied", 400)
+    if len(records) > app.config["BULK_MAX_RECORDS"]:
+        return handle_error(f"At most {app.config['BULK_MAX_RECORDS']} records per request", 413)
+
+    batch_size = query_arg("batch_size", int) or app.config["BULK_BATCH_SIZE"]
+    if batch_size < 1:
+        abort(400, "'batch_size' must be positive")
+
+    rows, errors, seen_ids = [], [], set()
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors.append({"index": index, "error": "Record must be a JSON object"})
+            continue
+        row = resource.row(record)
+        missing = resource.missing(row)
+        if missing:
+            errors.append({"index": index, "error": "Missing required fields", "fields": missing})
+            continue
+        # Validated first: only a well-formed key can be checked for duplicates.
+        error = resource.invalid(row)
+        if error:
+            errors.append({"index": index, "error": error})
+            continue
+        if row[0] in seen_ids:
+            errors.append({"index": index, "error": f"Duplicate {resource.fields[0]} in request"})
+            continue
+        seen_ids.add(row[0])
+        rows.append(row)
+
+    if errors:
+        return jsonify({"error": "Invalid records", "errors": errors}), 400
+
+    conn = get_db()
+    cursor = conn.cursor()
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        try:
+            if resource.key_table is not None:
+                cursor.executemany(resource.claim_sql, [row[:1] for row in batch])
+            cursor.executemany(resource.insert_sql, batch)
+        except conn.IntegrityError as e:
+            conn.rollback()
+            return jsonify({
+                "error": "Batch rejected by the database; no records were inserted",
+                "batch": {"first_index": start, "last_index": start + len(batch) - 1},
+                "detail": str(e.args[-1]) if e.args else str(e)
+            }), 409
+    commit_write(
+        resource, resources.Write(changes.INSERTED, [row[0] for row in rows], rows, None),
+        before_commit, after_commit
+    )
+
+    return jsonify({"inserted": len(rows)}), 201
+
+def locked_row(resource, key_value):
+    # The old row is needed to reverse its effect on derived totals;
+    # FOR UPDATE holds it until the surrounding write commits.
+    return execute(resource.lock_sql, (key_value,)).fetchone()
+
+def written_row(resource, row):
+    # Responses are built from the validated payload; strict consistency
+    # costs an extra round-trip to echo back what the database stored.
+    if app.config["STRICT_CONSISTENCY"]:
+        return execute(resource.get_sql, (row[0],)).fetchone()
+    return row
+
+def idempotent(view):
+    # Replays the stored response when a request is retried with the same
+    # Idempotency-Key, without running the handler again. Reusing a key for
+    # a different request is a 422; retrying while the first attempt is
+    # still running is a 409. Server errors are not stored, so the request
+    # can be retried after them.
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > 255:
+            abort(400, "Idempotency-Key must be 1 to 255 characters")
+
+        # Stored under the key alone, so reusing it on another endpoint is
+        # caught by the fingerprint, which covers the method and path.
+        store_key = key
+        request_fingerprint = idempotency.fingerprint(request.method, request.path, request.get_data())
+        state, entry = idempotency_store.begin(store_key, request_fingerprint)
+        if state is not None:
+            if entry[1] != request_fingerprint:
+                return handle_error("Idempotency-Key was already used for a different request", 422)
+            if state == idempotency.PENDING:
+                response, status = handle_error("A request with this Idempotency-Key is in progress", 409)
+                response.headers["Retry-After"] = "1"
+                return response, status
+            status, body, mimetype = entry[2]
+            response = Response(body, status=status, mimetype=mimetype)
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+
+        try:
+            with idempotency_store.held(store_key, request_fingerprint):
+                response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            idempotency_store.abandon(store_key)
+            raise
+        if response.status_code >= 500:
+            idempotency_store.abandon(store_key)
+        else:
+            idempotency_store.complete(
+                store_key, request_fingerprint, (response.status_code, response.get_data(), response.mimetype)
+            )
+        return response
+    return wrapper
+
+def cached_response(namespace, store=None, reusable=False):
+    # Caches the serialized JSON body per path and query string and answers
+    # If-None-Match revalidation with 304 from the cached ETag. When
+    # reusable, clients and proxies may also reuse the response for the
+    # store's TTL without revalidating.
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.args.get("format") not in (None, "", "json"):
+                return view(*args, **kwargs)
+
+            cache_store = reference_cache if store is None else store
+            key = cache_store.list_key(namespace, request.full_path)
+            entry = cache_store.get(key)
+            if entry is None:
+                if store is None:
+                    # Reference entries live until a write invalidates them,
+                    # so they are filled from the primary: a lagging replica
+                    # could put back the row the write just replaced.
+                    g.read_primary = True
+                response, status = view(*args, **kwargs)
+                if status != 200:
+                    return response, status
+                body = response.get_data()
+                entry = (body, hashlib.sha1(body).hexdigest(), response.headers.get("X-Next-Cursor"))
+                cache_store.set(key, entry)
+
+            body, etag, next_cursor = entry
+            response = Response(body, mimetype="application/json")
+            response.set_etag(etag)
+            if reusable:
+                response.cache_control.max_age = cache_store.ttl
+            if next_cursor is not None:
+                response.headers["X-Next-Cursor"] = next_cursor
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+TRANSACTION_FILTERS = resources.TRANSACTIONS.filters
+DATE_RANGE_FILTERS = TRANSACTION_FILTERS[2:4]
+
+def query_filters(filters, args=None):
+    conditions, params = [], []
+    for arg, condition, convert in filters:
+        value = query_arg(arg, convert, args)
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    return conditions, params
+
+def page_response(items, next_cursor):
+    response = jsonify(items)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return response, 200
+
 @app.route("/")
+@admission_class(None)
 def hello_world():
     return "WELCOME TO PRIVATE BANKING DATABASE"
 
-
-@app.route("/employees")
-def get_employees():
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM Employees")
-    employees = cursor.fetchall()
-    if not employees:
-        return handle_error("No employees found", 404)
-    
-    employees_list = [
-        {
-            "employee_ID": employee[0], 
-            "name": employee[1]
-        }
-        for employee in employees
-    ]
-    
-    return jsonify(employees_list), 200
-
-@app.route("/clients")
-def get_clients():
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM Clients")
-    clients = cursor.fetchall()
-    if not clients:
-        return handle_error("No clients found", 404)
-
-    clients_list = [
-        {
-            "client_ID": client[0], 
-            "name": client[1], 
-            "email": client[2], 
-            "phone": client[3],
-            "client_Manager_Employee_ID": client[4]
-        }
-        for client in clients
-    ]
-    
-    return jsonify(clients_list), 200
-
-@app.route("/products")
-def get_products():
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM Products")
-    products = cursor.fetchall()
-    if not products:
-        return handle_error("No products found", 404)
-
-    products_list = [
-        {
-            "product_ID": product[0], 
-            "product_Type": product[1]
-        }
-        for product in products
-    ]
-    
-    return jsonify(products_list), 200
-
-@app.route("/transactions")
-def get_transactions():
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM Transactions")
-    transactions = cursor.fetchall()
-    if not transactions:
-        return handle_error("No transactions found", 404)
-
-    transactions_list = [
-        {
-            "transaction_ID": transaction[0],
-            "client_ID": transaction[1], 
-            "product_ID": transaction[2], 
-            "transaction_Amount": transaction[3], 
-            "transaction_Date": transaction[4]
-        }
-        for transaction in transactions
-    ]
-    
-    return jsonify(transactions_list), 200
-
-@app.route("/employees", methods=["POST"])
-def add_employee():
-    data = request.get_json()
-    employee_id = data.get('employee_ID')
-    name = data.get('name')
-    
-    if not employee_id or not name:
-        return handle_error("Employee ID and name are required", 400)
-    
-    cursor = mysql.connection.cursor()
-    cursor.execute("INSERT INTO Employees (Employee_ID, Name) VALUES (%s, %s)", (employee_id, name))
-    mysql.connection.commit()
-
-    cursor.execute("SELECT * FROM Employees WHERE Employee_ID = %s", (employee_id,))
-    employee = cursor.fetchone()
-
-    if not employee:
-        return handle_error("Failed to retrieve the added employee", 500)
-
-    return jsonify({
-        "employee_ID": employee[0], 
-        "name": employee[1]
-    }), 201
-
-@app.route("/clients", methods=["POST"])
-def add_client():
-    data = request.get_json()
-    client_id = data.get('client_ID')
-    name = data.get('name')
-    email = data.get('email')
-    phone = data.get('phone')
-    client_manager_employee_id = data.get('client_Manager_Employee_ID')
-
-    if not all([client_id, name, email, phone, client_manager_employee_id]):
-        return handle_error("Missing required fields", 400)
-    
-    cursor = mysql.connection.cursor()
-    cursor.execute(
-        "INSERT INTO Clients (Client_ID, Name, Email, Phone, Client_Manager_Employee_ID) VALUES (%s, %s, %s, %s, %s)", 
-        (client_id, name, email, phone, client_manager_employee_id)
+@app.route("/metrics")
+@admission_class(None)
+def get_metrics():
+    return Response(
+        request_metrics.render(
+            pool.stats(), replicas.stats() if replicas is not None else None, admission_control.stats()
+        ),
+        content_type="text/plain; version=0.0.4; charset=utf-8"
     )
-    mysql.connection.commit()
 
-    cursor.execute("SELECT * FROM Clients WHERE Client_ID = %s", (client_id,))
-    client = cursor.fetchone()
 
-    if not client:
-        return handle_error("Failed to retrieve the added client", 500)
+def expand_args(allowed):
+    expand = {part.strip() for part in request.args.get("expand", "").split(",") if part.strip()}
+    if expand - set(allowed):
+        abort(400, f"'expand' must be a comma-separated list of: {', '.join(allowed)}")
+    return expand
 
-    return jsonify({
-        "client_ID": client[0], 
-        "name": client[1], 
-        "email": client[2], 
-        "phone": client[3],
-        "client_Manager_Employee_ID": client[4]
-    }), 201
-
-@app.route("/products", methods=["POST"])
-def add_product():
-    data = request.get_json()
-    product_id = data.get('product_ID')
-    product_type = data.get('product_Type')
-
-    if not all([product_id, product_type]):
-        return handle_error("Missing required fields", 400)
-
-    cursor = mysql.connection.cursor()
+def items_by_id(cursor, table, columns, mapper, ids):
+    # One IN (...) query for every referenced row; returns {id: item}.
+    ids = sorted({record_id for record_id in ids if record_id is not None})
+    if not ids:
+        return {}
     cursor.execute(
-        "INSERT INTO Products (Product_ID, Product_Type) VALUES (%s, %s)", 
-        (product_id, product_type)
+        f"SELECT {', '.join(columns)} FROM {table} WHERE {columns[0]} IN ({', '.join(['%s'] * len(ids))})",
+        tuple(ids)
     )
-    mysql.connection.commit()
-
-    cursor.execute("SELECT * FROM Products WHERE Product_ID = %s", (product_id,))
-    product = cursor.fetchone()
-
-    if not product:
-        return handle_error("Failed to retrieve the added product", 500)
-
-    return jsonify({
-        "product_ID": product[0], 
-        "product_Type": product[1]
-    }), 201
-
-@app.route("/transactions", methods=["POST"])
-def add_transaction():
-    data = request.get_json()
-    transaction_id = data.get('transaction_ID')
-    client_id = data.get('client_ID')
-    product_id = data.get('product_ID')
-    transaction_amount = data.get('transaction_Amount')
-    transaction_date = data.get('transaction_Date')
-
-    if not all([transaction_id, client_id, product_id, transaction_amount, transaction_date]):
-        return handle_error("Missing required fields", 400)
-
-    cursor = mysql.connection.cursor()
+    rows = cursor.fetchall()
+    return {item[mapper.fields[0]]: item for item in mapper.map(rows, cursor)}
+
+def recent_transactions(cursor, client_ids, limit):
+    # The latest `limit` transactions of each client in one query, ranked
+    # per client with a window function.
+    client_ids = sorted(set(client_ids))
+    columns = ", ".join(TRANSACTION_COLUMNS)
     cursor.execute(
-        "INSERT INTO Transactions (Transaction_ID, Client_ID, Product_ID, Transaction_Amount, Transaction_Date) VALUES (%s, %s, %s, %s, %s)",
-        (transaction_id, client_id, product_id, transaction_amount, transaction_date)
+        f"SELECT {resources.TRANSACTIONS.select_list()} FROM ("
+        f"SELECT {columns}, ROW_NUMBER() OVER ("
+        "PARTITION BY Client_ID ORDER BY Transaction_Date DESC, Transaction_ID DESC"
+        ") AS Recent_Rank FROM Transactions "
+        f"WHERE Client_ID IN ({', '.join(['%s'] * len(client_ids))})"
+        ") AS ranked WHERE Recent_Rank <= %s ORDER BY Client_ID, Recent_Rank",
+        tuple(client_ids) + (limit,)
     )
-    mysql.connection.commit()
-
-    cursor.execute("SELECT * FROM Transactions WHERE Transaction_ID = %s", (transaction_id,))
-    transaction = cursor.fetchone()
-
-    if not transaction:
-        return handle_error("Failed to retrieve the added transaction", 500)
-
-    return jsonify({
-        "transaction_ID": transaction[0], 
-        "client_ID": transaction[1], 
-        "product_ID": transaction[2], 
-        "transaction_Amount": transaction[3], 
-        "transaction_Date": transaction[4]
-    }), 201
-
-@app.route("/employees/<int:employee_id>", methods=["PUT"])
-def update_employee(employee_id):
-    data = request.get_json()
-    name = data.get('name')
-
-    if not name:
-        return handle_error("Name is required", 400)
-
-    cursor = mysql.connection.cursor()
+    rows = cursor.fetchall()
+    by_client = {}
+    for item in transaction_rows.map(rows, cursor):
+        by_client.setdefault(item["client_ID"], []).append(item)
+    return by_client
+
+def expand_products(cursor, transactions):
+    products = items_by_id(cursor, "Products", PRODUCT_COLUMNS, product_rows, [
+        item["product_ID"] for item in transactions
+    ])
+    for item in transactions:
+        item["product"] = products.get(item["product_ID"])
+
+def expand_clients(cursor, clients, expand):
+    # Each expansion costs one query for the whole page.
+    if "product" in expand and "transactions" not in expand:
+        abort(400, "'product' can only be expanded together with 'transactions'")
+    if "manager" in expand:
+        managers = items_by_id(cursor, "Employees", EMPLOYEE_COLUMNS, employee_rows, [
+            item["client_Manager_Employee_ID"] for item in clients
+        ])
+        for item in clients:
+            item["manager"] = managers.get(item["client_Manager_Employee_ID"])
+    if "transactions" in expand:
+        transactions = recent_transactions(
+            cursor, [item["client_ID"] for item in clients], app.config["EXPAND_TRANSACTIONS_LIMIT"]
+        )
+        for item in clients:
+            item["transactions"] = transactions.get(item["client_ID"], [])
+        if "product" in expand:
+            expand_products(cursor, [txn for item in clients for txn in item["transactions"]])
+
+def expand_transactions(cursor, transactions, expand):
+    if "client" in expand:
+        clients = items_by_id(cursor, "Clients", CLIENT_COLUMNS, client_rows, [
+            item["client_ID"] for item in transactions
+        ])
+        for item in transactions:
+            item["client"] = clients.get(item["client_ID"])
+    if "product" in expand:
+        expand_products(cursor, transactions)
+    if "score" in expand:
+        scores = items_by_id(cursor, "Transaction_Scores", SCORE_COLUMNS, transaction_score_rows, [
+            item["transaction_ID"] for item in transactions
+        ])
+        for item in transactions:
+            score = scores.get(item["transaction_ID"])
+            item["score"] = score and {
+                "score": score["score"], "flagged": bool(score["flagged"]), "scored_At": score["scored_At"]
+            }
+
+def client_search_batches(conn, batch_size):
+    cursor = conn.cursor()
+    last_id = 0
+    while True:
+        cursor.execute(
+            "SELECT Client_ID, Name, Email, Phone FROM Clients WHERE Client_ID > %s ORDER BY Client_ID LIMIT %s",
+            (last_id, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+def client_search_changes(cursor, since, until, batch_size):
+    # The clients written after change log entry since, up to until, in
+    # batches of (client_id, data) with data None for a deleted client.
+    while True:
+        batch = changes.read_resource(cursor, resources.CLIENTS.name, since, until, batch_size)
+        if not batch:
+            return
+        since = batch[-1][0]
+        yield [(record_id, data) for _, record_id, _, data in batch]
+
+def update_client_index(conn):
+    # Builds the index from Clients the first time. After that it only
+    # reads the client changes logged since its last update, which includes
+    # the writes made through other processes.
+    cursor = conn.cursor()
+    position = changes.latest(cursor, app.config["CHANGES_SETTLE_SECONDS"])
+    batch_size = app.config["CLIENT_SEARCH_BATCH_SIZE"]
+    if client_index.position is None:
+        client_index.build(client_search_batches(conn, batch_size), position)
+        return
+    for batch in client_search_changes(cursor, client_index.position, position, batch_size):
+        # Only the last change to each client matters.
+        latest = dict(batch)
+        client_index.remove_many([client_id for client_id, data in latest.items() if data is None])
+        client_index.add_many([
+            (client_id, data.get("name"), data.get("email"), data.get("phone"))
+            for client_id, data in latest.items() if data is not None
+        ])
+    client_index.advance(position)
+
+def maintain_client_index():
+    try:
+        conn = pool.acquire()
+        try:
+            update_client_index(conn)
+        finally:
+            pool.release(conn)
+        if client_index.needs_compaction():
+            client_index.compact()
+    except Exception:
+        app.logger.exception("Updating the client search index failed")
+    finally:
+        client_index_maintenance.release()
+
+def start_client_index_build():
+    # Builds, refreshes or compacts the index on a background thread, one
+    # at a time per process.
+    if not client_index_maintenance.acquire(blocking=False):
+        return
+    try:
+        threading.Thread(target=maintain_client_index, name="client-index-build", daemon=True).start()
+    except BaseException:
+        client_index_maintenance.release()
+        raise
+
+@app.route("/clients/search")
+def search_clients():
+    q = request.args.get("q", "").strip()
+    if not q:
+        abort(400, "'q' is required")
+    limit = query_arg("limit", int) or DEFAULT_SEARCH_LIMIT
+    if not 1 <= limit <= MAX_SEARCH_LIMIT:
+        abort(400, f"'limit' must be between 1 and {MAX_SEARCH_LIMIT}")
+
+    if not client_index.ready:
+        start_client_index_build()
+        response, status = handle_error("Client search index is being built, please retry", 503)
+        response.headers["Retry-After"] = "5"
+        return response, status
+    if client_index.stale():
+        start_client_index_build()
+
+    client_ids = client_index.search(q, limit)
+    if not client_ids:
+        return jsonify([]), 200
+
+    cursor = get_db().cursor()
     cursor.execute(
-        "UPDATE Employees SET Name = %s WHERE Employee_ID = %s", 
-        (name, employee_id)
+        f"SELECT {', '.join(CLIENT_COLUMNS)} FROM Clients WHERE Client_ID IN ({', '.join(['%s'] * len(client_ids))})",
+        tuple(client_ids)
     )
-    mysql.connection.commit()
-
-    cursor.execute("SELECT * FROM Employees WHERE Employee_ID = %s", (employee_id,))
-    employee = cursor.fetchone()
-
-    if not employee:
-        return handle_error("Employee not found", 404)
-
-    return jsonify({
-        "employee_ID": employee[0], 
-        "name": employee[1]
-    }), 200
-
-@app.route("/clients/<int:client_id>", methods=["PUT"])
-def update_client(client_id):
-    data = request.get_json()
-    name = data.get('name')
-    email = data.get('email')
-    phone = data.get('phone')
-    client_manager_employee_id = data.get('client_Manager_Employee_ID')
-
-    if not all([name, email, phone, client_manager_employee_id]):
-        return handle_error("Missing required fields", 400)
-
-    cursor = mysql.connection.cursor()
-    cursor.execute(
-        "UPDATE Clients SET Name = %s, Email = %s, Phone = %s, Client_Manager_Employee_ID = %s WHERE Client_ID = %s", 
-        (name, email, phone, client_manager_employee_id, client_id)
+    rows = {row[0]: row for row in cursor.fetchall()}
+    # Keep the index's ranking; IDs deleted by another process are dropped.
+    return jsonify(client_rows.map([rows[client_id] for client_id in client_ids if client_id in rows], cursor)), 200
+
+def flagged_query(args=None):
+    after, limit = page_args(args)
+    client_id = query_arg("client_ID", int, args)
+    conditions, params = ["s.Flagged = 1"], []
+    if client_id is not None:
+        conditions.append("s.Client_ID = %s")
+        params.append(client_id)
+    if after is not None:
+        conditions.append("s.Transaction_ID > %s")
+        params.append(after)
+    sql = (
+        f"SELECT {resources.TRANSACTIONS.select_list('t')}, s.Score, s.Scored_At FROM Transaction_Scores s "
+        "JOIN Transactions t ON t.Transaction_ID = s.Transaction_ID "
+        f"WHERE {' AND '.join(conditions)} ORDER BY s.Transaction_ID LIMIT %s"
     )
-    mysql.connection.commit()
-
-    cursor.execute("SELECT * FROM Clients WHERE Client_ID = %s", (client_id,))
-    client = cursor.fetchone()
-
-    if not client:
-        return handle_error("Client not found", 404)
-
-    return jsonify({
-        "client_ID": client[0], 
-        "name": client[1], 
-        "email": client[2], 
-        "phone": client[3],
-        "client_Manager_Employee_ID": client[4]
-    }), 200
-
-@app.route("/products/<int:product_id>", methods=["PUT"])
-def update_product(product_id):
-    data = request.get_json()
-    product_type = data.get('product_Type')
-
-    if not product_type:
-        return handle_error("Product Type is required", 400)
-
-    cursor = mysql.connection.cursor()
-    cursor.execute(
-        "UPDATE Products SET Product_Type = %s WHERE Product_ID = %s", 
-        (product_type, product_id)
+    return sql, tuple(params) + (limit + 1,), limit
+
+@app.route("/transactions/flagged")
+def get_flagged_transactions():
+    # Transactions whose anomaly score reached ANOMALY_THRESHOLD, with
+    # their scores embedded, paged by Transaction_ID.
+    sql, params, limit = flagged_query()
+    cursor = get_db().cursor()
+    cursor.execute(sql, params)
+    rows, next_cursor = split_page(cursor.fetchall(), limit)
+    transactions = transaction_rows.map([row[:5] for row in rows])
+    for item, row in zip(transactions, rows):
+        item["score"] = {"score": row[5], "flagged": True, "scored_At": row[6]}
+    return page_response(transactions, next_cursor)
+
+def parse_month(value):
+    month_start = date.fromisoformat(f"{value}-01")
+    if month_start.month == 12:
+        return month_start.replace(year=month_start.year + 1, month=1)
+    return month_start.replace(month=month_start.month + 1)
+
+# group_by value -> (SQL expression, response field, keyset condition for
+# ?after=, converter for the after value)
+REPORT_GROUPINGS = {
+    "client": ("Client_ID", "client_ID", "Client_ID > %s", int),
+    "product": ("Product_ID", "product_ID", "Product_ID > %s", int),
+    "day": ("Transaction_Date", "day", "Transaction_Date > %s", date.fromisoformat),
+    # after=YYYY-MM resumes at the first day of the following month
+    "month": ("DATE_FORMAT(Transaction_Date, '%%Y-%%m')", "month", "Transaction_Date >= %s", parse_month),
+}
+
+AGGREGATE_COLUMNS = (
+    "COUNT(*), SUM(Transaction_Amount), AVG(Transaction_Amount), "
+    "MIN(Transaction_Amount), MAX(Transaction_Amount)"
+)
+
+def aggregate_fields(row):
+    return {
+        "transaction_Count": row[0],
+        "total_Amount": row[1],
+        "average_Amount": row[2],
+        "min_Amount": row[3],
+        "max_Amount": row[4]
+    }
+
+def rollup_query(args=None):
+    granularity = (request.args if args is None else args).get("granularity", "month")
+    if granularity not in cash_flows.GRANULARITIES:
+        abort(400, f"'granularity' must be one of: {', '.join(cash_flows.GRANULARITIES)}")
+    client_id = query_arg("client_ID", int, args)
+    start = query_arg("from", date.fromisoformat, args)
+    end = query_arg("to", date.fromisoformat, args)
+
+    conditions, params = ["Granularity = %s"], [granularity]
+    if client_id is not None:
+        conditions.append("Client_ID = %s")
+        params.append(client_id)
+    if start is not None:
+        conditions.append("Bucket_Start >= %s")
+        params.append(cash_flows.bucket_start(start, granularity))
+    if end is not None:
+        conditions.append("Bucket_Start <= %s")
+        params.append(end)
+
+    # One client's buckets are a primary-key range; across all clients the
+    # (Granularity, Bucket_Start) index is summed per bucket.
+    if client_id is not None:
+        sql = "SELECT Bucket_Start, Inflow, Outflow, Cash_Flow_Count FROM Cash_Flow_Buckets"
+    else:
+        sql = "SELECT Bucket_Start, SUM(Inflow), SUM(Outflow), SUM(Cash_Flow_Count) FROM Cash_Flow_Buckets"
+    sql += " WHERE " + " AND ".join(conditions)
+    if client_id is None:
+        sql += " GROUP BY Bucket_Start"
+    sql += " ORDER BY Bucket_Start"
+    return sql, tuple(params)
+
+@app.route("/cash_flows/rollup")
+@admission_class(admission.SCANS)
+@cached_response("cash_flow_rollups", store=report_cache, reusable=True)
+def get_cash_flow_rollup():
+    cursor = get_db().cursor()
+    cursor.execute(*rollup_query())
+    buckets = cursor.fetchall()
+
+    return jsonify([
+        {
+            "bucket_Start": bucket[0],
+            "inflow": bucket[1],
+            "outflow": bucket[2],
+            "net_Flow": bucket[1] - bucket[2],
+            "cash_Flow_Count": bucket[3]
+        }
+        for bucket in buckets
+    ]), 200
+
+def summary_query(client_id, args=None):
+    # WITH ROLLUP returns the per-product rows plus a grand total row
+    # (Product_ID NULL) from one pass over the client's index range.
+    conditions, params = query_filters(DATE_RANGE_FILTERS, args)
+    sql = (
+        f"SELECT Product_ID, {AGGREGATE_COLUMNS}, MIN(Transaction_Date), MAX(Transaction_Date) "
+        f"FROM Transactions WHERE {' AND '.join(['Client_ID = %s'] + conditions)} GROUP BY Product_ID WITH ROLLUP"
     )
-    mysql.connection.commit()
-
-    cursor.execute("SELECT * FROM Products WHERE Product_ID = %s", (product_id,))
-    product = cursor.fetchone()
-
-    if not product:
-        return handle_error("Product not found", 404)
+    return sql, tuple([client_id] + params)
+
+def summary_response(client_id, total, products):
+    summary = {"client_ID": client_id}
+    summary.update(aggregate_fields(total[:5]))
+    summary["first_Transaction_Date"] = total[5]
+    summary["last_Transaction_Date"] = total[6]
+    summary["products"] = [
+        dict({"product_ID": row[0]}, **aggregate_fields(row[1:6]))
+        for row in products
+    ]
+    return summary
+
+@app.route("/clients/<int:client_id>/summary")
+@cached_response("summaries", store=report_cache, reusable=True)
+def get_client_summary(client_id):
+    cursor = get_db().cursor()
+    cursor.execute(*summary_query(client_id))
+    rows = cursor.fetchall()
+    if not rows:
+        return handle_error("No transactions found for client", 404)
+
+    return jsonify(summary_response(client_id, rows[-1][1:], rows[:-1])), 200
+
+CLIENT_BALANCE_SQL = "SELECT Balance, Transaction_Count FROM Client_Balances WHERE Client_ID = %s"
+PRODUCT_BALANCES_SQL = (
+    "SELECT Product_ID, Balance, Transaction_Count FROM Client_Product_Balances "
+    "WHERE Client_ID = %s ORDER BY Product_ID"
+)
+
+def balance_response(client_id, balance, products):
+    return {
+        "client_ID": client_id,
+        "balance": balance[0],
+        "transaction_Count": balance[1],
+        "products": [
+            {"product_ID": product[0], "balance": product[1], "transaction_Count": product[2]}
+            for product in products
+        ]
+    }
+
+@app.route("/clients/<int:client_id>/balance")
+def get_client_balance(client_id):
+    cursor = get_db().cursor()
+    cursor.execute(CLIENT_BALANCE_SQL, (client_id,))
+    balance = cursor.fetchone()
+    if not balance:
+        return handle_error("No balance found for client", 404)
+
+    cursor.execute(PRODUCT_BALANCES_SQL, (client_id,))
+    products = cursor.fetchall()
 
-    return jsonify({
-        "product_ID": product[0], 
-        "product_Type": product[1]
-    }), 200
+    return jsonify(balance_response(client_id, balance, products)), 200
 
-@app.route("/transactions/<int:transaction_id>", methods=["PUT"])
-def update_transaction(transaction_id):
-    data = request.get_json()
-    client_id = data.get('client_ID')
-    product_id = data.get('product_ID')
-    transaction_amount = data.get('transaction_Amount')
-    transaction_date = data.get('transaction_Date')
+def report_query(args=None):
+    group_by = (request.args if args is None else args).get("group_by", "client")
+    if group_by not in REPORT_GROUPINGS:
+        abort(400, f"'group_by' must be one of: {', '.join(REPORT_GROUPINGS)}")
+    expression, field, after_condition, convert_after = REPORT_GROUPINGS[group_by]
 
-    if not all([client_id, product_id, transaction_amount, transaction_date]):
-        return handle_error("Missing required fields", 400)
+    limit = query_arg("limit", int, args) or app.config["REPORT_MAX_GROUPS"]
+    if not 1 <= limit <= app.config["REPORT_MAX_GROUPS"]:
+        abort(400, f"'limit' must be between 1 and {app.config['REPORT_MAX_GROUPS']}")
 
-    cursor = mysql.connection.cursor()
-    cursor.execute(
-        "UPDATE Transactions SET Client_ID = %s, Product_ID = %s, Transaction_Amount = %s, Transaction_Date = %s WHERE Transaction_ID = %s",
-        (client_id, product_id, transaction_amount, transaction_date, transaction_id)
+    conditions, params = query_filters(
+        TRANSACTION_FILTERS[:4] + (("after", after_condition, convert_after),), args
     )
-    mysql.connection.commit()
-
-    cursor.execute("SELECT * FROM Transactions WHERE Transaction_ID = %s", (transaction_id,))
-    transaction = cursor.fetchone()
-
-    if not transaction:
-        return handle_error("Transaction not found", 404)
 
+    sql = f"SELECT {expression}, {AGGREGATE_COLUMNS} FROM Transactions"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" GROUP BY {expression} ORDER BY {expression} LIMIT %s"
+    params.append(limit + 1)
+    return sql, tuple(params), field, limit
+
+def report_page(rows, field, limit):
+    rows, next_cursor = split_page(rows, limit)
+    report = [
+        dict({field: row[0]}, **aggregate_fields(row[1:]))
+        for row in rows
+    ]
+    return report, next_cursor
+
+@app.route("/reports/transactions")
+@admission_class(admission.SCANS)
+@cached_response("reports", store=report_cache, reusable=True)
+def get_transaction_report():
+    sql, params, field, limit = report_query()
+    cursor = get_db().cursor()
+    cursor.execute(sql, params)
+    report, next_cursor = report_page(cursor.fetchall(), field, limit)
+    return page_response(report, next_cursor)
+
+_snapshot = None
+
+def current_snapshot():
+    # Reopened whenever a dump has replaced the manifest.
+    global _snapshot
+    path = os.path.join(app.config["SNAPSHOT_DIR"], snapshots.MANIFEST)
+    try:
+        modified = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _snapshot is None or _snapshot[0] != modified:
+        _snapshot = (modified, snapshots.Snapshot(app.config["SNAPSHOT_DIR"]))
+    return _snapshot[1]
+
+@app.route("/snapshots/reports/transactions")
+@admission_class(admission.SCANS)
+def get_snapshot_report():
+    # Same groups as /reports/transactions, computed from the snapshot
+    # files without touching the database.
+    snapshot = current_snapshot()
+    if snapshot is None:
+        return handle_error("No snapshot available; run 'flask snapshot dump'", 404)
+    group_by = request.args.get("group_by", "client")
+    if group_by not in snapshots.REPORT_GROUPINGS:
+        abort(400, f"'group_by' must be one of: {', '.join(snapshots.REPORT_GROUPINGS)}")
+    limit = query_arg("limit", int) or app.config["REPORT_MAX_GROUPS"]
+    if not 1 <= limit <= app.config["REPORT_MAX_GROUPS"]:
+        abort(400, f"'limit' must be between 1 and {app.config['REPORT_MAX_GROUPS']}")
+    field = snapshots.REPORT_GROUPINGS[group_by][1]
+    # after=YYYY-MM-DD for days, YYYY-MM for months
+    convert_after = {"day": date.fromisoformat, "month": lambda value: date.fromisoformat(f"{value}-01")}
+    after = query_arg("after", convert_after.get(group_by, int))
+
+    report = snapshot.transaction_report(
+        group_by, query_arg("from", date.fromisoformat), query_arg("to", date.fromisoformat),
+        query_arg("client_ID", int), query_arg("product_ID", int), after=after, limit=limit + 1
+    )
+    next_cursor = report[limit - 1][field] if len(report) > limit else None
+    response, status = page_response(report[:limit], next_cursor)
+    response.headers["X-Snapshot-Created"] = snapshot.created_at
+    return response, status
+
+def cached_items(resource, ids):
+    # Reads records by ID, serving cached resources (employees and products)
+    # from the reference cache, whose record keys every write invalidates.
+    # A single miss runs the resource's lookup by key; several are
+    # loaded with one IN (...) query.
+    # The keys are taken before the rows are read: a write that commits in
+    # between moves its record to a new key, so the fill cannot put back the
+    # row the write replaced.
+    namespace = resource.name if resource.cached else None
+    found, keys = {}, {}
+    if namespace is not None:
+        for record_id in set(ids):
+            keys[record_id] = reference_cache.record_key(namespace, record_id)
+            item = reference_cache.get(keys[record_id])
+            if item is not None:
+                found[record_id] = item
+    missing = list(dict.fromkeys(record_id for record_id in ids if record_id not in found))
+    if len(missing) == 1:
+        cursor = execute(resource.get_sql, (missing[0],))
+        loaded = {item[resource.fields[0]]: item for item in resource.rows.map(cursor.fetchall(), cursor)}
+    elif missing:
+        loaded = items_by_id(get_db().cursor(), resource.table, resource.columns, resource.rows, missing)
+    else:
+        loaded = {}
+    if namespace is not None:
+        for record_id, item in loaded.items():
+            if record_id in keys:
+                reference_cache.set(keys[record_id], item)
+    found.update(loaded)
+    return found
+
+def record_response(resource, record_id):
+    item = cached_items(resource, [record_id]).get(record_id)
+    if item is None:
+        return handle_error(f"{resource.label} not found", 404)
+    return jsonify(item), 200
+
+def batch_get_response(resource):
+    # Body: {"ids": [...]}. Items come back in request order, with null in
+    # place of each ID that does not exist; those IDs are also listed in
+    # "missing".
+    data = request.get_json(silent=True)
+    ids = data.get("ids") if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        abort(400, "'ids' must be a non-empty list")
+    if len(ids) > app.config["BATCH_GET_MAX_IDS"]:
+        abort(413, f"At most {app.config['BATCH_GET_MAX_IDS']} IDs per request")
+    if not all(isinstance(record_id, int) and not isinstance(record_id, bool) for record_id in ids):
+        abort(400, "'ids' must be integers")
+
+    found = cached_items(resource, ids)
     return jsonify({
-        "transaction_ID": transaction[0], 
-        "client_ID": transaction[1], 
-        "product_ID": transaction[2], 
-        "transaction_Amount": transaction[3], 
-        "transaction_Date": transaction[4]
+        "items": [found.get(record_id) for record_id in ids],
+        "missing": [record_id for record_id in dict.fromkeys(ids) if record_id not in found]
     }), 200
 
-@app.route("/employees/<int:employee_id>", methods=["DELETE"])
-def delete_employee(employee_id):
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM Employees WHERE Employee_ID = %s", (employee_id,))
-    employee = cursor.fetchone()
-
-    if not employee:
-        return handle_error("Employee not found", 404)
-
-    cursor.execute("DELETE FROM Employees WHERE Employee_ID = %s", (employee_id,))
-    mysql.connection.commit()
-
-    return jsonify({"message": f"Employee with ID {employee_id} has been deleted."}), 200
-
-@app.route("/clients/<int:client_id>", methods=["DELETE"])
-def delete_client(client_id):
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM Clients WHERE Client_ID = %s", (client_id,))
-    client = cursor.fetchone()
-
-    if not client:
-        return handle_error("Client not found", 404)
-
-    cursor.execute("DELETE FROM Clients WHERE Client_ID = %s", (client_id,))
-    mysql.connection.commit()
-
-    return jsonify({"message": f"Client with ID {client_id} has been deleted."}), 200
+def change_position(value, name):
+    try:
+        position = int(value)
+    except ValueError:
+        abort(400, f"Invalid value for '{name}'")
+    if position < 0:
+        abort(400, f"'{name}' must not be negative")
+    return position
+
+@app.route("/changes")
+def get_changes():
+    # Changes after sequence number 'since' (default 0), oldest first. A
+    # full page carries X-Next-Cursor, the 'since' for the next call.
+    since = change_position(request.args.get("since") or "0", "since")
+    _, limit = page_args()
+    items = changes.read(get_db().cursor(), since, limit, app.config["CHANGES_SETTLE_SECONDS"])
+    return page_response(items, items[-1]["change_ID"] if len(items) == limit else None)
+
+@app.route("/changes/stream")
+@admission_class(admission.STREAMS)
+def stream_changes():
+    # Server-Sent Events, one per change with its sequence number as the
+    # event ID. Starts after Last-Event-ID (sent by reconnecting clients),
+    # else after 'since', else at the current end of the log.
+    value = request.headers.get("Last-Event-ID") or request.args.get("since")
+    since = change_position(value, "since") if value else change_feed.latest()
+    stream_seconds = app.config["CHANGES_STREAM_SECONDS"]
+    heartbeat = app.config["CHANGES_HEARTBEAT_SECONDS"]
+
+    def events(since):
+        change_feed.subscribe()
+        try:
+            yield f"retry: {int(change_feed.poll_seconds * 1000)}\n\n"
+            deadline = time.monotonic() + stream_seconds
+            while time.monotonic() < deadline:
+                batch = change_feed.wait(since, min(heartbeat, deadline - time.monotonic()))
+                if batch is None:
+                    # Further behind than the feed keeps in memory.
+                    batch = change_feed.read(since, change_feed.batch_size)
+                    if not batch:
+                        time.sleep(change_feed.poll_seconds)
+                if not batch:
+                    yield ": keep-alive\n\n"
+                    continue
+                for change in batch:
+                    yield f"id: {change['change_ID']}\ndata: {app.json.dumps(change)}\n\n"
+                since = batch[-1]["change_ID"]
+        finally:
+            change_feed.unsubscribe()
+
+    return Response(
+        stream_with_context(events(since)), mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@app.route("/products/<int:product_id>", methods=["DELETE"])
-def delete_product(product_id):
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM Products WHERE Product_ID = %s", (product_id,))
-    product = cursor.fetchone()
+JOB_RESULT_TYPES = dict(EXPORT_FORMATS, json="application/json")
+
+def job_spec(data):
+    # Validates a POST /jobs body with the same filters as the matching list
+    # endpoint and returns what the job process needs to run the query.
+    filters = data.get("filters") or {}
+    if not isinstance(filters, dict):
+        abort(400, "'filters' must be an object")
+    args = {name: str(value) for name, value in filters.items() if value is not None}
+
+    kind = data.get("kind")
+    if kind == "export":
+        resource = data.get("resource")
+        if resource not in resources.RESOURCES:
+            abort(400, f"'resource' must be one of: {', '.join(resources.RESOURCES)}")
+        export_format = data.get("format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            abort(400, f"Unsupported format '{export_format}'")
+        conditions, params = query_filters(resources.RESOURCES[resource].filters, args)
+        return {
+            "resource": resource, "conditions": conditions,
+            "params": jobs.json_params(params), "format": export_format
+        }
+    if kind == "report":
+        group_by = data.get("group_by", "client")
+        if group_by not in REPORT_GROUPINGS:
+            abort(400, f"'group_by' must be one of: {', '.join(REPORT_GROUPINGS)}")
+        expression, field, _, _ = REPORT_GROUPINGS[group_by]
+        conditions, params = query_filters(TRANSACTION_FILTERS[:4], args)
+        return {
+            "expression": expression, "field": field, "conditions": conditions,
+            "params": jobs.json_params(params), "format": "json"
+        }
+    abort(400, "'kind' must be 'export' or 'report'")
+
+def timestamp(value):
+    return datetime.fromtimestamp(value, timezone.utc).isoformat() if value is not None else None
+
+def job_response(job):
+    item = {
+        "job_ID": job["id"],
+        "kind": job["kind"],
+        "request": job["request"],
+        "status": job["status"],
+        "progress": round(job["progress"], 4),
+        "rows": job["rows"],
+        "error": job["error"],
+        "created_At": timestamp(job["created_at"]),
+        "started_At": timestamp(job["started_at"]),
+        "finished_At": timestamp(job["finished_at"])
+    }
+    if job["status"] == jobs.SUCCEEDED:
+        item["result_URL"] = f"/jobs/{job['id']}/result"
+    return item
+
+@app.route("/jobs", methods=["POST"])
+@idempotent
+def add_job():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400, "Request body must be a JSON object")
+    spec = job_spec(data)
+    job_queue.store.purge(app.config["JOBS_RETENTION_SECONDS"])
+    job_id = job_queue.submit(data["kind"], data, spec)
+
+    response = jsonify(job_response(job_queue.store.get(job_id)))
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return response, 202
+
+@app.route("/jobs/<job_id>")
+def get_job(job_id):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        return handle_error("Job not found", 404)
+    return jsonify(job_response(job)), 200
+
+@app.route("/jobs/<job_id>/result")
+def get_job_result(job_id):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        return handle_error("Job not found", 404)
+    if job["status"] != jobs.SUCCEEDED:
+        response, status = handle_error(f"Job is {job['status']}", 409)
+        if job["status"] in (jobs.QUEUED, jobs.RUNNING):
+            response.headers["Retry-After"] = "5"
+        return response, status
+    if not os.path.exists(job["result_path"]):
+        return handle_error("Job result has expired", 410)
+
+    export_format = job["spec"]["format"]
+    return send_file(
+        job["result_path"], mimetype=JOB_RESULT_TYPES[export_format], as_attachment=True,
+        download_name=f"{job['kind']}-{job_id}.{export_format}"
+    )
 
-    if not product:
-        return handle_error("Product not found", 404)
+def list_response(resource, expand_related=None):
+    # Keyset pagination on the primary key: every page is an index range
+    # scan instead of a full table read.
+    conditions, params = query_filters(resource.filters)
+    expand = expand_args(resource.expansions) if resource.expansions else set()
+    if export_requested():
+        if expand:
+            abort(400, "'expand' is not supported for exports")
+        return export_response(resource, conditions, params)
+
+    after, limit = page_args()
+    cursor = execute(*resource.list_query(conditions, params, after, limit + 1))
+    rows, next_cursor = split_page(cursor.fetchall(), limit)
+    if not rows:
+        return handle_error(f"No {resource.plural} found", 404)
+
+    items = resource.rows.map(rows, cursor)
+    if expand:
+        expand_related(get_db().cursor(), items, expand)
+    return page_response(items, next_cursor)
+
+def create_response(resource, before_commit=None, after_commit=None):
+    row = resource.row(request.get_json())
+    error = resource.validate(row)
+    if error:
+        return handle_error(error, 400)
+
+    conn = get_db()
+    try:
+        if resource.key_table is not None:
+            execute(resource.claim_sql, row[:1])
+        execute(resource.insert_sql, row)
+    except conn.IntegrityError as e:
+        conn.rollback()
+        return jsonify({
+            "error": f"{resource.label} rejected by the database",
+            "detail": str(e.args[-1]) if e.args else str(e)
+        }), 409
+    commit_write(resource, resources.Write(changes.INSERTED, [row[0]], [row], None), before_commit, after_commit)
+
+    item = written_row(resource, row)
+    if not item:
+        return handle_error(f"Failed to retrieve the added {resource.label.lower()}", 500)
+    return jsonify(resource.item(item)), 201
+
+def update_response(resource, record_id, before_commit=None, after_commit=None):
+    row = resource.row(request.get_json(), key=record_id)
+    error = resource.validate(row, update=True)
+    if error:
+        return handle_error(error, 400)
+
+    conn = get_db()
+    previous = locked_row(resource, record_id) if resource.lock_rows else None
+    if resource.lock_rows and not previous:
+        conn.rollback()
+        return handle_error(f"{resource.label} not found", 404)
+
+    cursor = execute(resource.update_sql, row[1:] + row[:1])
+    if not (previous or cursor.rowcount):
+        conn.rollback()
+        return handle_error(f"{resource.label} not found", 404)
+    commit_write(
+        resource, resources.Write(changes.UPDATED, [record_id], [row], [previous] if previous else None),
+        before_commit, after_commit
+    )
 
-    cursor.execute("DELETE FROM Products WHERE Product_ID = %s", (product_id,))
-    mysql.connection.commit()
+    item = written_row(resource, row)
+    if not item:
+        return handle_error(f"{resource.label} not found", 404)
+    return jsonify(resource.item(item)), 200
+
+def delete_response(resource, record_id, before_commit=None, after_commit=None):
+    conn = get_db()
+    previous = None
+    if resource.lock_rows:
+        previous = locked_row(resource, record_id)
+        if not previous:
+            conn.rollback()
+            return handle_error(f"{resource.label} not found", 404)
+    elif app.config["STRICT_CONSISTENCY"]:
+        if not execute(resource.exists_sql, (record_id,)).fetchone():
+            return handle_error(f"{resource.label} not found", 404)
+
+    cursor = execute(resource.delete_sql, (record_id,))
+    if not (previous or cursor.rowcount):
+        conn.rollback()
+        return handle_error(f"{resource.label} not found", 404)
+    if resource.key_table is not None:
+        execute(resource.release_sql, (record_id,))
+    commit_write(
+        resource, resources.Write(changes.DELETED, [record_id], [], [previous] if previous else None),
+        before_commit, after_commit
+    )
 
-    return jsonify({"message": f"Product with ID {product_id} has been deleted."}), 200
+    return jsonify({"message": f"{resource.label} with ID {record_id} has been deleted."}), 200
+
+def register_resource(resource, list_class=None, expand=None, before_commit=None, after_commit=None):
+    # Adds a resource's routes: its list (filters, keyset pages, exports and
+    # ?expand= through expand), reads and batch reads by ID, create (and
+    # bulk create), update and delete. before_commit(cursor, write) runs in
+    # each write's database transaction, after_commit(write) once it has
+    # committed. list_class puts the list in an admission control class.
+    name, singular = resource.name, resource.singular
+    key_arg = f"{singular}_id"
+    record_rule = f"/{name}/<int:{key_arg}>"
+
+    def list_records():
+        return list_response(resource, expand)
+
+    def get_record(**kwargs):
+        return record_response(resource, kwargs[key_arg])
+
+    def batch_get_records():
+        return batch_get_response(resource)
+
+    def add_record():
+        return create_response(resource, before_commit, after_commit)
+
+    def add_records():
+        return bulk_insert(resource, before_commit, after_commit)
+
+    def update_record(**kwargs):
+        return update_response(resource, kwargs[key_arg], before_commit, after_commit)
+
+    def delete_record(**kwargs):
+        return delete_response(resource, kwargs[key_arg], before_commit, after_commit)
+
+    if resource.cached:
+        list_records = cached_response(name)(list_records)
+    if list_class is not None:
+        list_records = admission_class(list_class)(list_records)
+    app.add_url_rule(f"/{name}", f"get_{name}", list_records)
+    app.add_url_rule(record_rule, f"get_{singular}", get_record)
+    app.add_url_rule(f"/{name}/batch-get", f"batch_get_{name}", read_only(batch_get_records), methods=["POST"])
+    app.add_url_rule(f"/{name}", f"add_{singular}", idempotent(add_record), methods=["POST"])
+    if resource.bulk:
+        app.add_url_rule(f"/{name}/bulk", f"add_{name}_bulk", idempotent(add_records), methods=["POST"])
+    app.add_url_rule(record_rule, f"update_{singular}", idempotent(update_record), methods=["PUT"])
+    app.add_url_rule(record_rule, f"delete_{singular}", delete_record, methods=["DELETE"])
+
+def index_client_writes(write):
+    if write.action == changes.DELETED:
+        client_index.remove_many(write.keys)
+    else:
+        client_index.add_many([(client_id, name, email, phone) for client_id, name, email, phone, _ in write.rows])
+    if client_index.needs_compaction():
+        start_client_index_build()
+
+def apply_transaction_writes(cursor, write):
+    # Balances move by the new rows less the locked old ones. New and
+    # updated rows are scored against the current features, which keep an
+    # updated transaction's original values until the next rescore.
+    if write.action == changes.DELETED:
+        for transaction_id in write.keys:
+            cursor.execute("DELETE FROM Transaction_Scores WHERE Transaction_ID = %s", (transaction_id,))
+    balances.apply_deltas(
+        cursor,
+        added=[(row[1], row[2], row[3]) for row in write.rows],
+        removed=[(row[1], row[2], row[3]) for row in write.previous or ()]
+    )
+    if write.rows:
+        score_transactions(cursor, write.rows)
 
-@app.route("/transactions/<int:transaction_id>", methods=["DELETE"])
-def delete_transaction(transaction_id):
-    cursor = mysql.connection.cursor()
-    cursor.execute("SELECT * FROM Transactions WHERE Transaction_ID = %s", (transaction_id,))
-    transaction = cursor.fetchone()
+def record_transaction_writes(write):
+    if write.action == changes.INSERTED:
+        record_transactions(write.rows)
 
-    if not transaction:
-        return handle_error("Transaction not found", 404)
+def apply_cash_flow_writes(cursor, write):
+    cash_flows.apply_deltas(
+        cursor, added=[row[1:] for row in write.rows], removed=[row[1:] for row in write.previous or ()]
+    )
 
-    cursor.execute("DELETE FROM Transactions WHERE Transaction_ID = %s", (transaction_id,))
-    mysql.connection.commit()
+register_resource(resources.EMPLOYEES)
+register_resource(resources.CLIENTS, admission.SCANS, expand_clients, after_commit=index_client_writes)
+register_resource(resources.PRODUCTS)
+register_resource(
+    resources.TRANSACTIONS, admission.SCANS, expand_transactions,
+    before_commit=apply_transaction_writes, after_commit=record_transaction_writes
+)
+register_resource(resources.CASH_FLOWS, admission.SCANS, before_commit=apply_cash_flow_writes)
+
+
+def require_migrations(conn):
+    # The maintenance commands write to tables that only the migrations
+    # create, so they refuse to run against an outdated schema.
+    missing = schema.pending(conn)
+    if missing:
+        click.echo(f"Pending schema migrations: {', '.join(missing)}; run 'flask --app app schema migrate' first")
+        raise SystemExit(1)
+
+balances_cli = AppGroup("balances", help="Maintain the materialized client balances.")
+app.cli.add_command(balances_cli)
+
+@balances_cli.command("rebuild")
+@click.option("--batch-size", default=1000, show_default=True, help="Clients per transaction.")
+def rebuild_balances(batch_size):
+    """Recompute Client_Balances and Client_Product_Balances from Transactions."""
+    conn = pool.acquire()
+    try:
+        require_migrations(conn)
+        balances.rebuild(conn, batch_size, echo=click.echo)
+    finally:
+        pool.release(conn)
+
+@balances_cli.command("verify")
+@click.option("--batch-size", default=1000, show_default=True, help="Clients per comparison query.")
+def verify_balances(batch_size):
+    """Report clients whose stored balances disagree with Transactions."""
+    conn = pool.acquire()
+    try:
+        mismatches = balances.verify(conn, batch_size, echo=click.echo)
+    finally:
+        pool.release(conn)
+    if mismatches:
+        raise SystemExit(1)
+
+cash_flows_cli = AppGroup("cash-flows", help="Maintain the cash flow rollup buckets.")
+app.cli.add_command(cash_flows_cli)
+
+@cash_flows_cli.command("backfill")
+@click.option("--batch-size", default=1000, show_default=True, help="Clients per transaction.")
+def backfill_cash_flows(batch_size):
+    """Recompute the daily and monthly buckets from Cash_Flows."""
+    conn = pool.acquire()
+    try:
+        require_migrations(conn)
+        cash_flows.backfill(conn, batch_size, echo=click.echo)
+    finally:
+        pool.release(conn)
+
+def page_query(resource, args):
+    # The keyset page statement list_response issues for these query
+    # arguments, as the second page (after=0).
+    conditions, params = query_filters(resource.filters, args)
+    return resource.list_query(conditions, params, 0, DEFAULT_PAGE_LIMIT + 1)
+
+def hot_queries():
+    # The statements the hot paths issue, built by the same code as their
+    # handlers from sample query arguments, for schema.check_indexes:
+    # (description, sql, params, expected indexes per table or alias,
+    # whether rows must come back in ORDER BY order without a filesort).
+    year = {"from": "2024-01-01", "to": "2024-12-31"}
+    return [
+        ("transaction pages", *page_query(resources.TRANSACTIONS, {}), {"Transactions": {"PRIMARY"}}, True),
+        ("transaction pages by client", *page_query(resources.TRANSACTIONS, {"client_ID": "1"}),
+         {"Transactions": {"idx_transactions_client_id"}}, True),
+        ("transaction pages by product", *page_query(resources.TRANSACTIONS, {"product_ID": "1"}),
+         {"Transactions": {"idx_transactions_product_id"}}, True),
+        ("transaction pages by client and date", *page_query(resources.TRANSACTIONS, dict(year, client_ID="1")),
+         {"Transactions": {"idx_transactions_client_id", "idx_transactions_client_date"}}, False),
+        ("client pages by manager", *page_query(resources.CLIENTS, {"client_Manager_Employee_ID": "1"}),
+         {"Clients": {"idx_clients_manager"}}, True),
+        ("cash flow pages by client", *page_query(resources.CASH_FLOWS, {"client_ID": "1"}),
+         {"Cash_Flows": {"idx_cash_flows_client_id"}}, True),
+        ("flagged transactions", *flagged_query({"after": "0"})[:2],
+         {"s": {"idx_transaction_scores_flagged"}, "t": {"PRIMARY"}}, True),
+        ("client summary", *summary_query(1, {}), {"Transactions": {"idx_transactions_client_date"}}, False),
+        ("client balance", PRODUCT_BALANCES_SQL, (1,), {"Client_Product_Balances": {"PRIMARY"}}, True),
+        ("transaction report by client", *report_query({"group_by": "client"})[:2],
+         {"Transactions": {"idx_transactions_client_date"}}, False),
+        ("transaction report by day", *report_query(dict(year, group_by="day"))[:2],
+         {"Transactions": {"idx_transactions_date"}}, False),
+        ("cash flow rollup by client", *rollup_query({"client_ID": "1", "from": "2024-01-01"}),
+         {"Cash_Flow_Buckets": {"PRIMARY"}}, True),
+        ("changes since", changes.READ, (changes.SETTLE_SECONDS, 0, 100), {"Change_Log": {"PRIMARY"}}, True),
+    ]
 
-    return jsonify({"message": f"Transaction with ID {transaction_id} has been deleted."}), 200
+schema_cli = AppGroup("schema", help="Apply and check the database schema migrations.")
+app.cli.add_command(schema_cli)
+
+@schema_cli.command("migrate")
+@click.option("--target", type=int, help="Stop after this migration version.")
+def migrate_schema(target):
+    """Apply pending migrations from the migrations/ directory."""
+    conn = pool.acquire()
+    try:
+        schema.migrate(conn, target, echo=click.echo)
+    finally:
+        pool.release(conn)
+
+@schema_cli.command("status")
+def schema_status():
+    """List migrations and whether each has been applied."""
+    conn = pool.acquire()
+    try:
+        migrations = schema.status(conn)
+    finally:
+        pool.release(conn)
+    for version, name, applied in migrations:
+        click.echo(f"{version:04d}_{name}: {'applied' if applied else 'pending'}")
+
+@schema_cli.command("check")
+def check_schema():
+    """EXPLAIN the hot statements and report any that miss their indexes."""
+    conn = pool.acquire()
+    try:
+        warnings = schema.check_indexes(conn, hot_queries(), warn=click.echo)
+    finally:
+        pool.release(conn)
+    if warnings:
+        raise SystemExit(1)
+
+snapshot_cli = AppGroup("snapshot", help="Write and query the columnar analytics snapshot.")
+app.cli.add_command(snapshot_cli)
+
+@snapshot_cli.command("dump")
+@click.option("--full", is_flag=True, help="Rewrite every partition instead of updating incrementally.")
+@click.option("--refresh-days", default=snapshots.REFRESH_DAYS, show_default=True,
+              help="Months within this many days are re-read on every run.")
+def dump_snapshot(full, refresh_days):
+    """Copy Transactions, Clients and Products into SNAPSHOT_DIR."""
+    conn = pool.acquire()
+    try:
+        snapshots.dump(conn, app.config["SNAPSHOT_DIR"], full=full, refresh_days=refresh_days, echo=click.echo)
+    finally:
+        pool.release(conn)
+
+@snapshot_cli.command("report")
+@click.option("--group-by", type=click.Choice(list(snapshots.REPORT_GROUPINGS)), default="client", show_default=True)
+@click.option("--from", "from_date", type=click.DateTime(["%Y-%m-%d"]), help="First transaction date.")
+@click.option("--to", "to_date", type=click.DateTime(["%Y-%m-%d"]), help="Last transaction date.")
+@click.option("--client-id", type=int)
+@click.option("--product-id", type=int)
+def snapshot_report(group_by, from_date, to_date, client_id, product_id):
+    """Print transaction totals from the snapshot as NDJSON."""
+    snapshot = snapshots.Snapshot(app.config["SNAPSHOT_DIR"])
+    report = snapshot.transaction_report(
+        group_by, from_date and from_date.date(), to_date and to_date.date(), client_id, product_id
+    )
+    for group in report:
+        click.echo(serialization.dumps_bytes(group))
+
+anomaly_cli = AppGroup("anomaly", help="Score transactions for anomalies.")
+app.cli.add_command(anomaly_cli)
+
+@anomaly_cli.command("rescore")
+@click.option("--batch-size", default=10000, show_default=True, help="Clients per batch.")
+@click.option("--dry-run", is_flag=True, help="Report counts without writing scores or features.")
+def rescore_transactions(batch_size, dry_run):
+    """Recompute client features and every transaction's anomaly score."""
+    conn = pool.acquire()
+    try:
+        if not dry_run:
+            require_migrations(conn)
+        anomaly.rescore(
+            conn, None if dry_run else app.config["ANOMALY_FEATURES_PATH"], batch_size,
+            app.config["ANOMALY_THRESHOLD"], write=not dry_run, echo=click.echo
+        )
+    finally:
+        pool.release(conn)
+
+def check_indexes():
+    # Startup check, run once per process by configure(); a database that
+    # cannot be reached yet only skips it.
+    if not app.config["CHECK_INDEXES_ON_STARTUP"]:
+        return []
+    try:
+        conn = pool.acquire()
+    except Exception as e:
+        app.logger.warning("Index check skipped: %s", e)
+        return []
+    try:
+        return schema.check_indexes(conn, hot_queries(), warn=app.logger.warning)
+    finally:
+        pool.release(conn)
 
 
 if __name__ == "__main__":
+    configure()
+    start_client_index_build()
     app.run(debug=True)
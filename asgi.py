@@ -0,0 +1,283 @@
+import asyncio
+import contextvars
+import hashlib
+import re
+import time
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import Headers, MultiDict
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_etags
+
+import app as api
+import db
+import metrics
+import resources
+import serialization
+
+# Async serving mode: `uvicorn asgi:application` (or any ASGI server).
+#
+# The read endpoints below are served natively on an async MySQL driver
+# (aiomysql) with its own pool, so a slow report only holds a coroutine
+# rather than a worker thread, and independent queries in one request run
+# concurrently. Every other route, exports (?format=) and expansions
+# (?expand=) are delegated to the Flask app, which keeps using the
+# synchronous pool in db.py.
+
+# RequestStats for the request being served; tasks started with
+# asyncio.gather share it with their parent.
+current_stats = contextvars.ContextVar("current_stats", default=None)
+
+
+class AsyncDatabase:
+    def __init__(self, settings=None):
+        self.settings = settings or db.settings_from_env()
+        self.pool = None
+        self._opening = asyncio.Lock()
+
+    async def open(self):
+        async with self._opening:
+            if self.pool is not None:
+                return
+            import aiomysql
+
+            settings = self.settings
+            self.pool = await aiomysql.create_pool(
+                host=settings["host"], port=settings["port"], user=settings["user"],
+                password=settings["password"], db=settings["database"],
+                minsize=settings["min_size"], maxsize=settings["max_size"],
+                pool_recycle=int(settings["max_lifetime"]), autocommit=True, charset="utf8mb4"
+            )
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    async def fetchall(self, sql, params=()):
+        if self.pool is None:
+            await self.open()
+        stats = current_stats.get() or metrics.RequestStats()
+        started = time.perf_counter()
+        try:
+            conn = await asyncio.wait_for(self.pool.acquire(), self.settings["timeout"])
+        except asyncio.TimeoutError:
+            raise db.PoolTimeout("No database connection available")
+        finally:
+            stats.wait_seconds += time.perf_counter() - started
+        try:
+            async with conn.cursor() as cursor:
+                started = time.perf_counter()
+                try:
+                    await cursor.execute(sql, params)
+                    rows = await cursor.fetchall()
+                finally:
+                    stats.statement(time.perf_counter() - started, sql, metrics.redact(params))
+                stats.rows += len(rows)
+                return rows
+        finally:
+            self.pool.release(conn)
+
+    async def fetchone(self, sql, params=()):
+        rows = await self.fetchall(sql, params)
+        return rows[0] if rows else None
+
+
+class Request:
+    def __init__(self, scope):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        query_string = scope.get("query_string", b"").decode("latin-1")
+        self.args = MultiDict(parse_qsl(query_string, keep_blank_values=True))
+        # Same shape as werkzeug's Request.full_path, so cache keys are
+        # shared with the Flask handlers.
+        self.full_path = f"{self.path}?{query_string}"
+        self.headers = Headers([
+            (name.decode("latin-1"), value.decode("latin-1")) for name, value in scope["headers"]
+        ])
+
+
+class JSONResponse:
+    def __init__(self, payload, status=200, headers=None, body=None):
+        self.status = status
+        self.headers = dict(headers or {})
+        if body is None:
+            started = time.perf_counter()
+            body = serialization.dumps_bytes(payload)
+            stats = current_stats.get()
+            if stats is not None:
+                stats.serialize_seconds += time.perf_counter() - started
+        self.body = body
+
+    async def send(self, send):
+        headers = [(b"content-type", b"application/json")]
+        headers += [(name.lower().encode(), str(value).encode()) for name, value in self.headers.items()]
+        headers.append((b"content-length", str(len(self.body)).encode()))
+        await send({"type": "http.response.start", "status": self.status, "headers": headers})
+        await send({"type": "http.response.body", "body": self.body})
+
+
+def error(message, status):
+    return JSONResponse({"error": message}, status)
+
+
+# path -> (resource, cache namespace); cached resources share the Flask
+# app's reference cache entries.
+LIST_ROUTES = {
+    f"/{name}": (resource, name if resource.cached else None) for name, resource in resources.RESOURCES.items()
+}
+
+
+class AsyncApp:
+    def __init__(self, flask_app, database):
+        self.flask_app = flask_app
+        self.database = database
+        self.fallback = WsgiToAsgi(flask_app)
+        # (path pattern, Flask rule used as the metrics label, handler)
+        self.routes = [
+            (re.compile(r"^/clients/(\d+)/summary$"), "/clients/<int:client_id>/summary", self.client_summary),
+            (re.compile(r"^/clients/(\d+)/balance$"), "/clients/<int:client_id>/balance", self.client_balance),
+            (re.compile(r"^/reports/transactions$"), "/reports/transactions", self.transaction_report),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            await self.fallback(scope, receive, send)
+            return
+
+        route, handler = self.resolve(scope)
+        if handler is None:
+            await self.fallback(scope, receive, send)
+            return
+
+        request = Request(scope)
+        stats = metrics.RequestStats(self.flask_app.config["SLOW_QUERY_SECONDS"])
+        token = current_stats.set(stats)
+        try:
+            try:
+                response = await handler(request)
+            except HTTPException as e:
+                response = error(e.description, e.code)
+            except db.PoolTimeout:
+                response = error("Database is busy, please retry", 503)
+                response.headers["Retry-After"] = "1"
+            stats.status = response.status
+            await response.send(send)
+        finally:
+            current_stats.reset(token)
+            api.request_metrics.record(route, request.method, stats)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.database.open()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await asyncio.to_thread(api.configure)
+                api.start_client_index_build()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.database.close()
+                if api.job_queue is not None:
+                    api.job_queue.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def resolve(self, scope):
+        # Returns (route, handler), or (None, None) for requests the Flask
+        # app should serve.
+        if scope["method"] not in ("GET", "HEAD"):
+            return None, None
+        query = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        if query.get("format") not in (None, "", "json") or query.get("expand"):
+            return None, None
+
+        path = scope["path"]
+        if path in LIST_ROUTES:
+            return path, lambda request: self.list_page(request, *LIST_ROUTES[path])
+        for pattern, route, handler in self.routes:
+            match = pattern.match(path)
+            if match:
+                return route, lambda request: handler(request, *(int(group) for group in match.groups()))
+        return None, None
+
+    async def cached(self, request, store, namespace, compute, max_age=None):
+        # Mirrors api.cached_response: cached serialized bodies with ETag
+        # revalidation, using the same stores and keys.
+        key = store.list_key(namespace, request.full_path)
+        entry = store.get(key)
+        if entry is None:
+            response = await compute()
+            if response.status != 200:
+                return response
+            entry = (response.body, hashlib.sha1(response.body).hexdigest(), response.headers.get("X-Next-Cursor"))
+            store.set(key, entry)
+
+        body, etag, next_cursor = entry
+        headers = {"ETag": f'"{etag}"'}
+        if max_age is not None:
+            headers["Cache-Control"] = f"max-age={max_age}"
+        if next_cursor is not None:
+            headers["X-Next-Cursor"] = next_cursor
+        if parse_etags(request.headers.get("If-None-Match")).contains(etag):
+            return JSONResponse(None, 304, headers, body=b"")
+        return JSONResponse(None, 200, headers, body=body)
+
+    async def list_page(self, request, resource, namespace):
+        async def compute():
+            conditions, params = api.query_filters(resource.filters, request.args)
+            after, limit = api.page_args(request.args)
+            sql, params = resource.list_query(conditions, params, after, limit + 1)
+            rows, next_cursor = api.split_page(await self.database.fetchall(sql, params), limit)
+            if not rows:
+                return error(f"No {resource.plural} found", 404)
+            headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else {}
+            return JSONResponse(resource.rows.map(rows), 200, headers)
+
+        if namespace is None:
+            return await compute()
+        return await self.cached(request, api.reference_cache, namespace, compute)
+
+    async def client_summary(self, request, client_id):
+        async def compute():
+            rows = await self.database.fetchall(*api.summary_query(client_id, request.args))
+            if not rows:
+                return error("No transactions found for client", 404)
+            return JSONResponse(api.summary_response(client_id, rows[-1][1:], rows[:-1]))
+
+        return await self.cached(
+            request, api.report_cache, "summaries", compute, api.app.config["REPORT_CACHE_TTL"]
+        )
+
+    async def client_balance(self, request, client_id):
+        # The two lookups are independent, so they run concurrently on two
+        # pooled connections.
+        balance, products = await asyncio.gather(
+            self.database.fetchone(api.CLIENT_BALANCE_SQL, (client_id,)),
+            self.database.fetchall(api.PRODUCT_BALANCES_SQL, (client_id,)),
+        )
+        if not balance:
+            return error("No balance found for client", 404)
+        return JSONResponse(api.balance_response(client_id, balance, products))
+
+    async def transaction_report(self, request):
+        async def compute():
+            sql, params, field, limit = api.report_query(request.args)
+            report, next_cursor = api.report_page(await self.database.fetchall(sql, params), field, limit)
+            headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else {}
+            return JSONResponse(report, 200, headers)
+
+        return await self.cached(
+            request, api.report_cache, "reports", compute, api.app.config["REPORT_CACHE_TTL"]
+        )
+
+
+application = AsyncApp(api.app, AsyncDatabase())
@@ -0,0 +1,147 @@
+from decimal import Decimal
+
+# Running totals (Client_Balances and Client_Product_Balances, migration 0004)
+# maintained in the same database transaction as every write to
+# Transactions, so a balance lookup is a primary-key read instead of a scan
+# over the client's ledger.
+UPSERT_CLIENT = (
+    "INSERT INTO Client_Balances (Client_ID, Balance, Transaction_Count) VALUES (%s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE Balance = Balance + VALUES(Balance), "
+    "Transaction_Count = Transaction_Count + VALUES(Transaction_Count)"
+)
+UPSERT_CLIENT_PRODUCT = (
+    "INSERT INTO Client_Product_Balances (Client_ID, Product_ID, Balance, Transaction_Count) "
+    "VALUES (%s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE Balance = Balance + VALUES(Balance), "
+    "Transaction_Count = Transaction_Count + VALUES(Transaction_Count)"
+)
+
+
+def collect_deltas(added=(), removed=()):
+    # added/removed are (client_id, product_id, amount) triples; returns the
+    # net change per (client, product) with no-op entries dropped.
+    deltas = {}
+    for sign, rows in ((1, added), (-1, removed)):
+        for client_id, product_id, amount in rows:
+            balance, count = deltas.get((client_id, product_id), (Decimal(0), 0))
+            deltas[(client_id, product_id)] = (balance + sign * Decimal(str(amount)), count + sign)
+    return {key: delta for key, delta in deltas.items() if delta != (0, 0)}
+
+
+def apply_deltas(cursor, added=(), removed=()):
+    deltas = collect_deltas(added, removed)
+    if not deltas:
+        return
+
+    per_client = {}
+    for (client_id, _), (balance, count) in deltas.items():
+        total, total_count = per_client.get(client_id, (Decimal(0), 0))
+        per_client[client_id] = (total + balance, total_count + count)
+
+    # Rows are locked in key order so concurrent writers cannot deadlock on
+    # each other's balance rows.
+    cursor.executemany(UPSERT_CLIENT, [
+        (client_id, balance, count)
+        for client_id, (balance, count) in sorted(per_client.items())
+    ])
+    cursor.executemany(UPSERT_CLIENT_PRODUCT, [
+        (client_id, product_id, balance, count)
+        for (client_id, product_id), (balance, count) in sorted(deltas.items())
+    ])
+
+
+def client_batches(cursor, batch_size, tables=("Clients", "Transactions")):
+    # (first, last) Client_ID ranges of up to batch_size IDs, covering every
+    # ID found in any of tables, so rows whose client has no row in Clients
+    # are still rebuilt. Each table is read with its own keyset query on its
+    # Client_ID index and the lists are merged.
+    last_id = None
+    while True:
+        ids = set()
+        for table in tables:
+            if last_id is None:
+                cursor.execute(f"SELECT DISTINCT Client_ID FROM {table} ORDER BY Client_ID LIMIT %s", (batch_size,))
+            else:
+                cursor.execute(
+                    f"SELECT DISTINCT Client_ID FROM {table} WHERE Client_ID > %s ORDER BY Client_ID LIMIT %s",
+                    (last_id, batch_size)
+                )
+            ids.update(row[0] for row in cursor.fetchall())
+        if not ids:
+            return
+        ids = sorted(ids)[:batch_size]
+        last_id = ids[-1]
+        yield ids[0], last_id
+
+
+def rebuild(conn, batch_size=1000, echo=print):
+    # Recomputes both tables from Transactions one client range at a time;
+    # each range is replaced in its own transaction.
+    cursor = conn.cursor()
+    clients = 0
+    for first_id, last_id in client_batches(conn.cursor(), batch_size):
+        for table in ("Client_Product_Balances", "Client_Balances"):
+            cursor.execute(f"DELETE FROM {table} WHERE Client_ID BETWEEN %s AND %s", (first_id, last_id))
+        cursor.execute(
+            "INSERT INTO Client_Product_Balances (Client_ID, Product_ID, Balance, Transaction_Count) "
+            "SELECT Client_ID, Product_ID, SUM(Transaction_Amount), COUNT(*) FROM Transactions "
+            "WHERE Client_ID BETWEEN %s AND %s GROUP BY Client_ID, Product_ID",
+            (first_id, last_id)
+        )
+        cursor.execute(
+            "INSERT INTO Client_Balances (Client_ID, Balance, Transaction_Count) "
+            "SELECT Client_ID, SUM(Balance), SUM(Transaction_Count) FROM Client_Product_Balances "
+            "WHERE Client_ID BETWEEN %s AND %s GROUP BY Client_ID",
+            (first_id, last_id)
+        )
+        clients += cursor.rowcount
+        conn.commit()
+        echo(f"Rebuilt balances for clients {first_id}..{last_id}")
+    echo(f"Done: {clients} client balances rebuilt")
+    return clients
+
+
+def verify(conn, batch_size=1000, echo=print):
+    # Compares the stored totals with a fresh aggregate of Transactions and
+    # returns the (client_id, product_id) keys that disagree.
+    cursor = conn.cursor()
+    mismatches = []
+    for first_id, last_id in client_batches(conn.cursor(), batch_size):
+        cursor.execute(
+            "SELECT Client_ID, Product_ID, SUM(Transaction_Amount), COUNT(*) FROM Transactions "
+            "WHERE Client_ID BETWEEN %s AND %s GROUP BY Client_ID, Product_ID",
+            (first_id, last_id)
+        )
+        expected = {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+        cursor.execute(
+            "SELECT Client_ID, Product_ID, Balance, Transaction_Count FROM Client_Product_Balances "
+            "WHERE Client_ID BETWEEN %s AND %s",
+            (first_id, last_id)
+        )
+        stored = {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+        cursor.execute(
+            "SELECT Client_ID, Balance, Transaction_Count FROM Client_Balances "
+            "WHERE Client_ID BETWEEN %s AND %s",
+            (first_id, last_id)
+        )
+        stored_clients = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+        expected_clients = {}
+        for key in sorted(set(expected) | set(stored)):
+            want = expected.get(key, (0, 0))
+            have = stored.get(key, (0, 0))
+            if want != have:
+                mismatches.append(key)
+                echo(f"Client {key[0]} product {key[1]}: expected {want}, stored {have}")
+            total, count = expected_clients.get(key[0], (0, 0))
+            expected_clients[key[0]] = (total + want[0], count + want[1])
+
+        for client_id in sorted(set(expected_clients) | set(stored_clients)):
+            want = expected_clients.get(client_id, (0, 0))
+            have = stored_clients.get(client_id, (0, 0))
+            if want != have:
+                mismatches.append((client_id, None))
+                echo(f"Client {client_id}: expected {want}, stored {have}")
+        conn.rollback()
+    echo(f"Done: {len(mismatches)} mismatches")
+    return mismatches
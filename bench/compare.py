@@ -0,0 +1,63 @@
+"""Compare two bench.run result files and flag latency or throughput regressions.
+
+    python -m bench.compare bench/results/old.json bench/results/new.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(baseline, candidate, threshold=10.0):
+    # Returns (rows, regressions). A regression is a latency percentile that
+    # grew, or a throughput that fell, by more than threshold percent.
+    rows = []
+    regressions = []
+    sections = [("overall", baseline["overall"], candidate["overall"])]
+    sections += [
+        (op, baseline["operations"][op], candidate["operations"][op])
+        for op in sorted(set(baseline["operations"]) & set(candidate["operations"]))
+    ]
+    for name, before, after in sections:
+        for metric in METRICS:
+            delta = change(before.get(metric), after.get(metric))
+            rows.append((name, metric, before.get(metric), after.get(metric), delta))
+            if delta is None:
+                continue
+            worse = -delta if metric == "rps" else delta
+            if worse > threshold:
+                regressions.append((name, metric, delta))
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed change in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    print(f"{baseline.get('commit')} -> {candidate.get('commit')}")
+    for name, metric, before, after, delta in rows:
+        delta_text = "n/a" if delta is None else f"{delta:+.1f}%"
+        print(f"{name:32} {metric:8} {before!s:>12} {after!s:>12} {delta_text:>9}")
+    for name, metric, delta in regressions:
+        print(f"REGRESSION: {name} {metric} {delta:+.1f}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+"""Drive a mixed read/write workload against a running API and record latency.
+
+    python -m bench.run --url http://127.0.0.1:5000 --duration 60 --concurrency 16 --server-pid 1234
+
+The data volumes passed here must match the ones used with bench.seed so the
+generated IDs hit existing rows. Results are written as JSON (see
+bench.compare to diff two runs).
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from bench.seed import DAYS, FIRST_DATE, FIRST_NAMES, LAST_NAMES
+
+# Writes use IDs from this value upwards so they never collide with seeded
+# rows; every created row is deleted again by a later DELETE operation.
+WRITE_ID_BASE = 2_000_000_000
+
+
+class Workload:
+    # Builds requests for each named operation. Operations that need an
+    # existing row created by the benchmark fall back to creating one.
+    def __init__(self, employees, clients, products, transactions, cash_flows):
+        self.employees = employees
+        self.clients = clients
+        self.products = products
+        self.transactions = transactions
+        self.cash_flows = cash_flows
+        self._ids = itertools.count(WRITE_ID_BASE)
+        self._created = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def new_id(self):
+        with self._lock:
+            return next(self._ids)
+
+    def remember(self, resource_name, record_id):
+        with self._lock:
+            self._created[resource_name].append(record_id)
+
+    def take(self, resource_name):
+        with self._lock:
+            created = self._created[resource_name]
+            return created.popleft() if created else None
+
+    def peek(self, resource_name, rng):
+        with self._lock:
+            created = self._created[resource_name]
+            return created[rng.randrange(len(created))] if created else None
+
+    def day(self, rng):
+        return (FIRST_DATE + timedelta(days=rng.randrange(DAYS))).isoformat()
+
+    def month_range(self, rng):
+        start = FIRST_DATE + timedelta(days=rng.randrange(DAYS - 31))
+        return start.isoformat(), (start + timedelta(days=30)).isoformat()
+
+    def amount(self, rng):
+        return f"{rng.randint(100, 500_000) / 100:.2f}"
+
+    def record(self, resource_name, record_id, rng):
+        if resource_name == "employees":
+            return {"employee_ID": record_id, "name": f"Bench Employee {record_id}"}
+        if resource_name == "products":
+            return {"product_ID": record_id, "product_Type": "Bench"}
+        if resource_name == "clients":
+            return {
+                "client_ID": record_id, "name": f"Bench Client {record_id}",
+                "email": f"bench{record_id}@example.com", "phone": "+15550000000",
+                "client_Manager_Employee_ID": rng.randint(1, self.employees),
+            }
+        if resource_name == "transactions":
+            return {
+                "transaction_ID": record_id, "client_ID": rng.randint(1, self.clients),
+                "product_ID": rng.randint(1, self.products), "transaction_Amount": self.amount(rng),
+                "transaction_Date": self.day(rng),
+            }
+        return {
+            "cash_Flow_ID": record_id, "client_ID": rng.randint(1, self.clients),
+            "cash_Flow_Amount": self.amount(rng), "cash_Flow_Date": self.day(rng),
+        }
+
+    def create(self, resource_name, rng):
+        record_id = self.new_id()
+        return "POST", f"/{resource_name}", self.record(resource_name, record_id, rng), (resource_name, record_id)
+
+    def update(self, resource_name, rng):
+        record_id = self.peek(resource_name, rng)
+        if record_id is None:
+            return self.create(resource_name, rng)
+        return "PUT", f"/{resource_name}/{record_id}", self.record(resource_name, record_id, rng), None
+
+    def delete(self, resource_name, rng):
+        record_id = self.take(resource_name)
+        if record_id is None:
+            return self.create(resource_name, rng)
+        return "DELETE", f"/{resource_name}/{record_id}", None, None
+
+    def bulk(self, resource_name, rng, size=100):
+        records = [self.record(resource_name, self.new_id(), rng) for _ in range(size)]
+        key = "client_ID" if resource_name == "clients" else "transaction_ID"
+        for record in records:
+            self.remember(resource_name, record[key])
+        return "POST", f"/{resource_name}/bulk", records, None
+
+    def search_query(self, rng):
+        # What a user types into a search box: part of a name, an email
+        # address or a phone number, as seeded by bench.seed.
+        kind = rng.randrange(3)
+        if kind == 0:
+            return f"{rng.choice(FIRST_NAMES)[:rng.randint(2, 4)]}+{rng.choice(LAST_NAMES)[:2]}"
+        client_id = rng.randint(1, self.clients)
+        if kind == 1:
+            return f"client{client_id}"[:rng.randint(8, 12)]
+        return f"1555{client_id % 10_000_000:07d}"[:rng.randint(6, 11)]
+
+    def batch_get(self, resource_name, count, rng, size=100):
+        ids = [rng.randint(1, count) for _ in range(size)]
+        return "POST", f"/{resource_name}/batch-get", {"ids": ids}, None
+
+    def submit_job(self, rng):
+        if rng.random() < 0.5:
+            body = {"kind": "export", "resource": "transactions", "format": "ndjson",
+                    "filters": {"client_ID": rng.randint(1, self.clients)}}
+        else:
+            body = {"kind": "report", "group_by": "month", "filters": {"client_ID": rng.randint(1, self.clients)}}
+        return "POST", "/jobs", body, ("jobs", None)
+
+    def job_status(self, rng):
+        location = self.peek("jobs", rng)
+        if location is None:
+            return self.submit_job(rng)
+        return "GET", location, None, None
+
+    def operations(self):
+        # name -> (weight, request builder); builders return
+        # (method, path, json body, (resource, id) to remember on success).
+        # An id of None remembers the response's Location header instead.
+        def get(path_builder):
+            return lambda rng: ("GET", path_builder(rng), None, None)
+
+        def page(resource_name, count):
+            return get(lambda rng: f"/{resource_name}?after={rng.randrange(count)}&limit=100")
+
+        return {
+            "list_employees": (4, page("employees", self.employees)),
+            "list_products": (4, get(lambda rng: "/products")),
+            "list_clients": (6, page("clients", self.clients)),
+            "list_clients_by_manager": (
+                3, get(lambda rng: f"/clients?client_Manager_Employee_ID={rng.randint(1, self.employees)}")
+            ),
+            "list_transactions": (6, page("transactions", self.transactions)),
+            "list_transactions_by_client": (
+                8, get(lambda rng: "/transactions?client_ID=%d&from=%s&to=%s" % (
+                    rng.randint(1, self.clients), *self.month_range(rng)
+                ))
+            ),
+            "list_cash_flows": (3, page("cash_flows", self.cash_flows)),
+            "export_client_transactions": (
+                1, get(lambda rng: f"/transactions?format=ndjson&client_ID={rng.randint(1, self.clients)}")
+            ),
+            "client_summary": (8, get(lambda rng: f"/clients/{rng.randint(1, self.clients)}/summary")),
+            "client_balance": (10, get(lambda rng: f"/clients/{rng.randint(1, self.clients)}/balance")),
+            "report_by_product": (
+                2, get(lambda rng: "/reports/transactions?group_by=product&from=%s&to=%s" % self.month_range(rng))
+            ),
+            "report_by_month": (
+                1, get(lambda rng: f"/reports/transactions?group_by=month&client_ID={rng.randint(1, self.clients)}")
+            ),
+            "cash_flow_rollup": (
+                4, get(lambda rng: f"/cash_flows/rollup?granularity=day&client_ID={rng.randint(1, self.clients)}")
+            ),
+            "search_clients": (6, get(lambda rng: f"/clients/search?q={self.search_query(rng)}")),
+            "get_employee": (2, get(lambda rng: f"/employees/{rng.randint(1, self.employees)}")),
+            "get_product": (2, get(lambda rng: f"/products/{rng.randint(1, self.products)}")),
+            "get_client": (4, get(lambda rng: f"/clients/{rng.randint(1, self.clients)}")),
+            "get_transaction": (4, get(lambda rng: f"/transactions/{rng.randint(1, self.transactions)}")),
+            "get_cash_flow": (2, get(lambda rng: f"/cash_flows/{rng.randint(1, self.cash_flows)}")),
+            "batch_get_clients": (2, lambda rng: self.batch_get("clients", self.clients, rng)),
+            "batch_get_transactions": (2, lambda rng: self.batch_get("transactions", self.transactions, rng)),
+            "list_flagged_transactions": (2, get(lambda rng: "/transactions/flagged?limit=100")),
+            "snapshot_report_by_product": (
+                2, get(lambda rng: "/snapshots/reports/transactions?group_by=product&from=%s&to=%s"
+                       % self.month_range(rng))
+            ),
+            "list_changes": (3, get(lambda rng: "/changes?limit=100")),
+            "submit_job": (1, self.submit_job),
+            "job_status": (2, self.job_status),
+            "create_employee": (1, lambda rng: self.create("employees", rng)),
+            "update_employee": (1, lambda rng: self.update("employees", rng)),
+            "delete_employee": (1, lambda rng: self.delete("employees", rng)),
+            "create_product": (1, lambda rng: self.create("products", rng)),
+            "update_product": (1, lambda rng: self.update("products", rng)),
+            "delete_product": (1, lambda rng: self.delete("products", rng)),
+            "create_client": (2, lambda rng: self.create("clients", rng)),
+            "update_client": (2, lambda rng: self.update("clients", rng)),
+            "delete_client": (2, lambda rng: self.delete("clients", rng)),
+            "bulk_clients": (1, lambda rng: self.bulk("clients", rng)),
+            "create_transaction": (5, lambda rng: self.create("transactions", rng)),
+            "update_transaction": (3, lambda rng: self.update("transactions", rng)),
+            "delete_transaction": (3, lambda rng: self.delete("transactions", rng)),
+            "bulk_transactions": (1, lambda rng: self.bulk("transactions", rng)),
+            "create_cash_flow": (3, lambda rng: self.create("cash_flows", rng)),
+            "update_cash_flow": (2, lambda rng: self.update("cash_flows", rng)),
+            "delete_cash_flow": (2, lambda rng: self.delete("cash_flows", rng)),
+        }
+
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile of an already sorted list.
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "rps": round(len(values) / elapsed, 2) if elapsed else None,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else None,
+        "p50_ms": round(percentile(values, 50) * 1000, 3) if values else None,
+        "p95_ms": round(percentile(values, 95) * 1000, 3) if values else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 3) if values else None,
+        "max_ms": round(values[-1] * 1000, 3) if values else None,
+    }
+
+
+def peak_rss_kb(pid=None):
+    # VmHWM is the process's peak resident set size; without a server pid
+    # only the benchmark client itself can be measured.
+    if pid is not None:
+        try:
+            with open(f"/proc/{pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1])
+        except OSError:
+            return None
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def worker(url, operations, deadline, results, lock, rng, workload, warmup_until):
+    names = list(operations)
+    weights = [operations[name][0] for name in names]
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    while time.monotonic() < deadline:
+        op = rng.choices(names, weights)[0]
+        method, path, body, created = operations[op][1](rng)
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        payload = json.dumps(body).encode() if body is not None else None
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+            status = None
+        elapsed = time.perf_counter() - started
+
+        if created is not None and status in (201, 202):
+            resource_name, record_id = created
+            workload.remember(resource_name, response.getheader("Location") if record_id is None else record_id)
+        if time.monotonic() < warmup_until:
+            continue
+        # 404s are expected (random IDs, empty filters); anything else
+        # outside 2xx/3xx counts as an error.
+        failed = status is None or (status >= 400 and status != 404)
+        with lock:
+            latencies, errors = results[op]
+            latencies.append(elapsed)
+            results[op] = (latencies, errors + failed)
+    connection.close()
+
+
+def run(url, workload, duration, concurrency, warmup=0, seed=0, server_pid=None):
+    operations = workload.operations()
+    results = defaultdict(lambda: ([], 0))
+    lock = threading.Lock()
+    started = time.monotonic()
+    warmup_until = started + warmup
+    deadline = warmup_until + duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(url, operations, deadline, results, lock, random.Random(seed + i), workload, warmup_until)
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - warmup_until
+
+    all_latencies = [value for latencies, _ in results.values() for value in latencies]
+    all_errors = sum(errors for _, errors in results.values())
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "config": {
+            "url": url, "duration": duration, "warmup": warmup, "concurrency": concurrency, "seed": seed,
+            "employees": workload.employees, "clients": workload.clients, "products": workload.products,
+            "transactions": workload.transactions, "cash_flows": workload.cash_flows,
+        },
+        "overall": summarize(all_latencies, all_errors, elapsed),
+        "operations": {op: summarize(latencies, errors, elapsed) for op, (latencies, errors) in sorted(results.items())},
+        "peak_rss_kb": {"server": peak_rss_kb(server_pid) if server_pid else None, "client": peak_rss_kb()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--duration", type=float, default=60, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=10, help="unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server-pid", type=int, help="API server process to read peak RSS from")
+    parser.add_argument("--employees", type=int, default=10_000)
+    parser.add_argument("--clients", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=50_000_000)
+    parser.add_argument("--cash-flows", type=int, default=1_000_000)
+    parser.add_argument("--output", help="result file (default bench/results/<commit>-<time>.json)")
+    args = parser.parse_args(argv)
+
+    workload = Workload(args.employees, args.clients, args.products, args.transactions, args.cash_flows)
+    result = run(
+        args.url, workload, args.duration, args.concurrency,
+        warmup=args.warmup, seed=args.seed, server_pid=args.server_pid
+    )
+
+    output = args.output
+    if output is None:
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+        os.makedirs(directory, exist_ok=True)
+        output = os.path.join(
+            directory, f"{(result['commit'] or 'unknown')[:12]}-{time.strftime('%Y%m%d%H%M%S')}.json"
+        )
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    overall = result["overall"]
+    print(
+        f"{overall['requests']} requests, {overall['rps']} req/s, p50 {overall['p50_ms']}ms, "
+        f"p95 {overall['p95_ms']}ms, p99 {overall['p99_ms']}ms, {overall['errors']} errors"
+    )
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
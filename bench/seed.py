@@ -0,0 +1,164 @@
+"""Fill a local database with generated data for benchmarking.
+
+    python -m bench.seed --employees 10000 --clients 1000000 --transactions 50000000
+
+Connection settings come from the same MYSQL_* environment variables as the
+app. Data is generated deterministically from --seed, so two runs with the
+same arguments produce identical tables.
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import balances
+import cash_flows
+import db
+import schema
+
+PRODUCT_TYPES = ("Savings", "Checking", "Mortgage", "Brokerage", "Credit Card", "Pension", "Term Deposit", "Loan")
+FIRST_NAMES = ("Ana", "Ben", "Carla", "David", "Elena", "Farid", "Grace", "Hiro", "Ines", "Jon", "Kofi", "Lena")
+LAST_NAMES = ("Garcia", "Smith", "Tan", "Müller", "Okafor", "Reyes", "Kowalski", "Sato", "Dubois", "Haddad")
+FIRST_DATE = date(2015, 1, 1)
+DAYS = 365 * 10
+
+# Children first, so the deletes never trip a foreign key.
+TABLES = (
+    "Cash_Flow_Buckets", "Cash_Flows", "Client_Product_Balances", "Client_Balances",
+    "Transaction_IDs", "Transactions", "Clients", "Products", "Employees",
+)
+
+
+def name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def amount(rng, signed=False):
+    value = Decimal(rng.randint(100, 2_000_000)) / 100
+    return -value if signed and rng.random() < 0.4 else value
+
+
+def employees(rng, count):
+    for employee_id in range(1, count + 1):
+        yield employee_id, name(rng)
+
+
+def products(rng, count):
+    for product_id in range(1, count + 1):
+        yield product_id, PRODUCT_TYPES[(product_id - 1) % len(PRODUCT_TYPES)]
+
+
+def clients(rng, count, employee_count):
+    for client_id in range(1, count + 1):
+        yield (
+            client_id, name(rng), f"client{client_id}@example.com",
+            f"+1555{client_id % 10_000_000:07d}", rng.randint(1, employee_count)
+        )
+
+
+def transactions(rng, count, client_count, product_count):
+    for transaction_id in range(1, count + 1):
+        yield (
+            transaction_id, rng.randint(1, client_count), rng.randint(1, product_count),
+            amount(rng), FIRST_DATE + timedelta(days=rng.randrange(DAYS))
+        )
+
+
+def flows(rng, count, client_count):
+    for cash_flow_id in range(1, count + 1):
+        yield (
+            cash_flow_id, rng.randint(1, client_count), amount(rng, signed=True),
+            FIRST_DATE + timedelta(days=rng.randrange(DAYS))
+        )
+
+
+def insert(conn, table, columns, rows, batch_size, echo=print):
+    cursor = conn.cursor()
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    started = time.perf_counter()
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+            batch = []
+            if total % (batch_size * 100) == 0:
+                echo(f"{table}: {total} rows")
+    if batch:
+        cursor.executemany(sql, batch)
+        conn.commit()
+        total += len(batch)
+    echo(f"{table}: {total} rows in {time.perf_counter() - started:.1f}s")
+    return total
+
+
+def seed(conn, employee_count, client_count, product_count, transaction_count, cash_flow_count,
+         batch_size=5000, random_seed=42, truncate=False, echo=print):
+    rng = random.Random(random_seed)
+    missing = schema.pending(conn)
+    if missing:
+        raise SystemExit(f"Pending schema migrations: {', '.join(missing)}; run 'flask --app app schema migrate' first")
+    cursor = conn.cursor()
+    # Bulk loading only: skip per-row constraint checks for this session.
+    cursor.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+    if truncate:
+        for table in TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+        conn.commit()
+
+    insert(conn, "Employees", ["Employee_ID", "Name"], employees(rng, employee_count), batch_size, echo)
+    insert(conn, "Products", ["Product_ID", "Product_Type"], products(rng, product_count), batch_size, echo)
+    insert(
+        conn, "Clients", ["Client_ID", "Name", "Email", "Phone", "Client_Manager_Employee_ID"],
+        clients(rng, client_count, employee_count), batch_size, echo
+    )
+    insert(
+        conn, "Transactions",
+        ["Transaction_ID", "Client_ID", "Product_ID", "Transaction_Amount", "Transaction_Date"],
+        transactions(rng, transaction_count, client_count, product_count), batch_size, echo
+    )
+    insert(
+        conn, "Transaction_IDs", ["Transaction_ID"],
+        ((transaction_id,) for transaction_id in range(1, transaction_count + 1)), batch_size, echo
+    )
+    insert(
+        conn, "Cash_Flows", ["Cash_Flow_ID", "Client_ID", "Cash_Flow_Amount", "Cash_Flow_Date"],
+        flows(rng, cash_flow_count, client_count), batch_size, echo
+    )
+    cursor.execute("SET SESSION unique_checks = 1, foreign_key_checks = 1")
+
+    balances.rebuild(conn, batch_size=batch_size, echo=echo)
+    cash_flows.backfill(conn, batch_size=batch_size, echo=echo)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--employees", type=int, default=10_000)
+    parser.add_argument("--clients", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=50_000_000)
+    parser.add_argument("--cash-flows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="delete existing rows first")
+    args = parser.parse_args(argv)
+
+    settings = db.settings_from_env()
+    conn = db.mysql_connect_factory(
+        settings["host"], settings["user"], settings["password"], settings["database"], settings["port"]
+    )()
+    try:
+        seed(
+            conn, args.employees, args.clients, args.products, args.transactions, args.cash_flows,
+            batch_size=args.batch_size, random_seed=args.seed, truncate=args.truncate
+        )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheBackend:
+    # Interface for a cache shared between worker processes (e.g. Redis or
+    # memcached). Values must be picklable; ttl is in seconds.
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def incr(self, key):
+        raise NotImplementedError
+
+    def add(self, key, value, ttl):
+        # Atomically sets key only if it is absent; returns whether it did.
+        raise NotImplementedError
+
+
+class TTLCache:
+    # In-process LRU bounded by entry count, with a per-entry expiry.
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] >= time.monotonic():
+                return False
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LocalBackend(CacheBackend):
+    # Single-process stand-in for a shared backend, used in tests.
+    def __init__(self):
+        self._cache = TTLCache(max_entries=100000)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl):
+        self._cache.set(key, value, ttl)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+    def incr(self, key):
+        with self._lock:
+            value = (self._cache.get(key) or 0) + 1
+            self._cache.set(key, value, float("inf"))
+            return value
+
+    def add(self, key, value, ttl):
+        return self._cache.add(key, value, ttl)
+
+
+class Cache:
+    # Two-level cache: the local TTLCache in front of an optional shared
+    # backend. Entries are either keyed by record ID and that record's
+    # generation or belong to a namespace-wide "list" generation, so a write
+    # can orphan the one record it touched and every cached list page in
+    # O(1). With a backend the generations live there, which costs one
+    # backend read per key but keeps every process's local layer in step.
+    #
+    # Without one they are kept here, for the max_entries most recently
+    # bumped keys. Every bump takes the next value of one counter, and a key
+    # that is no longer tracked reads the highest generation evicted so far,
+    # which is never lower than its own last one: an entry stored under an
+    # older generation cannot come back.
+    def __init__(self, max_entries=1024, ttl=300, backend=None):
+        self.local = TTLCache(max_entries, ttl)
+        self.backend = backend
+        self.ttl = ttl
+        self._generations = OrderedDict()
+        self._last_generation = 0
+        self._evicted_generation = 0
+        self._lock = threading.Lock()
+
+    def configure(self, max_entries, ttl):
+        self.local.max_entries = max_entries
+        self.local.ttl = ttl
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.local.set(key, value, ttl)
+        if self.backend is not None:
+            self.backend.set(key, value, self.ttl if ttl is None else ttl)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def _generation(self, key):
+        if self.backend is not None:
+            return self.backend.get(key) or 0
+        with self._lock:
+            return self._generations.get(key, self._evicted_generation)
+
+    def _bump(self, key):
+        if self.backend is not None:
+            self.backend.incr(key)
+        else:
+            with self._lock:
+                self._last_generation += 1
+                self._generations[key] = self._last_generation
+                self._generations.move_to_end(key)
+                while len(self._generations) > self.local.max_entries:
+                    _, generation = self._generations.popitem(last=False)
+                    self._evicted_generation = max(self._evicted_generation, generation)
+
+    def generation(self, namespace):
+        return self._generation(f"{namespace}:generation")
+
+    def list_key(self, namespace, variant):
+        return f"{namespace}:list:{self.generation(namespace)}:{variant}"
+
+    def record_key(self, namespace, record_id):
+        # Carries the record's own generation (kept in the backend when there
+        # is one), so after a write no process's local layer still holds a
+        # live key for the old entry, and a fill that read the row before
+        # the write and took its key then stores under a key nobody reads.
+        generation = self._generation(f"{namespace}:id:{record_id}:generation")
+        return f"{namespace}:id:{record_id}:{generation}"
+
+    def invalidate(self, namespace, record_id=None):
+        if record_id is not None:
+            key = self.record_key(namespace, record_id)
+            self._bump(f"{namespace}:id:{record_id}:generation")
+            self.delete(key)
+        self._bump(f"{namespace}:generation")
+
+    def clear(self):
+        self.local.clear()
+        with self._lock:
+            self._generations.clear()
+            self._evicted_generation = self._last_generation
@@ -0,0 +1,124 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import balances
+
+# Cash flow amounts are signed: positive values are inflows, negative values
+# outflows. Cash_Flow_Buckets (migration 0004) keeps per-client daily and
+# monthly totals that are updated with every write, so range queries read
+# one row per bucket instead of scanning Cash_Flows.
+GRANULARITIES = ("day", "month")
+
+UPSERT_BUCKET = (
+    "INSERT INTO Cash_Flow_Buckets (Client_ID, Granularity, Bucket_Start, Inflow, Outflow, Cash_Flow_Count) "
+    "VALUES (%s, %s, %s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE Inflow = Inflow + VALUES(Inflow), Outflow = Outflow + VALUES(Outflow), "
+    "Cash_Flow_Count = Cash_Flow_Count + VALUES(Cash_Flow_Count)"
+)
+
+
+def as_date(value):
+    # Dates and datetimes from the driver, or ISO date strings. The whole
+    # string must be the date, as resources.valid_date requires of payloads.
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+def bucket_start(value, granularity):
+    value = as_date(value)
+    return value if granularity == "day" else value.replace(day=1)
+
+
+def collect_deltas(added=(), removed=()):
+    # added/removed are (client_id, amount, date) triples; returns
+    # {(client_id, granularity, bucket_start): (inflow, outflow, count)}.
+    deltas = {}
+    for sign, rows in ((1, added), (-1, removed)):
+        for client_id, amount, flow_date in rows:
+            amount = Decimal(str(amount))
+            inflow = max(amount, Decimal(0))
+            outflow = max(-amount, Decimal(0))
+            for granularity in GRANULARITIES:
+                key = (client_id, granularity, bucket_start(flow_date, granularity))
+                total_in, total_out, count = deltas.get(key, (Decimal(0), Decimal(0), 0))
+                deltas[key] = (total_in + sign * inflow, total_out + sign * outflow, count + sign)
+    return {key: delta for key, delta in deltas.items() if delta != (0, 0, 0)}
+
+
+def apply_deltas(cursor, added=(), removed=()):
+    deltas = collect_deltas(added, removed)
+    if deltas:
+        cursor.executemany(UPSERT_BUCKET, [
+            key + delta for key, delta in sorted(deltas.items())
+        ])
+
+
+def compute_buckets(client_ids, amounts, dates):
+    # Vectorized equivalent of collect_deltas for backfills. Amounts are
+    # converted to integer cents through Decimal, never float, and summed as
+    # integers so totals stay exact.
+    import numpy as np
+    import pandas as pd
+
+    cents = np.fromiter(
+        (int(Decimal(str(amount)).scaleb(2)) for amount in amounts), np.int64, len(amounts)
+    )
+    frame = pd.DataFrame({
+        "client_id": np.asarray(client_ids, dtype=np.int64),
+        "inflow": np.where(cents > 0, cents, 0),
+        "outflow": np.where(cents < 0, -cents, 0),
+    })
+    days = pd.to_datetime(pd.Series(dates))
+
+    rows = []
+    for granularity, starts in (
+        ("day", days.dt.normalize()),
+        ("month", days.dt.to_period("M").dt.start_time),
+    ):
+        grouped = frame.groupby([frame["client_id"], starts.rename("bucket_start")]).agg(
+            inflow=("inflow", "sum"), outflow=("outflow", "sum"), count=("inflow", "size")
+        )
+        for (client_id, start), inflow, outflow, count in zip(
+            grouped.index, grouped["inflow"], grouped["outflow"], grouped["count"]
+        ):
+            rows.append((
+                int(client_id), granularity, start.date(),
+                Decimal(int(inflow)).scaleb(-2), Decimal(int(outflow)).scaleb(-2), int(count)
+            ))
+    return rows
+
+
+def backfill(conn, batch_size=1000, echo=print):
+    # Recomputes the buckets one client range at a time. The locking read
+    # holds off concurrent cash flow writes for the range until its new
+    # buckets are committed, so incremental updates are never lost or
+    # double-counted.
+    cursor = conn.cursor()
+    buckets = 0
+    for first_id, last_id in balances.client_batches(conn.cursor(), batch_size, ("Clients", "Cash_Flows")):
+        cursor.execute(
+            "SELECT Client_ID, Cash_Flow_Amount, Cash_Flow_Date FROM Cash_Flows "
+            "WHERE Client_ID BETWEEN %s AND %s LOCK IN SHARE MODE",
+            (first_id, last_id)
+        )
+        flows = cursor.fetchall()
+        cursor.execute(
+            "DELETE FROM Cash_Flow_Buckets WHERE Client_ID BETWEEN %s AND %s", (first_id, last_id)
+        )
+        if flows:
+            client_ids, amounts, dates = zip(*flows)
+            rows = compute_buckets(client_ids, amounts, dates)
+            cursor.executemany(
+                "INSERT INTO Cash_Flow_Buckets "
+                "(Client_ID, Granularity, Bucket_Start, Inflow, Outflow, Cash_Flow_Count) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                rows
+            )
+            buckets += len(rows)
+        conn.commit()
+        echo(f"Rebuilt cash flow buckets for clients {first_id}..{last_id}")
+    echo(f"Done: {buckets} buckets written")
+    return buckets
@@ -0,0 +1,177 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import serialization
+
+# Every write to a ledger table also appends a row to Change_Log, in the
+# same database transaction, so consumers can follow the ledger by
+# sequence number (Change_ID) instead of re-reading whole tables.
+INSERTED = "insert"
+UPDATED = "update"
+DELETED = "delete"
+
+# Change_IDs come from AUTO_INCREMENT, so they are handed out in insert
+# order but become visible in commit order: a reader can see 12 before 11
+# has committed, and a rolled-back insert leaves 11 missing for good.
+# Reads therefore stop at a gap until the change after it is older than
+# SETTLE_SECONDS, by which point the gap is taken to be permanent. Writes
+# log their changes just before committing to keep that window short.
+SETTLE_SECONDS = 5
+
+log = logging.getLogger("private_banking.changes")
+
+INSERT = "INSERT INTO Change_Log (Resource, Record_ID, Action, Data) VALUES (%s, %s, %s, %s)"
+READ = (
+    "SELECT Change_ID, Resource, Record_ID, Action, Data, Changed_At, "
+    "Changed_At < NOW(6) - INTERVAL %s SECOND FROM Change_Log "
+    "WHERE Change_ID > %s ORDER BY Change_ID LIMIT %s"
+)
+
+
+def record(cursor, resource, action, records):
+    # Logs (record_id, data) pairs with the caller's database transaction;
+    # data is the record as the API returns it, or None for deletes.
+    cursor.executemany(INSERT, [
+        (resource, record_id, action, None if data is None else serialization.dumps_bytes(data).decode())
+        for record_id, data in records
+    ])
+
+
+def read(cursor, since, limit, settle_seconds=SETTLE_SECONDS):
+    cursor.execute(READ, (settle_seconds, since, limit))
+    changes = []
+    expected = since + 1
+    for change_id, resource, record_id, action, data, changed_at, settled in cursor.fetchall():
+        if change_id != expected and not settled:
+            break
+        changes.append({
+            "change_ID": change_id,
+            "resource": resource,
+            "record_ID": record_id,
+            "action": action,
+            "data": json.loads(data) if data is not None else None,
+            "changed_At": changed_at,
+        })
+        expected = change_id + 1
+    return changes
+
+
+def read_resource(cursor, resource, since, until, limit):
+    # Changes to one resource after since and up to until, oldest first.
+    # until should come from latest(), so every change before it has either
+    # committed or is gone for good.
+    cursor.execute(
+        "SELECT Change_ID, Record_ID, Action, Data FROM Change_Log "
+        "WHERE Change_ID > %s AND Change_ID <= %s AND Resource = %s ORDER BY Change_ID LIMIT %s",
+        (since, until, resource, limit)
+    )
+    return [
+        (change_id, record_id, action, json.loads(data) if data is not None else None)
+        for change_id, record_id, action, data in cursor.fetchall()
+    ]
+
+def latest(cursor, settle_seconds=SETTLE_SECONDS):
+    # The newest sequence number a reader can start after without missing
+    # changes that are still being committed.
+    cursor.execute(
+        "SELECT COALESCE(MAX(Change_ID), 0) FROM Change_Log WHERE Changed_At < NOW(6) - INTERVAL %s SECOND",
+        (settle_seconds,)
+    )
+    return cursor.fetchone()[0]
+
+
+class ChangeFeed:
+    # Tails Change_Log on one background thread for every stream open in
+    # this process, so N subscribers cost one query per poll rather than N.
+    # The most recent changes are kept in memory; a subscriber further
+    # behind than that catches up with read() first. The thread runs only
+    # while there are subscribers.
+    def __init__(self, pool, settle_seconds=SETTLE_SECONDS, poll_seconds=1.0, buffer_size=10000,
+                 batch_size=1000):
+        self.pool = pool
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self._changes = deque(maxlen=buffer_size)
+        # The buffer holds every change after _start up to _position.
+        self._start = None
+        self._position = None
+        self._subscribers = 0
+        self._thread = None
+        self._available = threading.Condition()
+
+    def read(self, since, limit):
+        conn = self.pool.acquire()
+        try:
+            return read(conn.cursor(), since, limit, self.settle_seconds)
+        finally:
+            self.pool.release(conn)
+
+    def latest(self):
+        conn = self.pool.acquire()
+        try:
+            return latest(conn.cursor(), self.settle_seconds)
+        finally:
+            self.pool.release(conn)
+
+    def subscribe(self):
+        with self._available:
+            self._subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self):
+        with self._available:
+            self._subscribers -= 1
+
+    def wait(self, since, timeout):
+        # Changes after since, waiting up to timeout for the first one.
+        # Returns None when since is older than the buffer.
+        deadline = time.monotonic() + timeout
+        with self._available:
+            while True:
+                if self._position is not None:
+                    if since < self._start:
+                        return None
+                    if since < self._position:
+                        return [change for change in self._changes if change["change_ID"] > since]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._available.wait(remaining)
+
+    def poll(self):
+        if self._position is None:
+            position = self.latest()
+            with self._available:
+                self._start = self._position = position
+                self._available.notify_all()
+        while True:
+            batch = self.read(self._position, self.batch_size)
+            if batch:
+                with self._available:
+                    for change in batch:
+                        if len(self._changes) == self._changes.maxlen:
+                            self._start = self._changes.popleft()["change_ID"]
+                        self._changes.append(change)
+                    self._position = batch[-1]["change_ID"]
+                    self._available.notify_all()
+            if len(batch) < self.batch_size:
+                return
+
+    def _run(self):
+        while True:
+            with self._available:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                self.poll()
+            except Exception:
+                # Subscribers get keep-alives until a poll succeeds again.
+                log.exception("Polling the change log failed")
+            time.sleep(self.poll_seconds)
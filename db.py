@@ -0,0 +1,407 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def mysql_connect_factory(host, user, password, database, port=3306):
+    def connect():
+        # Imported lazily so the pool itself has no hard dependency on the
+        # driver (tests and tooling can hand it any DB-API connect callable).
+        import MySQLdb
+        from MySQLdb.constants import CLIENT
+
+        # FOUND_ROWS makes rowcount report matched rather than changed rows, so
+        # an UPDATE that leaves a row as it was is not mistaken for a miss.
+        return MySQLdb.connect(
+            host=host, user=user, passwd=password, db=database, port=port,
+            charset="utf8mb4", client_flag=CLIENT.FOUND_ROWS
+        )
+    return connect
+
+
+def server_side_cursor(conn):
+    # Unbuffered cursor: rows stream from the server as they are fetched
+    # instead of the whole result set being loaded by execute().
+    import MySQLdb.cursors
+
+    return conn.cursor(MySQLdb.cursors.SSCursor)
+
+
+def settings_from_env(environ=None):
+    environ = os.environ if environ is None else environ
+    return {
+        "host": environ.get("MYSQL_HOST", "localhost"),
+        "user": environ.get("MYSQL_USER", "root"),
+        "password": environ.get("MYSQL_PASSWORD", ""),
+        "database": environ.get("MYSQL_DB", "mini_private_banking"),
+        "port": int(environ.get("MYSQL_PORT", 3306)),
+        "min_size": int(environ.get("MYSQL_POOL_MIN_SIZE", 1)),
+        "max_size": int(environ.get("MYSQL_POOL_MAX_SIZE", 10)),
+        "max_lifetime": float(environ.get("MYSQL_POOL_MAX_LIFETIME", 3600)),
+        "timeout": float(environ.get("MYSQL_POOL_TIMEOUT", 5)),
+    }
+
+
+class ConnectionPool:
+    def __init__(self, connect, min_size=1, max_size=10, max_lifetime=3600, timeout=5,
+                 health_check=True):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size, max_size >= 1")
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.health_check = health_check
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = deque()
+        self._created_at = {}
+        self._size = 0
+        self._warmed = False
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "health_check_failures": 0,
+            "expired": 0,
+        }
+
+    @classmethod
+    def from_env(cls, environ=None, **overrides):
+        settings = settings_from_env(environ)
+        settings.update(overrides)
+        connect = mysql_connect_factory(
+            settings["host"], settings["user"], settings["password"],
+            settings["database"], settings["port"]
+        )
+        return cls(
+            connect, min_size=settings["min_size"], max_size=settings["max_size"],
+            max_lifetime=settings["max_lifetime"], timeout=settings["timeout"]
+        )
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        self._warm_up()
+
+        conn = self._checkout(deadline, timeout)
+        waited = time.monotonic() - started
+        if conn is None:
+            conn = self._open()
+        elif not self._usable(conn):
+            # Replace it in the same slot rather than queueing again.
+            self._retire(conn)
+            conn = self._open()
+
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+        return conn
+
+    def release(self, conn, discard=False):
+        if not discard:
+            try:
+                # Never hand the next request a connection with an open
+                # transaction (or a stale REPEATABLE READ snapshot).
+                conn.rollback()
+            except Exception:
+                discard = True
+        if discard or self._closed or self._expired(conn):
+            self._discard(conn)
+            return
+        with self._available:
+            self._idle.append(conn)
+            self._available.notify()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+            })
+        return stats
+
+    def _warm_up(self):
+        with self._lock:
+            if self._warmed:
+                return
+            self._warmed = True
+        for _ in range(self.min_size):
+            with self._lock:
+                if self._size >= self.min_size:
+                    break
+                self._size += 1
+            try:
+                conn = self._create()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                break
+            with self._available:
+                self._idle.append(conn)
+                self._available.notify()
+
+    def _checkout(self, deadline, timeout):
+        # Returns an idle connection, or None once a slot has been reserved
+        # for the caller to open a new one.
+        with self._available:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self._idle:
+                    # LIFO keeps the most recently used connections warm and
+                    # lets the rest age out.
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No database connection available within {timeout:g}s "
+                        f"({self.max_size} in use)"
+                    )
+                self._available.wait(remaining)
+
+    def _open(self):
+        try:
+            return self._create()
+        except Exception:
+            with self._available:
+                self._size -= 1
+                self._available.notify()
+            raise
+
+    def _create(self):
+        conn = self.connect()
+        with self._lock:
+            self._created_at[id(conn)] = time.monotonic()
+            self._stats["connections_created"] += 1
+        return conn
+
+    def _retire(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created_at.pop(id(conn), None)
+            self._stats["connections_closed"] += 1
+
+    def _discard(self, conn):
+        self._retire(conn)
+        with self._available:
+            self._size -= 1
+            self._available.notify()
+
+    def _expired(self, conn):
+        created_at = self._created_at.get(id(conn))
+        return created_at is not None and time.monotonic() - created_at > self.max_lifetime
+
+    def _usable(self, conn):
+        if self._expired(conn):
+            with self._lock:
+                self._stats["expired"] += 1
+            return False
+        if not self.health_check:
+            return True
+        try:
+            conn.ping()
+        except Exception:
+            with self._lock:
+                self._stats["health_check_failures"] += 1
+            return False
+        return True
+
+
+ROUND_ROBIN = "round_robin"
+LEAST_LOADED = "least_loaded"
+
+
+def replica_settings_from_env(environ=None):
+    # MYSQL_REPLICAS lists read replicas as comma-separated host[:port]
+    # entries. They share the primary's credentials, database and pool sizes.
+    environ = os.environ if environ is None else environ
+    settings = settings_from_env(environ)
+    replicas = []
+    for entry in environ.get("MYSQL_REPLICAS", "").split(","):
+        host, _, port = entry.strip().partition(":")
+        if host:
+            replicas.append(dict(settings, host=host, port=int(port) if port else settings["port"]))
+    return replicas
+
+
+def replica_lag(conn):
+    # Seconds the replica is behind its source, or None when it is not
+    # replicating (stopped, broken, or not a replica at all).
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SHOW REPLICA STATUS")
+    except Exception:
+        # Servers before MySQL 8.0.22 only know the old name.
+        cursor.execute("SHOW SLAVE STATUS")
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    status = dict(zip((column[0] for column in cursor.description), row))
+    lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+    return None if lag is None else float(lag)
+
+
+class Replica:
+    # A replica's pool and the outcome of its last lag check.
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.lag = None
+        self.checked_at = None
+        self.skipped = 0
+
+    def load(self):
+        stats = self.pool.stats()
+        return stats["in_use"] / stats["max_size"]
+
+
+class ReplicaSet:
+    # Routes reads across replica pools. A replica is used only while its
+    # last lag check (at most check_interval seconds old) found it
+    # replicating and no more than max_lag seconds behind; when none
+    # qualifies the caller reads from the primary instead.
+    def __init__(self, replicas, strategy=ROUND_ROBIN, max_lag=5, check_interval=1, clock=time.time):
+        if strategy not in (ROUND_ROBIN, LEAST_LOADED):
+            raise ValueError(f"Unknown replica strategy {strategy!r}")
+        if not replicas:
+            raise ValueError("A replica set needs at least one replica")
+        self.replicas = [Replica(name, pool) for name, pool in replicas]
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.clock = clock
+        self.fallbacks = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, environ=None):
+        # None when MYSQL_REPLICAS is not set.
+        environ = os.environ if environ is None else environ
+        replicas = []
+        for settings in replica_settings_from_env(environ):
+            connect = mysql_connect_factory(
+                settings["host"], settings["user"], settings["password"],
+                settings["database"], settings["port"]
+            )
+            pool = ConnectionPool(
+                connect, min_size=settings["min_size"], max_size=settings["max_size"],
+                max_lifetime=settings["max_lifetime"], timeout=settings["timeout"]
+            )
+            replicas.append((f"{settings['host']}:{settings['port']}", pool))
+        if not replicas:
+            return None
+        return cls(
+            replicas, strategy=environ.get("MYSQL_REPLICA_STRATEGY", ROUND_ROBIN),
+            max_lag=float(environ.get("MYSQL_REPLICA_MAX_LAG", 5)),
+            check_interval=float(environ.get("MYSQL_REPLICA_LAG_CHECK_INTERVAL", 1))
+        )
+
+    def catch_up_seconds(self):
+        # Any replica still in use has applied a write this long after it
+        # was committed.
+        return math.ceil(self.max_lag + self.check_interval) + 1
+
+    def usable(self, replica, written_at=None):
+        # The lag is reported in whole seconds, so a replica checked at T
+        # with lag L has applied everything committed before T - L - 1.
+        if replica.lag is None or replica.lag > self.max_lag:
+            return False
+        return written_at is None or replica.checked_at - replica.lag - 1 >= written_at
+
+    def acquire(self, written_at=None):
+        # Returns (replica, connection) from the first replica that is up,
+        # within max_lag and, given written_at (a time.time() value), known
+        # to have applied writes committed up to then. Returns (None, None)
+        # when the read should go to the primary. A full replica pool is
+        # skipped rather than waited on.
+        for replica in self._candidates():
+            if (replica.checked_at is not None and self.clock() - replica.checked_at < self.check_interval
+                    and not self.usable(replica, written_at)):
+                replica.skipped += 1
+                continue
+            try:
+                conn = replica.pool.acquire(timeout=0)
+            except PoolTimeout:
+                # Busy, not broken: its last lag check still stands.
+                replica.skipped += 1
+                continue
+            except Exception:
+                replica.lag, replica.checked_at = None, self.clock()
+                replica.skipped += 1
+                continue
+            if replica.checked_at is None or self.clock() - replica.checked_at >= self.check_interval:
+                try:
+                    replica.lag = replica_lag(conn)
+                except Exception:
+                    replica.pool.release(conn, discard=True)
+                    replica.lag, replica.checked_at = None, self.clock()
+                    replica.skipped += 1
+                    continue
+                replica.checked_at = self.clock()
+            if self.usable(replica, written_at):
+                return replica, conn
+            replica.pool.release(conn)
+            replica.skipped += 1
+        with self._lock:
+            self.fallbacks += 1
+        return None, None
+
+    def _candidates(self):
+        with self._lock:
+            start = self._next
+            self._next = (start + 1) % len(self.replicas)
+        ordered = self.replicas[start:] + self.replicas[:start]
+        if self.strategy == LEAST_LOADED:
+            # The sort is stable, so equally loaded replicas keep taking turns.
+            ordered.sort(key=lambda replica: replica.load())
+        return ordered
+
+    def close(self):
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def stats(self):
+        replicas = []
+        for replica in self.replicas:
+            stats = replica.pool.stats()
+            stats.update({
+                "lag_seconds": -1 if replica.lag is None else replica.lag,
+                "usable": int(replica.checked_at is not None and self.usable(replica)),
+                "skipped": replica.skipped,
+            })
+            replicas.append((replica.name, stats))
+        return {"replicas": replicas, "fallbacks": self.fallbacks}
@@ -0,0 +1,85 @@
+import contextlib
+import hashlib
+import threading
+import time
+
+import cache
+
+PENDING = "pending"
+DONE = "done"
+
+
+def fingerprint(method, path, body):
+    digest = hashlib.sha256()
+    for part in (method.encode(), path.encode(), body):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    # Remembers the response to each Idempotency-Key for ttl seconds. A key
+    # is first claimed with a short-lived "pending" marker so a concurrent
+    # retry can be told the original is still running. The owner renews the
+    # marker while its handler runs (see held), so it only expires, and lets
+    # a retry through, once the worker handling it has died. With a backend
+    # (any cache.CacheBackend) the keys are shared between worker processes.
+    def __init__(self, max_entries=10000, ttl=86400, pending_ttl=60, backend=None):
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.store = backend if backend is not None else cache.TTLCache(max_entries, ttl)
+        self._held = {}
+        self._held_lock = threading.Lock()
+        self._renewer = None
+
+    def configure(self, max_entries, ttl):
+        self.ttl = ttl
+        if isinstance(self.store, cache.TTLCache):
+            self.store.max_entries = max_entries
+            self.store.ttl = ttl
+
+    def begin(self, key, request_fingerprint):
+        # Returns (None, None) when the caller now owns the key, otherwise
+        # the state and stored record of an earlier request with that key.
+        while True:
+            if self.store.add(key, (PENDING, request_fingerprint, None), self.pending_ttl):
+                return None, None
+            entry = self.store.get(key)
+            if entry is not None:
+                return entry[0], entry
+            # Expired between add() and get(); try to claim it again.
+
+    @contextlib.contextmanager
+    def held(self, key, request_fingerprint):
+        # Keeps the owner's pending marker alive for as long as the block
+        # runs, however slow the write is. One renewer thread serves every
+        # held key and exits once none are left.
+        with self._held_lock:
+            self._held[key] = request_fingerprint
+            if self._renewer is None:
+                self._renewer = threading.Thread(target=self._renew, name="idempotency-renewer", daemon=True)
+                self._renewer.start()
+        try:
+            yield
+        finally:
+            with self._held_lock:
+                del self._held[key]
+
+    def _renew(self):
+        # Renews every held marker each third of pending_ttl. Renewals run
+        # under the lock, so none lands after its block has ended and
+        # overwrites the stored response.
+        while True:
+            time.sleep(self.pending_ttl / 3)
+            with self._held_lock:
+                if not self._held:
+                    self._renewer = None
+                    return
+                for key, request_fingerprint in self._held.items():
+                    self.store.set(key, (PENDING, request_fingerprint, None), self.pending_ttl)
+
+    def complete(self, key, request_fingerprint, response):
+        self.store.set(key, (DONE, request_fingerprint, response), self.ttl)
+
+    def abandon(self, key):
+        self.store.delete(key)
@@ -0,0 +1,376 @@
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from decimal import Decimal
+
+import cash_flows
+import db
+import resources
+import serialization
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+CHUNK_SIZE = 10000
+# How often a running job refreshes updated_at, including while a single
+# long query is in flight; well under JobQueue's stale_after.
+HEARTBEAT_INTERVAL = 30
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        request TEXT NOT NULL,
+        spec TEXT NOT NULL,
+        status TEXT NOT NULL,
+        progress REAL NOT NULL DEFAULT 0,
+        rows INTEGER NOT NULL DEFAULT 0,
+        result_path TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        updated_at REAL NOT NULL,
+        finished_at REAL
+    )
+"""
+JOB_COLUMNS = (
+    "id", "kind", "request", "spec", "status", "progress", "rows", "result_path", "error",
+    "created_at", "started_at", "updated_at", "finished_at",
+)
+
+
+class JobStore:
+    # Job state in a local SQLite file, shared by the web workers and the
+    # job processes, so queued and finished jobs survive restarts. The file
+    # is created on first use.
+    def __init__(self, path):
+        self.path = path
+        self._created = False
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One short-lived connection per operation, committed on success.
+        if not self._created:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                if not self._created:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(CREATE_TABLE)
+                    self._created = True
+                yield conn
+        finally:
+            conn.close()
+
+    def _update(self, sql, params):
+        with self._connect() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def create(self, kind, request, spec):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, request, spec, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(request), json.dumps(spec), QUEUED, now, now)
+            )
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        job["request"] = json.loads(job["request"])
+        job["spec"] = json.loads(job["spec"])
+        return job
+
+    def claim(self, job_id):
+        # Only one process can move a job from queued to running.
+        now = time.time()
+        return self._update(
+            "UPDATE jobs SET status = ?, started_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (RUNNING, now, now, job_id, QUEUED)
+        ) == 1
+
+    def progress(self, job_id, fraction, rows):
+        self._update(
+            "UPDATE jobs SET progress = ?, rows = ?, updated_at = ? WHERE id = ?",
+            (min(max(fraction, 0.0), 1.0), rows, time.time(), job_id)
+        )
+
+    def heartbeat(self, job_id):
+        self._update(
+            "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING)
+        )
+
+    def finish(self, job_id, result_path, rows):
+        now = time.time()
+        self._update(
+            "UPDATE jobs SET status = ?, progress = 1, rows = ?, result_path = ?, updated_at = ?, finished_at = ? "
+            "WHERE id = ?",
+            (SUCCEEDED, rows, result_path, now, now, job_id)
+        )
+
+    def fail(self, job_id, error):
+        now = time.time()
+        self._update(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+            (FAILED, error, now, now, job_id)
+        )
+
+    def recoverable(self, stale_after):
+        # Queued jobs, plus running jobs whose process stopped sending
+        # heartbeats (it died with its worker); the latter are requeued.
+        cutoff = time.time() - stale_after
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = 0, rows = 0 WHERE status = ? AND updated_at < ?",
+                (QUEUED, RUNNING, cutoff)
+            )
+            rows = conn.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)).fetchall()
+        return [row[0] for row in rows]
+
+    def purge(self, older_than):
+        # Deletes finished jobs (and their result files) older than the
+        # given number of seconds.
+        cutoff = time.time() - older_than
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, result_path FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCEEDED, FAILED, cutoff)
+            ).fetchall()
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(row[0],) for row in rows])
+        for _, result_path in rows:
+            if result_path and os.path.exists(result_path):
+                os.remove(result_path)
+        return len(rows)
+
+
+def json_params(params):
+    # Query parameters as JSON-safe strings; MySQL converts them back when
+    # comparing with DATE and DECIMAL columns.
+    return [value.isoformat() if isinstance(value, date) else str(value) if isinstance(value, Decimal) else value
+            for value in params]
+
+
+def where(conditions):
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def run_export(conn, spec, path, progress):
+    # Keyset-paginated read of the whole (filtered) table, written chunk by
+    # chunk; progress is the share of the primary key range covered.
+    resource = resources.RESOURCES[spec["resource"]]
+    conditions, params = spec["conditions"], spec["params"]
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT MIN({resource.key}), MAX({resource.key}) FROM {resource.table}{where(conditions)}", tuple(params)
+    )
+    first_id, last_id = cursor.fetchone() or (None, None)
+
+    rows_written = 0
+    with open(path, "wb") as f:
+        if spec["format"] == "csv":
+            f.write(csv_line(resource.fields))
+        after = None
+        while first_id is not None:
+            cursor.execute(*resource.list_query(conditions, params, after, CHUNK_SIZE))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            if spec["format"] == "csv":
+                f.write(b"".join(csv_line(row) for row in rows))
+            else:
+                f.write(b"".join(serialization.dumps_bytes(item) + b"\n" for item in resource.rows.map(rows, cursor)))
+            rows_written += len(rows)
+            after = rows[-1][0]
+            span = last_id - first_id
+            progress((after - first_id) / span if span else 1.0, rows_written)
+    return rows_written
+
+
+def csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue().encode()
+
+
+def year_ranges(first, last):
+    # [start, end) date ranges of one calendar year each, matching the
+    # yearly partitions of Transactions.
+    year = first.year
+    while year <= last.year:
+        yield max(first, date(year, 1, 1)), date(year + 1, 1, 1)
+        year += 1
+
+
+def run_report(conn, spec, path, progress):
+    # Aggregates one year at a time and merges the partial results, so
+    # each query touches a single partition and progress can be reported.
+    expression, field = spec["expression"], spec["field"]
+    conditions, params = spec["conditions"], spec["params"]
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT MIN(Transaction_Date), MAX(Transaction_Date) FROM Transactions{where(conditions)}", tuple(params)
+    )
+    first, last = cursor.fetchone() or (None, None)
+
+    groups = {}
+    rows_read = 0
+    if first is not None:
+        first, last = cash_flows.as_date(first), cash_flows.as_date(last)
+        ranges = list(year_ranges(first, last))
+        for done, (start, end) in enumerate(ranges, 1):
+            cursor.execute(
+                f"SELECT {expression}, COUNT(*), SUM(Transaction_Amount), MIN(Transaction_Amount), "
+                f"MAX(Transaction_Amount) FROM Transactions"
+                f"{where(list(conditions) + ['Transaction_Date >= %s', 'Transaction_Date < %s'])} "
+                f"GROUP BY {expression}",
+                tuple(params) + (start, end)
+            )
+            for key, count, total, low, high in cursor.fetchall():
+                merged = groups.get(key)
+                if merged is None:
+                    groups[key] = [count, total, low, high]
+                else:
+                    merged[0] += count
+                    merged[1] += total
+                    merged[2] = min(merged[2], low)
+                    merged[3] = max(merged[3], high)
+                rows_read += count
+            progress(done / len(ranges), rows_read)
+
+    report = [
+        {
+            field: key, "transaction_Count": count, "total_Amount": total,
+            "average_Amount": (Decimal(total) / count).quantize(Decimal("0.000001")),
+            "min_Amount": low, "max_Amount": high,
+        }
+        for key, (count, total, low, high) in sorted(groups.items())
+    ]
+    with open(path, "wb") as f:
+        f.write(serialization.dumps_bytes(report))
+    return len(report)
+
+
+RUNNERS = {"export": run_export, "report": run_report}
+EXTENSIONS = {"csv": "csv", "ndjson": "ndjson", "json": "json"}
+
+
+def heartbeat(store, job_id, stop):
+    # Runs in a thread beside the job: progress is only reported between
+    # queries, and one year's GROUP BY can take longer than stale_after.
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        store.heartbeat(job_id)
+
+
+def execute(store, job_id, conn, result_dir):
+    # Runs one job to completion, recording progress and the outcome.
+    if not store.claim(job_id):
+        return
+    job = store.get(job_id)
+    spec = job["spec"]
+    path = os.path.join(result_dir, f"{job_id}.{EXTENSIONS[spec.get('format', 'json')]}")
+    partial = path + ".part"
+    stop = threading.Event()
+    beat = threading.Thread(target=heartbeat, args=(store, job_id, stop), daemon=True)
+    beat.start()
+    try:
+        rows = RUNNERS[job["kind"]](conn, spec, partial, lambda fraction, rows: store.progress(job_id, fraction, rows))
+        os.replace(partial, path)
+    except Exception as e:
+        if os.path.exists(partial):
+            os.remove(partial)
+        store.fail(job_id, f"{type(e).__name__}: {e}")
+        return
+    finally:
+        stop.set()
+        beat.join()
+        conn.rollback()
+    store.finish(job_id, path, rows)
+
+
+def run_job(store_path, result_dir, job_id, settings):
+    # Entry point in the worker process: its own store handle and database
+    # connection, since neither can be shared across processes.
+    store = JobStore(store_path)
+    try:
+        conn = db.mysql_connect_factory(
+            settings["host"], settings["user"], settings["password"], settings["database"], settings["port"]
+        )()
+    except Exception as e:
+        if store.claim(job_id):
+            store.fail(job_id, f"{type(e).__name__}: {e}")
+        return
+    try:
+        execute(store, job_id, conn, result_dir)
+    finally:
+        conn.close()
+
+
+class JobQueue:
+    # Runs jobs on a process pool of max_workers; further jobs wait in the
+    # executor's queue. start() resubmits the jobs an earlier process left
+    # queued (or orphaned while running). The pool and the store file are
+    # only created once there is a job to run, so a process that never runs
+    # one spawns no workers and writes nothing.
+    def __init__(self, store_path, result_dir, settings, max_workers=2, stale_after=300):
+        self.store = JobStore(store_path)
+        self.result_dir = result_dir
+        self.settings = settings
+        self.max_workers = max_workers
+        self.stale_after = stale_after
+        self._executor = None
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        if not os.path.exists(self.store.path):
+            return
+        for job_id in self.store.recoverable(self.stale_after):
+            self._submit(job_id)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                os.makedirs(self.result_dir, exist_ok=True)
+                # Spawned rather than forked: the web process has threads (and
+                # pooled sockets) that must not be copied into the children.
+                self._executor = ProcessPoolExecutor(
+                    self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _submit(self, job_id):
+        self._pool().submit(run_job, self.store.path, self.result_dir, job_id, self.settings)
+
+    def submit(self, kind, request, spec):
+        self.start()
+        job_id = self.store.create(kind, request, spec)
+        self._submit(job_id)
+        return job_id
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,336 @@
+import bisect
+import logging
+import threading
+import time
+
+from flask import g, has_app_context
+
+import serialization
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100)
+
+slow_query_log = logging.getLogger("private_banking.slow_queries")
+
+# (pool stats key, metric name, type, help) for the connection pool gauges.
+POOL_METRICS = (
+    ("size", "db_pool_connections", "gauge", "Open connections in the pool."),
+    ("idle", "db_pool_idle_connections", "gauge", "Idle connections in the pool."),
+    ("in_use", "db_pool_in_use_connections", "gauge", "Connections checked out of the pool."),
+    ("max_size", "db_pool_max_connections", "gauge", "Upper bound on pool connections."),
+    ("checkouts", "db_pool_checkouts_total", "counter", "Connections handed out by the pool."),
+    ("wait_seconds_total", "db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection."),
+    ("wait_seconds_max", "db_pool_wait_seconds_max", "gauge", "Longest wait for a connection."),
+    ("timeouts", "db_pool_timeouts_total", "counter", "Checkouts that gave up waiting."),
+    ("connections_created", "db_pool_connections_created_total", "counter", "Connections opened."),
+    ("connections_closed", "db_pool_connections_closed_total", "counter", "Connections closed."),
+    ("health_check_failures", "db_pool_health_check_failures_total", "counter", "Failed connection pings."),
+    ("expired", "db_pool_expired_total", "counter", "Connections retired after their max lifetime."),
+)
+# The same for each read replica, labelled by replica.
+REPLICA_METRICS = (
+    ("in_use", "db_replica_in_use_connections", "gauge", "Connections checked out of the replica's pool."),
+    ("checkouts", "db_replica_checkouts_total", "counter", "Connections handed out by the replica's pool."),
+    ("lag_seconds", "db_replica_lag_seconds", "gauge", "Replication lag at the last check (-1 if not replicating)."),
+    ("usable", "db_replica_usable", "gauge", "Whether the last lag check allowed reads from the replica."),
+    ("skipped", "db_replica_skipped_total", "counter", "Reads routed past the replica (behind, down or full)."),
+)
+# The same for each admission control class, labelled by class.
+ADMISSION_METRICS = (
+    ("slots", "admission_slots", "gauge", "Requests the class may run at once."),
+    ("in_use", "admission_in_use", "gauge", "Requests of the class running now."),
+    ("waiting", "admission_waiting", "gauge", "Requests of the class queued for a slot."),
+    ("queue_depth", "admission_queue_depth", "gauge", "Requests the class may queue."),
+    ("admitted", "admission_admitted_total", "counter", "Requests given a slot."),
+    ("queued", "admission_queued_total", "counter", "Requests that had to queue for a slot."),
+    ("wait_seconds_total", "admission_queue_wait_seconds_total", "counter", "Time spent queued for a slot."),
+)
+# (stats key, reason label) for admission_shed_total.
+ADMISSION_SHED_REASONS = (("queue_full", "queue_full"), ("timeout", "queue_timeout"), ("rate_limited", "rate_limited"))
+
+
+def redact(params):
+    # Slow-query logs show the shape of the parameters, never their values.
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [type(value).__name__ for value in params]
+    return type(params).__name__
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    # Counters and histograms keyed by metric name and a sorted tuple of
+    # label pairs, rendered in the Prometheus text exposition format.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._values = {}
+
+    def counter(self, name, help_text):
+        self._meta[name] = ("counter", help_text, None)
+        self._values.setdefault(name, {})
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._meta[name] = ("histogram", help_text, tuple(buckets))
+        self._values.setdefault(name, {})
+
+    def inc(self, name, labels, amount=1):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._values[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._meta[name][2])
+            histogram.observe(value)
+
+    def value(self, name, **labels):
+        with self._lock:
+            return self._values[name].get(tuple(sorted(labels.items())))
+
+    def clear(self):
+        with self._lock:
+            for series in self._values.values():
+                series.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, _) in self._meta.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(self._values[name].items()):
+                    if kind == "counter":
+                        lines.append(f"{name}{format_labels(key)} {format_value(value)}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(value.buckets + ("+Inf",), value.counts):
+                        cumulative += count
+                        le = bound if bound == "+Inf" else format_value(bound)
+                        lines.append(f"{name}_bucket{format_labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(key)} {format_value(value.sum)}")
+                    lines.append(f"{name}_count{format_labels(key)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_pool(stats):
+    lines = []
+    for key, name, kind, help_text in POOL_METRICS:
+        if key in stats:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {format_value(stats[key])}"]
+    return "\n".join(lines) + "\n"
+
+
+def render_replicas(stats):
+    lines = []
+    for key, name, kind, help_text in REPLICA_METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for replica, values in stats["replicas"]:
+            lines.append(f"{name}{format_labels((('replica', replica),))} {format_value(values[key])}")
+    lines += [
+        "# HELP db_replica_fallbacks_total Reads sent to the primary because no replica qualified.",
+        "# TYPE db_replica_fallbacks_total counter",
+        f"db_replica_fallbacks_total {stats['fallbacks']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def render_admission(stats):
+    lines = []
+    for key, name, kind, help_text in ADMISSION_METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for admission_class, values in stats.items():
+            lines.append(f"{name}{format_labels((('class', admission_class),))} {format_value(values[key])}")
+    lines += [
+        "# HELP admission_shed_total Requests rejected by admission control, by reason.",
+        "# TYPE admission_shed_total counter",
+    ]
+    for admission_class, values in stats.items():
+        for key, reason in ADMISSION_SHED_REASONS:
+            labels = format_labels((("class", admission_class), ("reason", reason)))
+            lines.append(f"admission_shed_total{labels} {values[key]}")
+    return "\n".join(lines) + "\n"
+
+
+class RequestStats:
+    def __init__(self, slow_query_seconds=None):
+        self.started = time.perf_counter()
+        self.slow_query_seconds = slow_query_seconds
+        self.statements = 0
+        self.rows = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.status = 500
+
+    def statement(self, elapsed, sql, params):
+        self.statements += 1
+        self.db_seconds += elapsed
+        if self.slow_query_seconds is not None and elapsed >= self.slow_query_seconds:
+            slow_query_log.warning("Slow query (%.3fs): %s params=%s", elapsed, " ".join(str(sql).split()), params)
+
+
+class InstrumentedCursor:
+    # Proxies a DB-API cursor, counting statements and fetched rows and
+    # timing every round trip into the request's RequestStats.
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def execute(self, sql, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, *args, **kwargs)
+        finally:
+            self._stats.statement(time.perf_counter() - started, sql, redact(args[0] if args else None))
+
+    def executemany(self, sql, seq_of_params, *args, **kwargs):
+        seq_of_params = list(seq_of_params)
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq_of_params, *args, **kwargs)
+        finally:
+            self._stats.statement(time.perf_counter() - started, sql, f"<{len(seq_of_params)} rows>")
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return getattr(self._cursor, method)(*args)
+        finally:
+            self._stats.db_seconds += time.perf_counter() - started
+
+    def fetchone(self):
+        row = self._fetch("fetchone")
+        if row is not None:
+            self._stats.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._fetch("fetchmany", *args)
+        self._stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch("fetchall")
+        self._stats.rows += len(rows)
+        return rows
+
+
+class InstrumentedConnection:
+    def __init__(self, conn, stats):
+        self.raw = conn
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self.raw.cursor(*args, **kwargs), self._stats)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return self.raw.commit()
+        finally:
+            self._stats.statement(time.perf_counter() - started, "COMMIT", None)
+
+    def rollback(self):
+        started = time.perf_counter()
+        try:
+            return self.raw.rollback()
+        finally:
+            self._stats.statement(time.perf_counter() - started, "ROLLBACK", None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.registry = Registry()
+        self.registry.counter("http_requests_total", "Requests handled, by route, method and status.")
+        self.registry.histogram("http_request_duration_seconds", "Request latency by route and method.")
+        self.registry.histogram(
+            "http_request_db_statements", "SQL statements executed per request.", STATEMENT_BUCKETS
+        )
+        self.registry.counter("http_request_db_statements_total", "SQL statements executed, by route.")
+        self.registry.counter("http_request_db_rows_total", "Rows fetched from the database, by route.")
+        self.registry.counter("http_request_db_seconds_total", "Time spent in database calls, by route.")
+        self.registry.counter(
+            "http_request_serialization_seconds_total", "Time spent encoding JSON responses, by route."
+        )
+        self.registry.counter(
+            "http_request_pool_wait_seconds_total", "Time spent waiting for a pooled connection, by route."
+        )
+
+    def record(self, route, method, stats):
+        labels = {"route": route, "method": method}
+        registry = self.registry
+        registry.inc("http_requests_total", dict(labels, status=str(stats.status)))
+        registry.observe("http_request_duration_seconds", labels, time.perf_counter() - stats.started)
+        registry.observe("http_request_db_statements", labels, stats.statements)
+        registry.inc("http_request_db_statements_total", labels, stats.statements)
+        registry.inc("http_request_db_rows_total", labels, stats.rows)
+        registry.inc("http_request_db_seconds_total", labels, stats.db_seconds)
+        registry.inc("http_request_serialization_seconds_total", labels, stats.serialize_seconds)
+        registry.inc("http_request_pool_wait_seconds_total", labels, stats.wait_seconds)
+
+    def render(self, pool_stats=None, replica_stats=None, admission_stats=None):
+        text = self.registry.render()
+        if pool_stats:
+            text += render_pool(pool_stats)
+        if replica_stats:
+            text += render_replicas(replica_stats)
+        if admission_stats:
+            text += render_admission(admission_stats)
+        return text
+
+
+class TimedJSONProvider(serialization.FastJSONProvider):
+    # Adds the time spent building JSON responses to the current request's
+    # stats, when there is one.
+    def response(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().response(*args, **kwargs)
+        finally:
+            stats = g.get("request_stats") if has_app_context() else None
+            if stats is not None:
+                stats.serialize_seconds += time.perf_counter() - started
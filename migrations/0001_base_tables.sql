@@ -0,0 +1,57 @@
+-- Core tables. Secondary indexes follow the query shapes in app.py: keyset
+-- pages (WHERE <filter> AND <id> > ? ORDER BY <id>), per-client summaries
+-- and balances rebuilds, and date-range reports.
+
+CREATE TABLE IF NOT EXISTS Employees (
+    Employee_ID INT NOT NULL PRIMARY KEY,
+    Name VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS Products (
+    Product_ID INT NOT NULL PRIMARY KEY,
+    Product_Type VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS Clients (
+    Client_ID INT NOT NULL PRIMARY KEY,
+    Name VARCHAR(255) NOT NULL,
+    Email VARCHAR(255) NOT NULL,
+    Phone VARCHAR(50) NOT NULL,
+    Client_Manager_Employee_ID INT NOT NULL,
+    KEY idx_clients_manager (Client_Manager_Employee_ID, Client_ID)
+);
+
+-- Partitioned by year of Transaction_Date so date-range reports only read
+-- the partitions they cover. MySQL requires the partitioning column in every
+-- unique key (hence the composite primary key; IDs are kept unique by
+-- Transaction_IDs, see 0007) and does not allow foreign keys on partitioned
+-- tables.
+CREATE TABLE IF NOT EXISTS Transactions (
+    Transaction_ID INT NOT NULL,
+    Client_ID INT NOT NULL,
+    Product_ID INT NOT NULL,
+    Transaction_Amount DECIMAL(15, 2) NOT NULL,
+    Transaction_Date DATE NOT NULL,
+    PRIMARY KEY (Transaction_ID, Transaction_Date),
+    KEY idx_transactions_client_date (Client_ID, Transaction_Date, Product_ID, Transaction_Amount),
+    KEY idx_transactions_product_date (Product_ID, Transaction_Date),
+    KEY idx_transactions_date (Transaction_Date, Client_ID, Product_ID, Transaction_Amount)
+)
+PARTITION BY RANGE COLUMNS (Transaction_Date) (
+    PARTITION p2014 VALUES LESS THAN ('2015-01-01'),
+    PARTITION p2015 VALUES LESS THAN ('2016-01-01'),
+    PARTITION p2016 VALUES LESS THAN ('2017-01-01'),
+    PARTITION p2017 VALUES LESS THAN ('2018-01-01'),
+    PARTITION p2018 VALUES LESS THAN ('2019-01-01'),
+    PARTITION p2019 VALUES LESS THAN ('2020-01-01'),
+    PARTITION p2020 VALUES LESS THAN ('2021-01-01'),
+    PARTITION p2021 VALUES LESS THAN ('2022-01-01'),
+    PARTITION p2022 VALUES LESS THAN ('2023-01-01'),
+    PARTITION p2023 VALUES LESS THAN ('2024-01-01'),
+    PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+    PARTITION p2027 VALUES LESS THAN ('2028-01-01'),
+    PARTITION p2028 VALUES LESS THAN ('2029-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
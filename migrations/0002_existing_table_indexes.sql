@@ -0,0 +1,8 @@
+-- Databases created before these migrations existed already have the core
+-- tables, so 0001 left them untouched. Add the same indexes to them; each
+-- CREATE INDEX is skipped when an index with that name is already there.
+
+CREATE INDEX idx_clients_manager ON Clients (Client_Manager_Employee_ID, Client_ID);
+CREATE INDEX idx_transactions_client_date ON Transactions (Client_ID, Transaction_Date, Product_ID, Transaction_Amount);
+CREATE INDEX idx_transactions_product_date ON Transactions (Product_ID, Transaction_Date);
+CREATE INDEX idx_transactions_date ON Transactions (Transaction_Date, Client_ID, Product_ID, Transaction_Amount);
@@ -0,0 +1,24 @@
+-- Partition a pre-existing Transactions table the way 0001 creates it. This
+-- rebuilds the table, so run it in a maintenance window on large databases.
+-- Skipped when Transactions is already partitioned. Any foreign keys on or
+-- referencing Transactions must be dropped first.
+
+ALTER TABLE Transactions DROP PRIMARY KEY, ADD PRIMARY KEY (Transaction_ID, Transaction_Date)
+PARTITION BY RANGE COLUMNS (Transaction_Date) (
+    PARTITION p2014 VALUES LESS THAN ('2015-01-01'),
+    PARTITION p2015 VALUES LESS THAN ('2016-01-01'),
+    PARTITION p2016 VALUES LESS THAN ('2017-01-01'),
+    PARTITION p2017 VALUES LESS THAN ('2018-01-01'),
+    PARTITION p2018 VALUES LESS THAN ('2019-01-01'),
+    PARTITION p2019 VALUES LESS THAN ('2020-01-01'),
+    PARTITION p2020 VALUES LESS THAN ('2021-01-01'),
+    PARTITION p2021 VALUES LESS THAN ('2022-01-01'),
+    PARTITION p2022 VALUES LESS THAN ('2023-01-01'),
+    PARTITION p2023 VALUES LESS THAN ('2024-01-01'),
+    PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+    PARTITION p2027 VALUES LESS THAN ('2028-01-01'),
+    PARTITION p2028 VALUES LESS THAN ('2029-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
@@ -0,0 +1,35 @@
+-- Tables maintained by balances.py and cash_flows.py.
+
+CREATE TABLE IF NOT EXISTS Client_Balances (
+    Client_ID INT NOT NULL PRIMARY KEY,
+    Balance DECIMAL(20, 2) NOT NULL DEFAULT 0,
+    Transaction_Count BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS Client_Product_Balances (
+    Client_ID INT NOT NULL,
+    Product_ID INT NOT NULL,
+    Balance DECIMAL(20, 2) NOT NULL DEFAULT 0,
+    Transaction_Count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Client_ID, Product_ID)
+);
+
+CREATE TABLE IF NOT EXISTS Cash_Flows (
+    Cash_Flow_ID INT NOT NULL PRIMARY KEY,
+    Client_ID INT NOT NULL,
+    Cash_Flow_Amount DECIMAL(15, 2) NOT NULL,
+    Cash_Flow_Date DATE NOT NULL,
+    KEY idx_cash_flows_client_date (Client_ID, Cash_Flow_Date),
+    KEY idx_cash_flows_date (Cash_Flow_Date)
+);
+
+CREATE TABLE IF NOT EXISTS Cash_Flow_Buckets (
+    Client_ID INT NOT NULL,
+    Granularity ENUM('day', 'month') NOT NULL,
+    Bucket_Start DATE NOT NULL,
+    Inflow DECIMAL(20, 2) NOT NULL DEFAULT 0,
+    Outflow DECIMAL(20, 2) NOT NULL DEFAULT 0,
+    Cash_Flow_Count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Client_ID, Granularity, Bucket_Start),
+    KEY idx_cash_flow_buckets_period (Granularity, Bucket_Start)
+);
@@ -0,0 +1,12 @@
+-- Anomaly scores maintained by anomaly.py: written with every transaction
+-- insert or update, and recomputed by 'flask anomaly rescore'.
+
+CREATE TABLE IF NOT EXISTS Transaction_Scores (
+    Transaction_ID INT NOT NULL PRIMARY KEY,
+    Client_ID INT NOT NULL,
+    Score DOUBLE NULL,
+    Flagged TINYINT(1) NOT NULL DEFAULT 0,
+    Scored_At TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    KEY idx_transaction_scores_flagged (Flagged, Transaction_ID),
+    KEY idx_transaction_scores_client (Client_ID)
+);
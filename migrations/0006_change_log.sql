@@ -0,0 +1,12 @@
+-- Append-only log of writes to Transactions, Clients and Products, written
+-- in the same database transaction as each write and read by GET /changes.
+-- Change_ID is the sequence number consumers resume from.
+
+CREATE TABLE IF NOT EXISTS Change_Log (
+    Change_ID BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    Resource VARCHAR(32) NOT NULL,
+    Record_ID INT NOT NULL,
+    Action VARCHAR(8) NOT NULL,
+    Data JSON NULL,
+    Changed_At TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+);
@@ -0,0 +1,16 @@
+-- Transaction_ID uniqueness. Partitioning (0001/0003) puts Transaction_Date
+-- in the primary key of Transactions, so on its own that table would accept
+-- the same ID twice with different dates. Every insert also claims its ID
+-- here, in the same database transaction, and deletes release it.
+--
+-- Inserted_At is set by the server when the ID is claimed. Snapshot dumps
+-- use it to find rows inserted since the last run, since caller-supplied
+-- IDs do not only go up. IDs backfilled from existing rows leave it NULL.
+
+CREATE TABLE IF NOT EXISTS Transaction_IDs (
+    Transaction_ID INT NOT NULL PRIMARY KEY,
+    Inserted_At TIMESTAMP(6) NULL DEFAULT CURRENT_TIMESTAMP(6),
+    KEY idx_transaction_ids_inserted (Inserted_At)
+);
+
+INSERT IGNORE INTO Transaction_IDs (Transaction_ID, Inserted_At) SELECT Transaction_ID, NULL FROM Transactions;
@@ -0,0 +1,8 @@
+-- Keyset pages filtered by client or product (WHERE Client_ID = ? AND
+-- Transaction_ID > ? ORDER BY Transaction_ID) need an index that returns
+-- the filtered rows in ID order. The *_date indexes put the date first, so
+-- those pages had to sort every row of the client or product.
+
+CREATE INDEX idx_transactions_client_id ON Transactions (Client_ID, Transaction_ID);
+CREATE INDEX idx_transactions_product_id ON Transactions (Product_ID, Transaction_ID);
+CREATE INDEX idx_cash_flows_client_id ON Cash_Flows (Client_ID, Cash_Flow_ID);
@@ -0,0 +1,222 @@
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+
+import serialization
+
+# Field types. Payload values are checked against their type but not
+# converted: rows keep the values as sent, which is what responses and the
+# change log echo back.
+INT = "int"
+TEXT = "text"
+AMOUNT = "amount"
+DATE = "date"
+
+# What a write did, as passed to the write hooks: the action (a changes
+# constant), the keys written, the new rows (none for deletes) and, for
+# resources that lock rows before writing, the rows as they were.
+Write = namedtuple("Write", "action keys rows previous")
+
+
+def valid_int(value):
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return True
+    return isinstance(value, str) and value.strip().lstrip("-").isdigit()
+
+
+def valid_amount(value):
+    try:
+        return Decimal(str(value)).is_finite()
+    except ArithmeticError:
+        return False
+
+
+def valid_date(value):
+    # The whole string must be an ISO date; MySQL would otherwise store
+    # whatever date it can read from the front of it.
+    if isinstance(value, date):
+        return True
+    if not isinstance(value, str):
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+VALIDATORS = {INT: valid_int, AMOUNT: valid_amount, DATE: valid_date}
+
+
+class Resource:
+    # A table served by the API, declared once as (column, field, type)
+    # triples with the primary key first. The statements, the row mapper and
+    # the payload checks are derived from the declaration here, when the
+    # module is imported, so handlers only pick them up.
+    def __init__(self, name, table, label, columns, optional=(), filters=(), expansions=(),
+                 cached=False, change_log=False, lock_rows=False, bulk=False, key_table=None,
+                 create_error="Missing required fields", update_error="Missing required fields"):
+        self.name = name
+        self.singular = name[:-1]
+        self.table = table
+        self.label = label
+        self.plural = f"{label.lower()}s"
+        self.columns = [column for column, _, _ in columns]
+        self.fields = [field for _, field, _ in columns]
+        self.types = [kind for _, _, kind in columns]
+        self.key = self.columns[0]
+        self.optional = frozenset(optional)
+        # (query argument, WHERE condition, converter) for each list filter
+        self.filters = tuple(filters)
+        self.expansions = tuple(expansions)
+        # Reads go through the reference cache and writes invalidate it.
+        self.cached = cached
+        self.change_log = change_log
+        # Updates and deletes read the old row FOR UPDATE first, for hooks
+        # that reverse its effect on derived totals.
+        self.lock_rows = lock_rows
+        self.bulk = bulk
+        # Unpartitioned table holding the keys, for tables whose primary key
+        # cannot be the key alone (partitioned ones). Inserts claim the key
+        # there in the same transaction and deletes release it.
+        self.key_table = key_table
+        self.create_error = create_error
+        self.update_error = update_error
+        self.rows = serialization.RowMapper(self.fields)
+
+        column_list = ", ".join(self.columns)
+        self.select_sql = f"SELECT {self.select_list()} FROM {table}"
+        self.get_sql = f"{self.select_sql} WHERE {self.key} = %s"
+        # Locked rows feed the write hooks' arithmetic, so amounts stay
+        # DECIMAL there.
+        self.lock_sql = f"SELECT {column_list} FROM {table} WHERE {self.key} = %s FOR UPDATE"
+        self.exists_sql = f"SELECT {self.key} FROM {table} WHERE {self.key} = %s"
+        self.insert_sql = f"INSERT INTO {table} ({column_list}) VALUES ({', '.join(['%s'] * len(self.columns))})"
+        self.update_sql = (
+            f"UPDATE {table} SET {', '.join(f'{column} = %s' for column in self.columns[1:])} "
+            f"WHERE {self.key} = %s"
+        )
+        self.delete_sql = f"DELETE FROM {table} WHERE {self.key} = %s"
+        if key_table is not None:
+            self.claim_sql = f"INSERT INTO {key_table} ({self.key}) VALUES (%s)"
+            self.release_sql = f"DELETE FROM {key_table} WHERE {self.key} = %s"
+        self._list_sql = {}
+
+    def select_list(self, alias=None):
+        # The columns as read for responses. Amounts are cast to text on the
+        # server, which gives the same string str(Decimal) would, so the
+        # driver hands back str and the row mapper has nothing to convert.
+        prefix = f"{alias}." if alias else ""
+        return ", ".join(
+            f"CAST({prefix}{column} AS CHAR) AS {column}" if kind == AMOUNT else f"{prefix}{column}"
+            for column, kind in zip(self.columns, self.types)
+        )
+
+    def list_query(self, conditions, params, after, limit=None):
+        # Keyset page (or, without a limit, export) query. The SQL depends
+        # only on which filters are in use, so it is built once per
+        # combination and reused.
+        shape = (tuple(conditions or ()), after is not None, limit is not None)
+        sql = self._list_sql.get(shape)
+        if sql is None:
+            where = list(shape[0])
+            if after is not None:
+                where.append(f"{self.key} > %s")
+            sql = self.select_sql
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += f" ORDER BY {self.key}"
+            if limit is not None:
+                sql += " LIMIT %s"
+            self._list_sql[shape] = sql
+        params = list(params or [])
+        if after is not None:
+            params.append(after)
+        if limit is not None:
+            params.append(limit)
+        return sql, tuple(params)
+
+    def row(self, data, key=None):
+        # The payload's values in column order; updates take the key from
+        # the URL instead.
+        if not isinstance(data, dict):
+            data = {}
+        values = tuple(data.get(field) for field in self.fields[1:])
+        return (data.get(self.fields[0]) if key is None else key,) + values
+
+    def item(self, row):
+        return dict(zip(self.fields, row))
+
+    def missing(self, row, with_key=True):
+        start = 0 if with_key else 1
+        return [
+            field for field, value in zip(self.fields[start:], row[start:])
+            if not value and field not in self.optional
+        ]
+
+    def invalid(self, row):
+        # The message for the first value that does not fit its type.
+        for field, kind, value in zip(self.fields, self.types, row):
+            check = VALIDATORS.get(kind)
+            if check is not None and value is not None and not check(value):
+                return f"Invalid {field}"
+        return None
+
+    def validate(self, row, update=False):
+        if self.missing(row, with_key=not update):
+            return self.update_error if update else self.create_error
+        return self.invalid(row)
+
+
+EMPLOYEES = Resource("employees", "Employees", "Employee", [
+    ("Employee_ID", "employee_ID", INT),
+    ("Name", "name", TEXT),
+], cached=True, create_error="Employee ID and name are required", update_error="Name is required")
+
+CLIENTS = Resource("clients", "Clients", "Client", [
+    ("Client_ID", "client_ID", INT),
+    ("Name", "name", TEXT),
+    ("Email", "email", TEXT),
+    ("Phone", "phone", TEXT),
+    ("Client_Manager_Employee_ID", "client_Manager_Employee_ID", INT),
+], filters=[
+    ("client_Manager_Employee_ID", "Client_Manager_Employee_ID = %s", int),
+], expansions=("manager", "transactions", "product"), change_log=True, bulk=True)
+
+PRODUCTS = Resource("products", "Products", "Product", [
+    ("Product_ID", "product_ID", INT),
+    ("Product_Type", "product_Type", TEXT),
+], cached=True, change_log=True, update_error="Product Type is required")
+
+TRANSACTIONS = Resource("transactions", "Transactions", "Transaction", [
+    ("Transaction_ID", "transaction_ID", INT),
+    ("Client_ID", "client_ID", INT),
+    ("Product_ID", "product_ID", INT),
+    ("Transaction_Amount", "transaction_Amount", AMOUNT),
+    ("Transaction_Date", "transaction_Date", DATE),
+], filters=[
+    ("client_ID", "Client_ID = %s", int),
+    ("product_ID", "Product_ID = %s", int),
+    ("from", "Transaction_Date >= %s", date.fromisoformat),
+    ("to", "Transaction_Date <= %s", date.fromisoformat),
+    ("min_amount", "Transaction_Amount >= %s", Decimal),
+    ("max_amount", "Transaction_Amount <= %s", Decimal),
+], expansions=("client", "product", "score"), change_log=True, lock_rows=True, bulk=True,
+    key_table="Transaction_IDs")
+
+CASH_FLOWS = Resource("cash_flows", "Cash_Flows", "Cash flow", [
+    ("Cash_Flow_ID", "cash_Flow_ID", INT),
+    ("Client_ID", "client_ID", INT),
+    ("Cash_Flow_Amount", "cash_Flow_Amount", AMOUNT),
+    ("Cash_Flow_Date", "cash_Flow_Date", DATE),
+], filters=[
+    ("client_ID", "Client_ID = %s", int),
+    ("from", "Cash_Flow_Date >= %s", date.fromisoformat),
+    ("to", "Cash_Flow_Date <= %s", date.fromisoformat),
+    ("min_amount", "Cash_Flow_Amount >= %s", Decimal),
+    ("max_amount", "Cash_Flow_Amount <= %s", Decimal),
+], lock_rows=True)
+
+RESOURCES = {resource.name: resource for resource in (EMPLOYEES, CLIENTS, PRODUCTS, TRANSACTIONS, CASH_FLOWS)}
@@ -0,0 +1,153 @@
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        Version INT NOT NULL PRIMARY KEY,
+        Name VARCHAR(255) NOT NULL,
+        Applied_At TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+CREATE_INDEX = re.compile(r"^CREATE\s+INDEX\s+(\w+)\s+ON\s+(\w+)", re.IGNORECASE)
+PARTITION_TABLE = re.compile(r"^ALTER\s+TABLE\s+(\w+)\b.*\bPARTITION\s+BY\b", re.IGNORECASE | re.DOTALL)
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    # Returns [(version, name, statements)] ordered by version.
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            statements = split_statements(f.read())
+        migrations.append((int(match.group(1)), match.group(2), statements))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def split_statements(sql):
+    # Migrations are plain DDL: statements end with ';' at the end of a line
+    # and comments are whole lines starting with '--'.
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements = []
+    current = []
+    for line in lines:
+        current.append(line)
+        if line.rstrip().endswith(";"):
+            statements.append("\n".join(current).strip().rstrip(";").strip())
+            current = []
+    if "\n".join(current).strip():
+        statements.append("\n".join(current).strip())
+    return statements
+
+
+def already_applied(cursor, statement):
+    # CREATE INDEX and partitioning have no IF NOT EXISTS form in MySQL, so
+    # they are skipped when the schema already has what they would add.
+    match = CREATE_INDEX.match(statement)
+    if match:
+        cursor.execute(
+            "SELECT 1 FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1",
+            (match.group(2), match.group(1))
+        )
+        return cursor.fetchone() is not None
+    match = PARTITION_TABLE.match(statement)
+    if match:
+        cursor.execute(
+            "SELECT 1 FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL LIMIT 1",
+            (match.group(1),)
+        )
+        return cursor.fetchone() is not None
+    return False
+
+
+def applied_versions(cursor):
+    cursor.execute(CREATE_MIGRATIONS_TABLE)
+    cursor.execute("SELECT Version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def status(conn, directory=MIGRATIONS_DIR):
+    applied = applied_versions(conn.cursor())
+    return [(version, name, version in applied) for version, name, _ in load_migrations(directory)]
+
+
+def pending(conn, directory=MIGRATIONS_DIR):
+    # Names of the migrations not yet applied, in version order.
+    return [f"{version:04d}_{name}" for version, name, applied in status(conn, directory) if not applied]
+
+
+def migrate(conn, target=None, directory=MIGRATIONS_DIR, echo=print):
+    # Applies pending migrations in version order, up to and including
+    # target. MySQL commits DDL implicitly, so each migration is recorded as
+    # soon as its statements have run; a failed migration can be re-run
+    # because every statement in it is idempotent or guarded.
+    cursor = conn.cursor()
+    applied = applied_versions(cursor)
+    done = []
+    for version, name, statements in load_migrations(directory):
+        if version in applied or (target is not None and version > target):
+            continue
+        for statement in statements:
+            if already_applied(cursor, statement):
+                echo(f"  skipped: {statement.splitlines()[0]}")
+                continue
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO schema_migrations (Version, Name) VALUES (%s, %s)", (version, name))
+        conn.commit()
+        done.append(version)
+        echo(f"Applied {version:04d}_{name}")
+    echo(f"Done: {len(done)} migrations applied")
+    return done
+
+
+def check_indexes(conn, queries, warn=print):
+    # Runs EXPLAIN on each hot statement, given as (description, sql,
+    # params, expected indexes per table, ordered), and warns when a table
+    # is read without one of its expected indexes, or when an ordered
+    # statement (a keyset page) has to sort its rows. Returns the warnings.
+    cursor = conn.cursor()
+    warnings = []
+    for description, sql, params, expected, ordered in queries:
+        try:
+            cursor.execute(f"EXPLAIN {sql}", params)
+            rows = cursor.fetchall()
+        except Exception as e:
+            warnings.append(f"{description}: EXPLAIN failed ({e})")
+            warn(warnings[-1])
+            continue
+        columns = [column[0].lower() for column in cursor.description or ()]
+        if "table" not in columns or "key" not in columns:
+            continue
+        for row in rows:
+            table, key = row[columns.index("table")], row[columns.index("key")]
+            extra = row[columns.index("extra")] if "extra" in columns else None
+            if extra and ("Impossible" in extra or "no matching row" in extra):
+                # The optimizer answered from metadata (e.g. an empty
+                # table), so the plan says nothing about indexes.
+                continue
+            wanted = expected.get(table)
+            if wanted is not None and key not in wanted:
+                warnings.append(
+                    f"{description}: {table} is read with {key or 'no index'}, "
+                    f"expected {' or '.join(sorted(wanted))}; run the schema migrations"
+                )
+                warn(warnings[-1])
+            elif ordered and extra and "Using filesort" in extra:
+                warnings.append(
+                    f"{description}: {table} rows are sorted after reading them with {key or 'no index'} "
+                    "(Using filesort); run the schema migrations"
+                )
+                warn(warnings[-1])
+    conn.rollback()
+    return warnings
@@ -0,0 +1,246 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+from array import array
+
+PHONE_QUERY = re.compile(r"^\+?[\d\-().]+$")
+# Overlay writes of up to this many entries are inserted one by one;
+# larger ones are merged in a single pass.
+SMALL_WRITE = 64
+
+
+def normalize_phone(value):
+    return re.sub(r"\D", "", str(value))
+
+
+def client_terms(name, email, phone):
+    # Name words, the whole email address and the phone digits; a query
+    # token matches a client when it is a prefix of any of these.
+    terms = {word for word in str(name or "").lower().split()}
+    if email:
+        terms.add(str(email).lower())
+    digits = normalize_phone(phone or "")
+    if digits:
+        terms.add(digits)
+    return tuple(sorted(terms))
+
+
+def query_tokens(q):
+    tokens = []
+    for token in q.lower().split():
+        if PHONE_QUERY.match(token):
+            token = normalize_phone(token) or token
+        tokens.append(token)
+    return tokens
+
+
+class PrefixIndex:
+    # Sorted list of terms with a parallel array of client IDs; a prefix
+    # lookup is a bisect followed by a scan of the matching run. Memory is
+    # roughly 250 bytes per client.
+    #
+    # Those arrays are never changed in place, since an insert into a list
+    # of millions of terms moves all of it. Writes go to a small sorted
+    # overlay of (term, client_id) pairs instead, together with the set of
+    # clients whose entries in the main arrays are out of date, and
+    # searches merge the two. Once the overlay has grown past max_overlay
+    # it is folded into new main arrays by compact().
+    #
+    # The index is built from the database in the background and kept in
+    # sync with the writes made through this process. position is the last
+    # change log entry it reflects: once the index is older than max_age
+    # the changes made since then by other processes are applied (None
+    # disables this).
+    def __init__(self, max_age=None, max_overlay=50000):
+        self.max_age = max_age
+        self.max_overlay = max_overlay
+        self.position = None
+        self.updated_at = None
+        self._keys = []
+        self._ids = array("q")
+        self._terms = {}
+        self._overlay = []
+        self._outdated = set()
+        self._lock = threading.RLock()
+        self._building = False
+        self._pending = None
+        self._ready = threading.Event()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @property
+    def building(self):
+        return self._building
+
+    def __len__(self):
+        return len(self._terms)
+
+    def _start_build(self):
+        with self._lock:
+            if self._building:
+                return False
+            self._building = True
+            self._pending = []
+            return True
+
+    def _finish_build(self, keys, ids, terms_by_id=None):
+        # Swaps in new main arrays. Writes that arrived while they were
+        # being built were queued and are replayed onto them.
+        with self._lock:
+            self._keys, self._ids = keys, ids
+            if terms_by_id is not None:
+                self._terms = terms_by_id
+            self._overlay, self._outdated = [], set()
+            pending, self._pending = self._pending, None
+            for operation, args in pending:
+                operation(*args)
+            self._building = False
+
+    def _abort_build(self):
+        with self._lock:
+            self._building = False
+            self._pending = None
+
+    def build(self, batches, position=None):
+        # batches yields lists of (client_id, name, email, phone), read
+        # after change log entry position.
+        if not self._start_build():
+            return False
+        try:
+            entries, terms_by_id = [], {}
+            for rows in batches:
+                for client_id, name, email, phone in rows:
+                    terms = client_terms(name, email, phone)
+                    terms_by_id[client_id] = terms
+                    entries.extend((term, client_id) for term in terms)
+            entries.sort()
+            keys = [term for term, _ in entries]
+            ids = array("q", (client_id for _, client_id in entries))
+        except BaseException:
+            self._abort_build()
+            raise
+
+        self._finish_build(keys, ids, terms_by_id)
+        self.advance(position)
+        self._ready.set()
+        return True
+
+    def compact(self):
+        # Folds the overlay into new main arrays. The merge runs outside the
+        # lock, so searches and writes carry on meanwhile.
+        if not self._start_build():
+            return False
+        with self._lock:
+            keys, ids, outdated, overlay = self._keys, self._ids, set(self._outdated), list(self._overlay)
+        try:
+            current = ((term, client_id) for term, client_id in zip(keys, ids) if client_id not in outdated)
+            new_keys, new_ids = [], array("q")
+            for term, client_id in heapq.merge(current, overlay):
+                new_keys.append(term)
+                new_ids.append(client_id)
+        except BaseException:
+            self._abort_build()
+            raise
+
+        self._finish_build(new_keys, new_ids)
+        return True
+
+    def needs_compaction(self):
+        return len(self._overlay) + len(self._outdated) > self.max_overlay
+
+    def advance(self, position):
+        # Records that the index reflects every change up to position.
+        with self._lock:
+            self.position = position
+            self.updated_at = time.monotonic()
+
+    def stale(self):
+        return self.max_age is not None and self.updated_at is not None and (
+            time.monotonic() - self.updated_at > self.max_age
+        )
+
+    def add(self, client_id, name, email, phone):
+        self.add_many([(client_id, name, email, phone)])
+
+    def add_many(self, rows):
+        # Adds or replaces many clients with one merge into the overlay.
+        terms_by_id = {client_id: client_terms(name, email, phone) for client_id, name, email, phone in rows}
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((self._add, (terms_by_id,)))
+            self._add(terms_by_id)
+
+    def remove(self, client_id):
+        self.remove_many([client_id])
+
+    def remove_many(self, client_ids):
+        client_ids = set(client_ids)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((self._remove, (client_ids,)))
+            self._remove(client_ids)
+
+    def _add(self, terms_by_id):
+        self._remove(terms_by_id.keys())
+        self._terms.update(terms_by_id)
+        entries = [(term, client_id) for client_id, terms in terms_by_id.items() for term in terms]
+        if len(entries) <= SMALL_WRITE:
+            for entry in entries:
+                bisect.insort(self._overlay, entry)
+        else:
+            entries.sort()
+            self._overlay = list(heapq.merge(self._overlay, entries))
+
+    def _remove(self, client_ids):
+        # Whatever the main arrays hold for these clients is now out of
+        # date; their overlay entries are dropped.
+        self._outdated.update(client_ids)
+        if len(client_ids) > SMALL_WRITE:
+            for client_id in client_ids:
+                self._terms.pop(client_id, None)
+            self._overlay = [entry for entry in self._overlay if entry[1] not in client_ids]
+            return
+        for client_id in client_ids:
+            for term in self._terms.pop(client_id, ()):
+                position = bisect.bisect_left(self._overlay, (term, client_id))
+                if position < len(self._overlay) and self._overlay[position] == (term, client_id):
+                    del self._overlay[position]
+
+    def _range(self, token):
+        end_token = token + "\U0010ffff"
+        start = bisect.bisect_left(self._keys, token)
+        end = bisect.bisect_left(self._keys, end_token, start)
+        overlay_start = bisect.bisect_left(self._overlay, (token,))
+        overlay_end = bisect.bisect_left(self._overlay, (end_token,), overlay_start)
+        return (end - start) + (overlay_end - overlay_start), start, end, overlay_start, overlay_end
+
+    def search(self, q, limit=20):
+        # Client IDs matching every token of q, ordered by the matching
+        # term (so the closest completions come first) and then by ID.
+        tokens = query_tokens(q)
+        if not tokens:
+            return []
+        with self._lock:
+            ranges = sorted((self._range(token), token) for token in tokens)
+            # Scan the run of the most selective token and check the rest
+            # against each candidate's terms.
+            (_, start, end, overlay_start, overlay_end), first = ranges[0]
+            others = [token for _, token in ranges if token != first]
+            keys, ids, outdated = self._keys, self._ids, self._outdated
+            current = ((keys[position], ids[position]) for position in range(start, end)
+                       if ids[position] not in outdated)
+            results, seen = [], set()
+            for _, client_id in heapq.merge(current, self._overlay[overlay_start:overlay_end]):
+                if client_id in seen:
+                    continue
+                seen.add(client_id)
+                terms = self._terms.get(client_id, ())
+                if all(any(term.startswith(token) for term in terms) for token in others):
+                    results.append(client_id)
+                    if len(results) == limit:
+                        break
+            return results
@@ -0,0 +1,105 @@
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime, time
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# MySQLdb FIELD_TYPE codes for DECIMAL and NEWDECIMAL columns.
+DECIMAL_TYPE_CODES = {0, 246}
+
+
+def _default(value):
+    # orjson only calls this for types it cannot encode itself (Decimal);
+    # the stdlib fallback also routes dates through it.
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONProvider(JSONProvider):
+    # Uses orjson when it is installed and the stdlib json module otherwise.
+    # Decimals are encoded as strings (as Flask's default provider does);
+    # dates and datetimes as ISO 8601.
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return dumps_bytes(obj).decode()
+        kwargs.setdefault("default", _default)
+        kwargs.setdefault("ensure_ascii", False)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype="application/json")
+
+
+class RowMapper:
+    # Turns result tuples into dicts keyed by the API field names. The
+    # per-column conversions are worked out once per cursor description and
+    # cached, so mapping a row is a zip plus the few conversions it needs.
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self._compiled = {}
+
+    def converters(self, cursor, first_row):
+        description = getattr(cursor, "description", None)
+        if isinstance(description, (list, tuple)) and len(description) == len(first_row):
+            type_codes = tuple(column[1] for column in description)
+        else:
+            type_codes = None
+        compiled = self._compiled.get(type_codes) if type_codes is not None else None
+        if compiled is None:
+            if type_codes is not None:
+                decimal_columns = [i for i, code in enumerate(type_codes) if code in DECIMAL_TYPE_CODES]
+            else:
+                # No usable description: infer from the values themselves.
+                decimal_columns = [
+                    i for i, value in enumerate(first_row) if isinstance(value, decimal.Decimal)
+                ]
+            compiled = tuple(decimal_columns)
+            if type_codes is not None:
+                self._compiled[type_codes] = compiled
+        return compiled
+
+    def map(self, rows, cursor=None):
+        if not rows:
+            return []
+        fields = self.fields
+        decimal_columns = self.converters(cursor, rows[0])
+        if not decimal_columns:
+            return [dict(zip(fields, row)) for row in rows]
+
+        items = []
+        for row in rows:
+            item = dict(zip(fields, row))
+            for index in decimal_columns:
+                value = row[index]
+                if value is not None:
+                    item[fields[index]] = str(value)
+            items.append(item)
+        return items
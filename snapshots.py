@@ -0,0 +1,474 @@
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import numpy as np
+
+import cash_flows
+
+# Read-only copies of Transactions, Clients and Products for analytical
+# queries, stored as one .npy file per column so they can be memory-mapped
+# by NumPy and pandas without touching MySQL.
+#
+#     <directory>/manifest.json
+#     <directory>/transactions/<YYYY-MM>/<part>/<column>.npy
+#     <directory>/clients/<part>/<column>.npy
+#     <directory>/products/<part>/<column>.npy
+#
+# Transactions are partitioned by month of Transaction_Date and dumped
+# incrementally with two watermarks recorded in the manifest:
+# - open_from: months from this date on are still "open" and are re-read in
+#   full on every run, so recent edits and deletes are picked up; earlier
+#   months are closed and only ever appended to.
+# - watermark_at: the latest Transaction_IDs.Inserted_At copied so far, a
+#   time the server sets when an insert claims its ID. Rows inserted after
+#   it, less SETTLE_SECONDS for inserts that committed late, and dated in a
+#   closed month (back-dated inserts) are appended as a new part of that
+#   month, leaving out IDs the month already holds. IDs are chosen by the
+#   caller, so the highest ID says nothing about which rows are new.
+# Edits or deletes of transactions in closed months need a --full dump, as
+# do rows inserted without claiming their ID.
+# Clients and Products are small enough to be copied in full every run.
+
+MANIFEST = "manifest.json"
+CHUNK_SIZE = 100000
+REFRESH_DAYS = 31
+# How long an insert may stay uncommitted after claiming its ID and still be
+# picked up by the next incremental run.
+SETTLE_SECONDS = 600
+
+# Amounts are stored as integer cents, so sums stay exact.
+TRANSACTION_COLUMNS = (
+    "Transaction_ID", "Client_ID", "Product_ID", "Transaction_Amount_Cents", "Transaction_Date",
+)
+CLIENT_COLUMNS = ("Client_ID", "Name", "Email", "Phone", "Client_Manager_Employee_ID")
+PRODUCT_COLUMNS = ("Product_ID", "Product_Type")
+INTEGER_COLUMNS = {
+    "Transaction_ID", "Client_ID", "Product_ID", "Transaction_Amount_Cents", "Client_Manager_Employee_ID",
+}
+TRANSACTION_SELECT = "Transaction_ID, Client_ID, Product_ID, Transaction_Amount, Transaction_Date"
+BACKDATED_SELECT = ", ".join(f"t.{column}" for column in TRANSACTION_SELECT.split(", "))
+
+# group_by -> (column, response field), as in GET /reports/transactions
+REPORT_GROUPINGS = {
+    "client": ("Client_ID", "client_ID"),
+    "product": ("Product_ID", "product_ID"),
+    "day": ("Transaction_Date", "day"),
+    "month": ("Transaction_Date", "month"),
+}
+
+
+def month_start(value):
+    return value.replace(day=1)
+
+
+def next_month(value):
+    return date(value.year + 1, 1, 1) if value.month == 12 else date(value.year, value.month + 1, 1)
+
+
+def month_key(value):
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def empty_column(name):
+    if name == "Transaction_Date":
+        return np.array([], dtype="datetime64[D]")
+    return np.array([], dtype=np.int64 if name in INTEGER_COLUMNS else "U1")
+
+
+def column_arrays(names, rows):
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    arrays = {}
+    for name, values in zip(names, columns):
+        if name == "Transaction_Amount_Cents":
+            arrays[name] = np.fromiter((int(Decimal(value).scaleb(2)) for value in values), np.int64, len(values))
+        elif name == "Transaction_Date":
+            arrays[name] = np.array([cash_flows.as_date(value) for value in values], dtype="datetime64[D]")
+        elif name in INTEGER_COLUMNS:
+            arrays[name] = np.fromiter(values, np.int64, len(values))
+        else:
+            arrays[name] = np.array(values, dtype=str) if values else empty_column(name)
+    return arrays
+
+
+def concatenate(names, chunks):
+    if not chunks:
+        return {name: empty_column(name) for name in names}
+    if len(chunks) == 1:
+        return chunks[0]
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in names}
+
+
+def write_part(path, arrays):
+    os.makedirs(path, exist_ok=True)
+    for name, values in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), values)
+
+
+def load_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(directory, manifest):
+    # Readers only ever see a complete manifest: parts are written first and
+    # the manifest that references them is swapped in last.
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def read_table(cursor, table, select, names):
+    # Keyset chunks on the primary key (the first column).
+    chunks, after = [], None
+    while True:
+        where = f" WHERE {select[0]} > %s" if after is not None else ""
+        cursor.execute(
+            f"SELECT {', '.join(select)} FROM {table}{where} ORDER BY {select[0]} LIMIT %s",
+            ((after,) if after is not None else ()) + (CHUNK_SIZE,)
+        )
+        rows = cursor.fetchall()
+        if rows:
+            chunks.append(column_arrays(names, rows))
+            after = rows[-1][0]
+        if len(rows) < CHUNK_SIZE:
+            return concatenate(names, chunks)
+
+
+def read_month(cursor, start, max_id):
+    # Every transaction in one month up to max_id, in (date, ID) keyset
+    # chunks so the reads follow idx_transactions_date.
+    chunks, after = [], None
+    while True:
+        conditions = ["Transaction_Date >= %s", "Transaction_Date < %s", "Transaction_ID <= %s"]
+        params = [start, next_month(start), max_id]
+        if after is not None:
+            conditions.append("(Transaction_Date > %s OR (Transaction_Date = %s AND Transaction_ID > %s))")
+            params += [after[0], after[0], after[1]]
+        cursor.execute(
+            f"SELECT {TRANSACTION_SELECT} FROM Transactions WHERE {' AND '.join(conditions)} "
+            f"ORDER BY Transaction_Date, Transaction_ID LIMIT %s",
+            tuple(params) + (CHUNK_SIZE,)
+        )
+        rows = cursor.fetchall()
+        if rows:
+            chunks.append(column_arrays(TRANSACTION_COLUMNS, rows))
+            after = (rows[-1][4], rows[-1][0])
+        if len(rows) < CHUNK_SIZE:
+            return concatenate(TRANSACTION_COLUMNS, chunks)
+
+
+def read_backdated(cursor, since, before):
+    # Transactions whose IDs were claimed after since (all with a recorded
+    # time when since is None) but dated in a closed month.
+    chunks, after = [], None
+    while True:
+        conditions = ["i.Inserted_At IS NOT NULL" if since is None else "i.Inserted_At > %s", "t.Transaction_Date < %s"]
+        params = ([] if since is None else [since]) + [before]
+        if after is not None:
+            conditions.append("i.Transaction_ID > %s")
+            params.append(after)
+        cursor.execute(
+            f"SELECT {BACKDATED_SELECT} FROM Transaction_IDs i "
+            f"JOIN Transactions t ON t.Transaction_ID = i.Transaction_ID "
+            f"WHERE {' AND '.join(conditions)} ORDER BY i.Transaction_ID LIMIT %s",
+            tuple(params) + (CHUNK_SIZE,)
+        )
+        rows = cursor.fetchall()
+        if rows:
+            chunks.append(column_arrays(TRANSACTION_COLUMNS, rows))
+            after = rows[-1][0]
+        if len(rows) < CHUNK_SIZE:
+            return concatenate(TRANSACTION_COLUMNS, chunks)
+
+
+def copied_ids(directory, month, parts):
+    # Transaction IDs already in a month's parts.
+    if not parts:
+        return np.array([], dtype=np.int64)
+    return np.concatenate([
+        np.load(os.path.join(directory, "transactions", month, entry["part"], "Transaction_ID.npy"))
+        for entry in parts
+    ])
+
+
+def as_timestamp(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def dump(conn, directory, full=False, refresh_days=REFRESH_DAYS, today=None, echo=print):
+    # Brings the snapshot in directory up to date and returns the new
+    # manifest. Only reads from the database.
+    os.makedirs(directory, exist_ok=True)
+    previous = load_manifest(directory)
+    run = (previous["run"] if previous else 0) + 1
+    part = f"r{run:06d}"
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT MAX(Transaction_ID), MIN(Transaction_Date), MAX(Transaction_Date) FROM Transactions")
+    max_id, first, last = cursor.fetchone() or (None, None, None)
+    cursor.execute("SELECT MAX(Inserted_At) FROM Transaction_IDs")
+    watermark_at = as_timestamp((cursor.fetchone() or (None,))[0])
+    open_from = month_start((today or date.today()) - timedelta(days=refresh_days))
+
+    transactions = previous["transactions"] if previous and not full else None
+    if transactions is not None and "watermark_at" not in transactions:
+        # Written before inserts were timestamped: start over.
+        transactions = None
+    partitions = {}
+    if max_id is not None:
+        first, last = month_start(cash_flows.as_date(first)), cash_flows.as_date(last)
+        rebuild_from = first
+        if transactions is not None:
+            # Months that were open last time get a final full read.
+            rebuild_from = max(first, min(date.fromisoformat(transactions["open_from"]), open_from))
+            partitions = {
+                month: list(parts) for month, parts in transactions["partitions"].items()
+                if month < month_key(rebuild_from)
+            }
+            since = as_timestamp(transactions["watermark_at"])
+            if since is not None:
+                since -= timedelta(seconds=SETTLE_SECONDS)
+            backdated = read_backdated(cursor, since, rebuild_from)
+            months = backdated["Transaction_Date"].astype("datetime64[M]")
+            appended = 0
+            for month in np.unique(months):
+                key = str(month)
+                rows = (months == month) & ~np.isin(
+                    backdated["Transaction_ID"], copied_ids(directory, key, partitions.get(key))
+                )
+                if not rows.any():
+                    continue
+                write_part(os.path.join(directory, "transactions", key, part),
+                           {name: values[rows] for name, values in backdated.items()})
+                partitions.setdefault(key, []).append({"part": part, "rows": int(rows.sum())})
+                appended += int(rows.sum())
+            if appended:
+                echo(f"Transactions: {appended} back-dated rows appended")
+
+        start = rebuild_from
+        while start <= last:
+            arrays = read_month(cursor, start, max_id)
+            rows = len(arrays["Transaction_ID"])
+            if rows:
+                write_part(os.path.join(directory, "transactions", month_key(start), part), arrays)
+                partitions[month_key(start)] = [{"part": part, "rows": rows}]
+            else:
+                partitions.pop(month_key(start), None)
+            echo(f"Transactions {month_key(start)}: {rows} rows")
+            start = next_month(start)
+
+    manifest = {
+        "run": run,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "transactions": {
+            "watermark_at": watermark_at.isoformat(sep=" ") if watermark_at is not None else None,
+            "open_from": open_from.isoformat(),
+            "partitions": dict(sorted(partitions.items())),
+        },
+    }
+    for table, key, select, names in (
+        ("Clients", "clients", CLIENT_COLUMNS, CLIENT_COLUMNS),
+        ("Products", "products", PRODUCT_COLUMNS, PRODUCT_COLUMNS),
+    ):
+        arrays = read_table(cursor, table, select, names)
+        write_part(os.path.join(directory, key, part), arrays)
+        manifest[key] = {"part": part, "rows": len(arrays[names[0]])}
+        echo(f"{table}: {manifest[key]['rows']} rows")
+    conn.rollback()
+
+    save_manifest(directory, manifest)
+    remove_unreferenced(directory, manifest)
+    return manifest
+
+
+def remove_unreferenced(directory, manifest):
+    # Deletes parts the new manifest no longer points to. Readers that
+    # still have the old files mapped keep working until they reopen.
+    keep = {
+        os.path.join("transactions", month, entry["part"])
+        for month, entries in manifest["transactions"]["partitions"].items() for entry in entries
+    }
+    keep |= {os.path.join(key, manifest[key]["part"]) for key in ("clients", "products")}
+    for key in ("clients", "products"):
+        for name in os.listdir(os.path.join(directory, key)):
+            if os.path.join(key, name) not in keep:
+                shutil.rmtree(os.path.join(directory, key, name))
+    transactions_dir = os.path.join(directory, "transactions")
+    if not os.path.isdir(transactions_dir):
+        return
+    for month in os.listdir(transactions_dir):
+        for name in os.listdir(os.path.join(transactions_dir, month)):
+            if os.path.join("transactions", month, name) not in keep:
+                shutil.rmtree(os.path.join(transactions_dir, month, name))
+        if not os.listdir(os.path.join(transactions_dir, month)):
+            os.rmdir(os.path.join(transactions_dir, month))
+
+
+def money(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def group_totals(keys, amounts):
+    # (keys, counts, totals, minimums, maximums) per distinct key, in key
+    # order. Dense integer keys (client and product IDs, days) are reduced
+    # with bincount-style scatter operations, anything else by sorting.
+    as_int = keys.view(np.int64) if keys.dtype.kind == "M" else keys
+    low, high = int(as_int.min()), int(as_int.max())
+    if high - low < max(2 * len(keys), 1 << 20):
+        index = as_int - low
+        size = high - low + 1
+        counts = np.bincount(index, minlength=size)
+        totals = np.zeros(size, np.int64)
+        np.add.at(totals, index, amounts)
+        minimums = np.full(size, np.iinfo(np.int64).max)
+        np.minimum.at(minimums, index, amounts)
+        maximums = np.full(size, np.iinfo(np.int64).min)
+        np.maximum.at(maximums, index, amounts)
+        present = np.flatnonzero(counts)
+        group_keys = (present + low).astype(np.int64)
+        if keys.dtype.kind == "M":
+            group_keys = group_keys.view(keys.dtype)
+        return group_keys, counts[present], totals[present], minimums[present], maximums[present]
+
+    order = np.argsort(keys, kind="stable")
+    keys, amounts = keys[order], amounts[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+    return (
+        keys[starts], counts, np.add.reduceat(amounts, starts),
+        np.minimum.reduceat(amounts, starts), np.maximum.reduceat(amounts, starts),
+    )
+
+
+def merge_totals(first, second):
+    # Combines two group_totals results into one, in key order.
+    group_keys, index = np.unique(np.concatenate([first[0], second[0]]), return_inverse=True)
+    counts = np.zeros(len(group_keys), np.int64)
+    np.add.at(counts, index, np.concatenate([first[1], second[1]]))
+    totals = np.zeros(len(group_keys), np.int64)
+    np.add.at(totals, index, np.concatenate([first[2], second[2]]))
+    minimums = np.full(len(group_keys), np.iinfo(np.int64).max)
+    np.minimum.at(minimums, index, np.concatenate([first[3], second[3]]))
+    maximums = np.full(len(group_keys), np.iinfo(np.int64).min)
+    np.maximum.at(maximums, index, np.concatenate([first[4], second[4]]))
+    return group_keys, counts, totals, minimums, maximums
+
+
+class Snapshot:
+    # Read side: columns are memory-mapped, so only the pages a query
+    # touches are read from disk.
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest = load_manifest(directory)
+        if self.manifest is None:
+            raise FileNotFoundError(f"No snapshot in {directory}; run 'flask snapshot dump' first")
+
+    @property
+    def created_at(self):
+        return self.manifest["created_at"]
+
+    def _load(self, path, names):
+        return {name: np.load(os.path.join(self.directory, path, f"{name}.npy"), mmap_mode="r") for name in names}
+
+    def table(self, key, columns=None):
+        # Clients or Products as {column: array}.
+        names = list(columns or (CLIENT_COLUMNS if key == "clients" else PRODUCT_COLUMNS))
+        return self._load(os.path.join(key, self.manifest[key]["part"]), names)
+
+    def parts(self, columns=None, from_date=None, to_date=None):
+        # Transactions one stored part at a time, as {column: array},
+        # limited to [from_date, to_date]. Parts of months inside the range
+        # are yielded as their memory maps; only rows of a month cut by the
+        # range are copied, one part at a time.
+        names = list(columns or TRANSACTION_COLUMNS)
+        for month, entries in self.manifest["transactions"]["partitions"].items():
+            start = date.fromisoformat(f"{month}-01")
+            if (from_date and next_month(start) <= from_date) or (to_date and start > to_date):
+                continue
+            cut = (from_date and start < from_date) or (to_date and next_month(start) - timedelta(days=1) > to_date)
+            load = names if not cut or "Transaction_Date" in names else names + ["Transaction_Date"]
+            for entry in entries:
+                arrays = self._load(os.path.join("transactions", month, entry["part"]), load)
+                if cut:
+                    dates = arrays["Transaction_Date"]
+                    mask = np.ones(len(dates), dtype=bool)
+                    if from_date:
+                        mask &= dates >= np.datetime64(from_date, "D")
+                    if to_date:
+                        mask &= dates <= np.datetime64(to_date, "D")
+                    arrays = {name: values[mask] for name, values in arrays.items()}
+                yield {name: arrays[name] for name in names}
+
+    def transactions(self, columns=None, from_date=None, to_date=None):
+        # Transactions as {column: array}, reading only the monthly
+        # partitions that overlap [from_date, to_date]. Several parts are
+        # copied into one array each; reports use parts() instead.
+        names = list(columns or TRANSACTION_COLUMNS)
+        return concatenate(names, list(self.parts(names, from_date, to_date)))
+
+    def frame(self, key="transactions", columns=None, **filters):
+        # The same data as a pandas DataFrame.
+        import pandas as pd
+
+        arrays = self.transactions(columns, **filters) if key == "transactions" else self.table(key, columns)
+        return pd.DataFrame(arrays, copy=False)
+
+    def transaction_report(self, group_by="client", from_date=None, to_date=None, client_id=None, product_id=None,
+                           after=None, limit=None):
+        # The groups of GET /reports/transactions with keys after the given
+        # one (an ID, or a date for day and month), at most limit of them,
+        # computed from the snapshot with vectorized reductions. Each part is
+        # reduced on its own and only the groups that can still make the
+        # page are merged, so memory follows the largest part and the page
+        # size rather than the whole snapshot.
+        column, field = REPORT_GROUPINGS[group_by]
+        names = [column, "Transaction_Amount_Cents"]
+        names += [name for name, value in (("Client_ID", client_id), ("Product_ID", product_id))
+                  if value is not None and name not in names]
+        if after is not None and group_by in ("day", "month"):
+            after = np.datetime64(after, "D" if group_by == "day" else "M")
+        merged = None
+        for arrays in self.parts(names, from_date, to_date):
+            keys, amounts = arrays[column], arrays["Transaction_Amount_Cents"]
+            if group_by == "month":
+                keys = keys.astype("datetime64[M]")
+            mask = None
+            for name, value in (("Client_ID", client_id), ("Product_ID", product_id)):
+                if value is not None:
+                    matches = arrays[name] == value
+                    mask = matches if mask is None else mask & matches
+            if after is not None:
+                mask = keys > after if mask is None else mask & (keys > after)
+            if mask is not None:
+                keys, amounts = keys[mask], amounts[mask]
+            if not len(keys):
+                continue
+            groups = group_totals(np.asarray(keys), np.asarray(amounts))
+            if limit is not None:
+                groups = tuple(values[:limit] for values in groups)
+            merged = groups if merged is None else merge_totals(merged, groups)
+            if limit is not None:
+                merged = tuple(values[:limit] for values in merged)
+        if merged is None:
+            return []
+
+        group_keys, counts, totals, minimums, maximums = merged
+        # IDs as ints; days and months as "YYYY-MM-DD" / "YYYY-MM"
+        group_keys = group_keys.tolist() if group_keys.dtype.kind in "iu" else [str(key) for key in group_keys]
+        return [
+            {
+                field: key, "transaction_Count": int(count), "total_Amount": money(total),
+                "average_Amount": (money(total) / int(count)).quantize(Decimal("0.000001")),
+                "min_Amount": money(low), "max_Amount": money(high),
+            }
+            for key, count, total, low, high in zip(group_keys, counts, totals, minimums, maximums)
+        ]
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+import admission
+
+
+def test_pool_queues_then_sheds():
+    pool = admission.SlotPool("scans", slots=1, queue_depth=1, queue_timeout=0.05, retry_after=5)
+    pool.acquire()
+
+    # One request may wait; it times out because the slot is never freed.
+    with pytest.raises(admission.Rejected) as rejected:
+        pool.acquire()
+    assert (rejected.value.status, rejected.value.retry_after) == (503, 5)
+
+    stats = pool.stats()
+    assert (stats["admitted"], stats["queued"], stats["timeout"]) == (1, 1, 1)
+    assert stats["waiting"] == 0
+
+def test_pool_sheds_when_queue_is_full():
+    pool = admission.SlotPool("scans", slots=1, queue_depth=0)
+    pool.acquire()
+
+    with pytest.raises(admission.Rejected):
+        pool.acquire()
+    assert pool.stats()["queue_full"] == 1
+    pool.release()
+    pool.acquire()
+    assert pool.stats()["in_use"] == 1
+
+def test_queued_request_gets_released_slot():
+    pool = admission.SlotPool("writes", slots=1, queue_depth=1, queue_timeout=2)
+    pool.acquire()
+    threading.Timer(0.05, pool.release).start()
+
+    pool.acquire()
+
+    stats = pool.stats()
+    assert (stats["admitted"], stats["in_use"]) == (2, 1)
+    assert stats["wait_seconds_total"] > 0
+
+def test_rate_limiter_refills_over_time():
+    now = [0.0]
+    limiter = admission.RateLimiter(rate=2, burst=3, max_clients=1, clock=lambda: now[0])
+
+    assert [limiter.take("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.take("a") == pytest.approx(0.5)
+    assert limiter.take("a", cost=10) == pytest.approx(1.5)
+    now[0] += 0.5
+    assert limiter.take("a") == 0
+    # Only one client is tracked; a new one evicts "a", which starts over.
+    assert limiter.take("b") == 0
+    assert limiter.take("a", cost=3) == 0
+
+def test_admit_charges_class_cost():
+    control = admission.AdmissionControl(
+        {"reads": {"slots": 4, "cost": 1}, "scans": {"slots": 4, "cost": 5}}, rate=1, burst=5
+    )
+
+    control.admit("scans", "10.0.0.1")
+    with pytest.raises(admission.Rejected) as rejected:
+        control.admit("reads", "10.0.0.1")
+    assert (rejected.value.status, rejected.value.retry_after) == (429, 1)
+    control.admit("reads", "10.0.0.2")
+
+    stats = control.stats()
+    assert stats["reads"]["rate_limited"] == 1
+    assert stats["scans"]["in_use"] == 1
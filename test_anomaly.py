@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+import anomaly
+
+
+def history(client_id, count, amount=Decimal("100.00"), product_id=1, start=date(2024, 1, 1)):
+    return [
+        (client_id * 1000 + i, client_id, product_id, amount + i, start + timedelta(days=7 * i))
+        for i in range(count)
+    ]
+
+
+def test_no_score_without_history():
+    store = anomaly.FeatureStore()
+    scores = store.evaluate(*anomaly.batch_arrays(history(1, anomaly.MIN_HISTORY))[1:], update=True)
+
+    assert np.isnan(scores).all()
+
+
+def score_one(store, row, update=False):
+    return store.evaluate(*anomaly.batch_arrays([row])[1:], update=update)[0]
+
+
+def test_outliers_score_high():
+    store = anomaly.FeatureStore()
+    store.evaluate(*anomaly.batch_arrays(history(1, 20))[1:], update=True)
+
+    usual = score_one(store, (1, 1, 1, Decimal("115.00"), date(2024, 5, 27)))
+    large = score_one(store, (2, 1, 1, Decimal("5000.00"), date(2024, 5, 27)))
+    new_product = score_one(store, (3, 1, 2, Decimal("115.00"), date(2024, 5, 27)))
+
+    assert usual < 2
+    assert large > anomaly.THRESHOLD
+    assert new_product - usual == pytest.approx(anomaly.NOVELTY_WEIGHT)
+    # Evaluating without update leaves the features alone.
+    assert score_one(store, (2, 1, 1, Decimal("5000.00"), date(2024, 5, 27))) == large
+
+
+def test_batch_matches_one_at_a_time():
+    rng = np.random.default_rng(3)
+    rows = [
+        (i, int(rng.integers(1, 6)), int(rng.integers(1, 4)), Decimal(int(rng.integers(100, 10000))) / 100,
+         date(2024, 1, 1) + timedelta(days=i))
+        for i in range(300)
+    ]
+    batched = anomaly.FeatureStore().evaluate(*anomaly.batch_arrays(rows)[1:], update=True)
+    single = anomaly.FeatureStore()
+    one_by_one = np.concatenate([single.evaluate(*anomaly.batch_arrays([row])[1:], update=True) for row in rows])
+
+    np.testing.assert_allclose(batched, one_by_one)
+
+
+def test_save_and_load(tmp_path):
+    store = anomaly.FeatureStore(capacity=2)
+    store.evaluate(*anomaly.batch_arrays(history(1, 10) + history(2, 10, product_id=3))[1:], update=True)
+    path = str(tmp_path / "features.npz")
+    store.save(path)
+
+    loaded = anomaly.FeatureStore.load(path)
+    row = anomaly.batch_arrays([(1, 2, 3, Decimal("120.00"), date(2024, 4, 1))])[1:]
+
+    assert len(loaded) == 2
+    assert loaded.evaluate(*row) == store.evaluate(*row)
+
+
+def test_rescore_replaces_scores_per_client_range(tmp_path):
+    conn = MagicMock()
+    clients, cursor = MagicMock(), MagicMock()
+    conn.cursor.side_effect = [cursor, clients]
+    clients.fetchall.side_effect = [[(1,), (2,)], [(1,), (2,)], [], []]
+    cursor.fetchall.return_value = history(1, 8) + history(2, 3)
+    path = str(tmp_path / "anomaly" / "features.npz")
+
+    total, flagged = anomaly.rescore(conn, path, batch_size=2, echo=lambda line: None)
+
+    assert (total, flagged) == (11, 0)
+    statements = [call[0][0] for call in cursor.execute.call_args_list]
+    assert "DELETE FROM Transaction_Scores WHERE Client_ID BETWEEN %s AND %s" in statements
+    rows = cursor.executemany.call_args[0][1]
+    assert rows[0] == (1000, 1, None, 0)
+    assert rows[anomaly.MIN_HISTORY][2] is not None
+    assert len(anomaly.FeatureStore.load(path)) == 2
@@ -1,10 +1,24 @@
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
 import pytest
-from app import app
+
+import admission
+import idempotency
+import jobs
+import search
+import snapshots
+from app import (
+    app, client_index, hot_queries, idempotency_store, reference_cache, report_cache, request_metrics,
+    update_client_index
+)
 
 @pytest.fixture
 def mock_db(mocker):
 
-    mock_conn = mocker.patch('flask_mysqldb.MySQL.connection')
+    mock_pool = mocker.patch('app.pool')
+    mock_conn = mock_pool.acquire.return_value
     mock_cursor = mocker.MagicMock()
     mock_conn.cursor.return_value = mock_cursor
     
@@ -13,7 +27,10 @@ def mock_db(mocker):
     mock_cursor.fetchall.return_value = []
     mock_cursor.fetchone.return_value = None
     mock_cursor.rowcount = 1
-    
+
+    reference_cache.clear()
+    report_cache.clear()
+    idempotency_store.store.clear()
     return mock_cursor
 
 def test_index():
@@ -257,4 +274,1066 @@ def test_delete_transaction_success(mock_db):
 
     assert response.status_code == 200
     assert b"Transaction with ID 1 has been deleted." in response.data
-    
\ No newline at end of file
+    
+def test_get_transactions_paginated(mock_db):
+    mock_db.fetchall.return_value = [(5, 1, 1, 100, '2024-12-11'), (6, 1, 2, 50, '2024-12-12'), (7, 2, 1, 75, '2024-12-13')]
+    client = app.test_client()
+    response = client.get('/transactions?after=4&limit=2')
+
+    assert response.status_code == 200
+    assert response.headers['X-Next-Cursor'] == '6'
+    assert len(response.get_json()) == 2
+    sql, params = mock_db.execute.call_args[0]
+    assert "Transaction_ID > %s" in sql
+    assert "ORDER BY Transaction_ID LIMIT %s" in sql
+    assert params == (4, 3)
+
+def test_get_transactions_last_page_has_no_cursor(mock_db):
+    mock_db.fetchall.return_value = [(1, 1, 1, 100, '2024-12-11')]
+    client = app.test_client()
+    response = client.get('/transactions?limit=2')
+
+    assert response.status_code == 200
+    assert 'X-Next-Cursor' not in response.headers
+
+def test_get_transactions_filters(mock_db):
+    mock_db.fetchall.return_value = [(1, 3, 2, 100, '2024-12-11')]
+    client = app.test_client()
+    response = client.get('/transactions?client_ID=3&product_ID=2&from=2024-01-01&to=2024-12-31&min_amount=10')
+
+    assert response.status_code == 200
+    sql, params = mock_db.execute.call_args[0]
+    assert "Client_ID = %s AND Product_ID = %s AND Transaction_Date >= %s AND Transaction_Date <= %s" in sql
+    assert "Transaction_Amount >= %s" in sql
+    assert params[:2] == (3, 2)
+
+def test_get_transactions_invalid_filter(mock_db):
+    client = app.test_client()
+    response = client.get('/transactions?from=yesterday')
+
+    assert response.status_code == 400
+    assert b"Invalid value for 'from'" in response.data
+
+def test_get_clients_invalid_limit(mock_db):
+    client = app.test_client()
+    response = client.get('/clients?limit=0')
+
+    assert response.status_code == 400
+    assert b"'limit' must be between" in response.data
+
+def test_export_transactions_ndjson(mock_db, mocker):
+    mocker.patch('db.server_side_cursor', return_value=mock_db)
+    mock_db.fetchmany.side_effect = [[(1, 1, 1, 100, '2024-12-11'), (2, 1, 2, 50, '2024-12-12')], []]
+    client = app.test_client()
+    response = client.get('/transactions?format=ndjson&client_ID=1')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.data.decode().splitlines()
+    assert len(lines) == 2
+    assert '"transaction_ID": 1' in lines[0] or '"transaction_ID":1' in lines[0]
+    sql, params = mock_db.execute.call_args[0]
+    assert "LIMIT" not in sql
+    assert params == (1,)
+
+def test_export_clients_csv(mock_db, mocker):
+    mocker.patch('db.server_side_cursor', return_value=mock_db)
+    mock_db.fetchmany.side_effect = [[(1, 'John Doe', 'john@example.com', '1234567890', 1)], []]
+    client = app.test_client()
+    response = client.get('/clients?format=csv')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.data.decode().splitlines() == [
+        'client_ID,name,email,phone,client_Manager_Employee_ID',
+        '1,John Doe,john@example.com,1234567890,1',
+    ]
+
+def test_export_unsupported_format(mock_db):
+    client = app.test_client()
+    response = client.get('/products?format=xml')
+
+    assert response.status_code == 400
+    assert b"Unsupported format 'xml'" in response.data
+
+def test_bulk_add_transactions(mock_db):
+    client = app.test_client()
+    records = [
+        {'transaction_ID': i, 'client_ID': 1, 'product_ID': 1, 'transaction_Amount': 100, 'transaction_Date': '2024-12-11'}
+        for i in range(1, 6)
+    ]
+    response = client.post('/transactions/bulk?batch_size=2', json=records)
+
+    assert response.status_code == 201
+    assert response.get_json() == {'inserted': 5}
+    inserts = [call[0][1] for call in mock_db.executemany.call_args_list if 'INTO Transactions' in call[0][0]]
+    assert [len(batch) for batch in inserts] == [2, 2, 1]
+    mock_db.execute.assert_not_called()
+
+def test_bulk_add_clients_ndjson(mock_db):
+    client = app.test_client()
+    body = (
+        '{"client_ID": 1, "name": "John Doe", "email": "john@example.com", "phone": "1234567890", "client_Manager_Employee_ID": 1}\n'
+        '\n'
+        '{"client_ID": 2, "name": "Jane Smith", "email": "jane@example.com", "phone": "0987654321", "client_Manager_Employee_ID": 1}\n'
+    )
+    response = client.post('/clients/bulk', data=body, content_type='application/x-ndjson')
+
+    assert response.status_code == 201
+    assert response.get_json() == {'inserted': 2}
+
+def test_bulk_add_reports_invalid_rows(mock_db):
+    client = app.test_client()
+    records = [
+        {'transaction_ID': 1, 'client_ID': 1, 'product_ID': 1, 'transaction_Amount': 100, 'transaction_Date': '2024-12-11'},
+        {'transaction_ID': 2, 'client_ID': 1},
+        'not a record',
+        {'transaction_ID': 1, 'client_ID': 1, 'product_ID': 1, 'transaction_Amount': 100, 'transaction_Date': '2024-12-11'},
+    ]
+    response = client.post('/transactions/bulk', json=records)
+
+    assert response.status_code == 400
+    errors = response.get_json()['errors']
+    assert [error['index'] for error in errors] == [1, 2, 3]
+    assert errors[0]['fields'] == ['product_ID', 'transaction_Amount', 'transaction_Date']
+    mock_db.executemany.assert_not_called()
+
+def test_bulk_add_rejects_unhashable_ids(mock_db):
+    client = app.test_client()
+    records = [
+        {'client_ID': [1], 'name': 'Ana', 'email': 'ana@example.com', 'phone': '1', 'client_Manager_Employee_ID': 1},
+        {'client_ID': {'a': 1}, 'name': 'Ben', 'email': 'ben@example.com', 'phone': '2', 'client_Manager_Employee_ID': 1},
+    ]
+    response = client.post('/clients/bulk', json=records)
+
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [
+        {'index': 0, 'error': 'Invalid client_ID'}, {'index': 1, 'error': 'Invalid client_ID'}
+    ]
+    mock_db.executemany.assert_not_called()
+
+def test_add_transaction_skips_read_back(mock_db):
+    client = app.test_client()
+    response = client.post('/transactions', json={
+        'transaction_ID': 7, 'client_ID': 1, 'product_ID': 1, 'transaction_Amount': 100, 'transaction_Date': '2024-12-11'
+    })
+
+    assert response.status_code == 201
+    assert response.get_json()['transaction_ID'] == 7
+    # The ID claim in Transaction_IDs and the insert; no read-back.
+    assert [call[0][0].split()[2] for call in mock_db.execute.call_args_list] == ['Transaction_IDs', 'Transactions']
+    mock_db.fetchone.assert_not_called()
+
+class DuplicateKey(Exception):
+    pass
+
+def test_add_transaction_rejects_reused_id_with_another_date(mock_db):
+    # Transactions' primary key includes the partitioning date, so the
+    # duplicate is caught by the unpartitioned Transaction_IDs table.
+    import app as api
+    api.pool.acquire.return_value.IntegrityError = DuplicateKey
+
+    def execute(sql, params=None):
+        if sql.startswith("INSERT INTO Transaction_IDs"):
+            raise DuplicateKey(1062, "Duplicate entry '7' for key 'PRIMARY'")
+    mock_db.execute.side_effect = execute
+    client = app.test_client()
+    response = client.post('/transactions', json={
+        'transaction_ID': 7, 'client_ID': 1, 'product_ID': 1, 'transaction_Amount': 100, 'transaction_Date': '2025-01-02'
+    })
+
+    assert response.status_code == 409
+    assert "Duplicate entry '7'" in response.get_json()['detail']
+    assert not any('INTO Transactions' in call[0][0] for call in mock_db.execute.call_args_list)
+    mock_db.executemany.assert_not_called()
+
+def test_bulk_transactions_claim_their_ids(mock_db):
+    client = app.test_client()
+    records = [
+        {'transaction_ID': i, 'client_ID': 1, 'product_ID': 1, 'transaction_Amount': 100, 'transaction_Date': '2024-12-11'}
+        for i in (1, 2)
+    ]
+    client.post('/transactions/bulk', json=records)
+
+    statements = [call[0] for call in mock_db.executemany.call_args_list]
+    assert statements[0] == ("INSERT INTO Transaction_IDs (Transaction_ID) VALUES (%s)", [(1,), (2,)])
+    assert statements[1][0].startswith("INSERT INTO Transactions ")
+
+def test_delete_transaction_releases_its_id(mock_db):
+    mock_db.fetchone.return_value = (1, 3, 2, Decimal('100'), '2024-12-11')
+    client = app.test_client()
+    client.delete('/transactions/1')
+
+    assert ("DELETE FROM Transaction_IDs WHERE Transaction_ID = %s", (1,)) in [
+        call[0] for call in mock_db.execute.call_args_list
+    ]
+
+def test_update_client_uses_rowcount(mock_db):
+    mock_db.rowcount = 1
+    client = app.test_client()
+    response = client.put('/clients/1', json={
+        'name': 'John Doe', 'email': 'john@example.com', 'phone': '1234567890', 'client_Manager_Employee_ID': 2
+    })
+
+    assert response.status_code == 200
+    assert response.get_json()['client_Manager_Employee_ID'] == 2
+    assert mock_db.execute.call_count == 1
+
+def test_update_product_not_found(mock_db):
+    mock_db.rowcount = 0
+    client = app.test_client()
+    response = client.put('/products/999', json={'product_Type': 'Product A'})
+
+    assert response.status_code == 404
+    assert b"Product not found" in response.data
+
+def test_delete_uses_single_statement(mock_db):
+    mock_db.rowcount = 1
+    client = app.test_client()
+    response = client.delete('/products/1')
+
+    assert response.status_code == 200
+    assert mock_db.execute.call_count == 1
+    assert mock_db.execute.call_args[0][0].startswith("DELETE")
+
+def test_strict_consistency_reads_back(mock_db, monkeypatch):
+    monkeypatch.setitem(app.config, "STRICT_CONSISTENCY", True)
+    mock_db.fetchone.return_value = (1, 'Stored Name')
+    client = app.test_client()
+    response = client.put('/employees/1', json={'name': 'Updated Name'})
+
+    assert response.status_code == 200
+    assert response.get_json()['name'] == 'Stored Name'
+    assert mock_db.execute.call_count == 2
+
+def test_strict_consistency_delete_not_found(mock_db, monkeypatch):
+    monkeypatch.setitem(app.config, "STRICT_CONSISTENCY", True)
+    mock_db.fetchone.return_value = None
+    client = app.test_client()
+    response = client.delete('/clients/999')
+
+    assert response.status_code == 404
+    assert mock_db.execute.call_count == 1
+
+def test_get_products_served_from_cache(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Product A')]
+    client = app.test_client()
+    first = client.get('/products')
+    second = client.get('/products')
+
+    assert first.status_code == second.status_code == 200
+    assert second.data == first.data
+    assert mock_db.execute.call_count == 1
+
+def test_get_employees_etag_revalidation(mock_db):
+    mock_db.fetchall.return_value = [(1, 'John Doe')]
+    client = app.test_client()
+    first = client.get('/employees')
+    etag = first.headers['ETag']
+    second = client.get('/employees', headers={'If-None-Match': etag})
+
+    assert second.status_code == 304
+    assert second.data == b''
+
+def test_product_write_invalidates_cache(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Product A')]
+    client = app.test_client()
+    etag = client.get('/products').headers['ETag']
+
+    client.put('/products/1', json={'product_Type': 'Product B'})
+    mock_db.fetchall.return_value = [(1, 'Product B')]
+    response = client.get('/products', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert b'Product B' in response.data
+
+def test_client_summary(mock_db):
+    mock_db.fetchall.return_value = [
+        (1, 2, 300, 150, 100, 200, '2024-01-01', '2024-02-01'),
+        (2, 1, 50, 50, 50, 50, '2024-03-01', '2024-03-01'),
+        (None, 3, 350, 116.67, 50, 200, '2024-01-01', '2024-03-01'),
+    ]
+    client = app.test_client()
+    response = client.get('/clients/7/summary?from=2024-01-01')
+
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert summary['client_ID'] == 7
+    assert summary['transaction_Count'] == 3
+    assert summary['total_Amount'] == 350
+    assert [product['product_ID'] for product in summary['products']] == [1, 2]
+    assert response.headers['Cache-Control'] == 'max-age=60'
+    sql, params = mock_db.execute.call_args[0]
+    assert "GROUP BY Product_ID WITH ROLLUP" in sql
+    assert params[0] == 7
+
+def test_client_summary_not_found(mock_db):
+    client = app.test_client()
+    response = client.get('/clients/999/summary')
+
+    assert response.status_code == 404
+
+def test_transaction_report_by_month(mock_db):
+    mock_db.fetchall.return_value = [('2024-01', 2, 300, 150, 100, 200), ('2024-02', 1, 50, 50, 50, 50)]
+    client = app.test_client()
+    response = client.get('/reports/transactions?group_by=month&from=2024-01-01&to=2024-12-31&after=2023-12')
+
+    assert response.status_code == 200
+    assert response.get_json()[0] == {
+        'month': '2024-01', 'transaction_Count': 2, 'total_Amount': 300,
+        'average_Amount': 150, 'min_Amount': 100, 'max_Amount': 200
+    }
+    sql, params = mock_db.execute.call_args[0]
+    assert "GROUP BY DATE_FORMAT(Transaction_Date" in sql
+    assert str(params[2]) == '2024-01-01'
+
+def test_transaction_report_cached_per_window(mock_db):
+    mock_db.fetchall.return_value = [(1, 2, 300, 150, 100, 200)]
+    client = app.test_client()
+    client.get('/reports/transactions?group_by=client&from=2024-01-01')
+    client.get('/reports/transactions?group_by=client&from=2024-01-01')
+    client.get('/reports/transactions?group_by=client&from=2024-02-01')
+
+    assert mock_db.execute.call_count == 2
+
+def test_transaction_report_invalid_group(mock_db):
+    client = app.test_client()
+    response = client.get('/reports/transactions?group_by=week')
+
+    assert response.status_code == 400
+
+def test_add_transaction_updates_balances(mock_db):
+    client = app.test_client()
+    response = client.post('/transactions', json={
+        'transaction_ID': 1, 'client_ID': 3, 'product_ID': 2, 'transaction_Amount': '100.50', 'transaction_Date': '2024-12-11'
+    })
+
+    assert response.status_code == 201
+    upserts = {call[0][0].split()[2]: call[0][1] for call in mock_db.executemany.call_args_list}
+    assert upserts['Client_Balances'] == [(3, Decimal('100.50'), 1)]
+    assert upserts['Client_Product_Balances'] == [(3, 2, Decimal('100.50'), 1)]
+
+def test_add_transaction_invalid_amount(mock_db):
+    client = app.test_client()
+    response = client.post('/transactions', json={
+        'transaction_ID': 1, 'client_ID': 3, 'product_ID': 2, 'transaction_Amount': 'lots', 'transaction_Date': '2024-12-11'
+    })
+
+    assert response.status_code == 400
+    mock_db.execute.assert_not_called()
+
+def test_update_transaction_applies_balance_delta(mock_db):
+    mock_db.fetchone.return_value = (1, 3, 2, Decimal('100'), '2024-12-11')
+    client = app.test_client()
+    response = client.put('/transactions/1', json={
+        'client_ID': 3, 'product_ID': 2, 'transaction_Amount': 150, 'transaction_Date': '2024-12-11'
+    })
+
+    assert response.status_code == 200
+    assert 'FOR UPDATE' in mock_db.execute.call_args_list[0][0][0]
+    upserts = {call[0][0].split()[2]: call[0][1] for call in mock_db.executemany.call_args_list}
+    assert upserts['Client_Balances'] == [(3, Decimal('50'), 0)]
+
+def test_update_transaction_not_found(mock_db):
+    mock_db.fetchone.return_value = None
+    client = app.test_client()
+    response = client.put('/transactions/999', json={
+        'client_ID': 3, 'product_ID': 2, 'transaction_Amount': 150, 'transaction_Date': '2024-12-11'
+    })
+
+    assert response.status_code == 404
+    mock_db.executemany.assert_not_called()
+
+def test_delete_transaction_reverses_balance(mock_db):
+    mock_db.fetchone.return_value = (1, 3, 2, Decimal('100'), '2024-12-11')
+    client = app.test_client()
+    response = client.delete('/transactions/1')
+
+    assert response.status_code == 200
+    upserts = {call[0][0].split()[2]: call[0][1] for call in mock_db.executemany.call_args_list}
+    assert upserts['Client_Product_Balances'] == [(3, 2, Decimal('-100'), -1)]
+
+def test_get_client_balance(mock_db):
+    mock_db.fetchone.return_value = (Decimal('250.00'), 3)
+    mock_db.fetchall.return_value = [(1, Decimal('200.00'), 2), (2, Decimal('50.00'), 1)]
+    client = app.test_client()
+    response = client.get('/clients/3/balance')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['transaction_Count'] == 3
+    assert len(body['products']) == 2
+
+def test_get_client_balance_not_found(mock_db):
+    client = app.test_client()
+    response = client.get('/clients/3/balance')
+
+    assert response.status_code == 404
+
+def test_get_cash_flows(mock_db):
+    mock_db.fetchall.return_value = [(1, 3, Decimal('250.00'), '2024-12-11')]
+    client = app.test_client()
+    response = client.get('/cash_flows?client_ID=3&from=2024-01-01')
+
+    assert response.status_code == 200
+    assert response.get_json()[0]['cash_Flow_ID'] == 1
+    sql, params = mock_db.execute.call_args[0]
+    assert "Client_ID = %s AND Cash_Flow_Date >= %s" in sql
+
+def test_get_cash_flows_empty(mock_db):
+    client = app.test_client()
+    response = client.get('/cash_flows')
+
+    assert response.status_code == 404
+    assert b"No cash flows found" in response.data
+
+def test_add_cash_flow_updates_buckets(mock_db):
+    client = app.test_client()
+    response = client.post('/cash_flows', json={
+        'cash_Flow_ID': 1, 'client_ID': 3, 'cash_Flow_Amount': '-40.00', 'cash_Flow_Date': '2024-12-11'
+    })
+
+    assert response.status_code == 201
+    buckets = mock_db.executemany.call_args[0][1]
+    assert [(bucket[1], str(bucket[2]), bucket[4]) for bucket in buckets] == [
+        ('day', '2024-12-11', Decimal('40.00')), ('month', '2024-12-01', Decimal('40.00'))
+    ]
+
+def test_add_cash_flow_invalid_date(mock_db):
+    client = app.test_client()
+    response = client.post('/cash_flows', json={
+        'cash_Flow_ID': 1, 'client_ID': 3, 'cash_Flow_Amount': 10, 'cash_Flow_Date': 'soon'
+    })
+
+    assert response.status_code == 400
+    assert b"Invalid cash_Flow_Date" in response.data
+
+def test_update_cash_flow_not_found(mock_db):
+    client = app.test_client()
+    response = client.put('/cash_flows/999', json={
+        'client_ID': 3, 'cash_Flow_Amount': 10, 'cash_Flow_Date': '2024-12-11'
+    })
+
+    assert response.status_code == 404
+    assert b"Cash flow not found" in response.data
+
+def test_delete_cash_flow_reverses_buckets(mock_db):
+    mock_db.fetchone.return_value = (1, 3, Decimal('25.00'), '2024-12-11')
+    client = app.test_client()
+    response = client.delete('/cash_flows/1')
+
+    assert response.status_code == 200
+    buckets = mock_db.executemany.call_args[0][1]
+    assert all(bucket[3] == Decimal('-25.00') and bucket[5] == -1 for bucket in buckets)
+
+def test_cash_flow_rollup_for_client(mock_db):
+    mock_db.fetchall.return_value = [('2024-01-01', Decimal('100'), Decimal('30'), 4)]
+    client = app.test_client()
+    response = client.get('/cash_flows/rollup?client_ID=3&granularity=month&from=2020-01-15&to=2024-12-31')
+
+    assert response.status_code == 200
+    assert response.get_json()[0]['net_Flow'] == '70'
+    sql, params = mock_db.execute.call_args[0]
+    assert "FROM Cash_Flow_Buckets WHERE Granularity = %s AND Client_ID = %s" in sql
+    assert str(params[2]) == '2020-01-01'
+
+def test_metrics_count_statements_per_route(mock_db, mocker):
+    mocker.patch('app.pool.stats', return_value={'size': 2, 'idle': 1, 'checkouts': 5})
+    request_metrics.registry.clear()
+    client = app.test_client()
+    client.put('/employees/1', json={'name': 'Updated Name'})
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    labels = 'method="PUT",route="/employees/<int:employee_id>"'
+    assert f'http_requests_total{{{labels},status="200"}} 1' in text
+    assert f'http_request_db_statements_total{{{labels}}} 2' in text
+    assert f'http_request_duration_seconds_count{{{labels}}} 1' in text
+    assert 'db_pool_checkouts_total 5' in text
+
+@pytest.fixture
+def mock_replicas(mocker, mock_db):
+    replicas = mocker.patch('app.replicas')
+    replica = mocker.MagicMock()
+    conn = mocker.MagicMock()
+    conn.cursor.return_value.fetchall.return_value = []
+    conn.cursor.return_value.fetchone.return_value = None
+    replicas.acquire.return_value = (replica, conn)
+    replicas.catch_up_seconds.return_value = 7
+    return replicas
+
+def test_reads_go_to_a_replica(mock_db, mock_replicas):
+    replica, conn = mock_replicas.acquire.return_value
+    conn.cursor.return_value.fetchall.return_value = [(1, 'Ana', 'ana@example.com', '555', 2)]
+
+    response = app.test_client().get('/clients')
+
+    assert response.status_code == 200
+    assert response.get_json()[0]['name'] == 'Ana'
+    mock_db.execute.assert_not_called()
+    replica.pool.release.assert_called_once_with(conn)
+    mock_replicas.acquire.assert_called_once_with(None)
+
+def test_reads_after_a_write_carry_its_time(mock_db, mock_replicas):
+    client = app.test_client()
+    response = client.put('/employees/1', json={'name': 'Updated Name'})
+
+    written_at = float(response.headers['X-Last-Write'])
+    assert 'last_write=' in response.headers['Set-Cookie']
+    assert 'Max-Age=7' in response.headers['Set-Cookie']
+    mock_replicas.acquire.assert_not_called()
+    client.get('/clients')
+    mock_replicas.acquire.assert_called_once_with(written_at)
+
+def test_batch_get_reads_from_a_replica(mock_db, mock_replicas):
+    response = app.test_client().post('/clients/batch-get', json={'ids': [1]})
+
+    assert response.status_code == 200
+    assert 'X-Last-Write' not in response.headers
+    mock_replicas.acquire.assert_called_once()
+
+def test_reference_cache_is_filled_from_the_primary(mock_db, mock_replicas):
+    mock_db.fetchall.return_value = [(1, 'John Doe')]
+
+    response = app.test_client().get('/employees')
+
+    assert response.status_code == 200
+    mock_replicas.acquire.assert_not_called()
+
+def test_idempotent_retry_replays_without_writing(mock_db):
+    payload = {
+        'transaction_ID': 7, 'client_ID': 3, 'product_ID': 2,
+        'transaction_Amount': 100, 'transaction_Date': '2024-12-11'
+    }
+    client = app.test_client()
+    first = client.post('/transactions', json=payload, headers={'Idempotency-Key': 'abc'})
+    calls = mock_db.execute.call_count
+    retry = client.post('/transactions', json=payload, headers={'Idempotency-Key': 'abc'})
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.data == first.data
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert mock_db.execute.call_count == calls
+
+def test_idempotency_key_reused_for_different_request(mock_db):
+    client = app.test_client()
+    client.post('/employees', json={'employee_ID': 1, 'name': 'John Doe'}, headers={'Idempotency-Key': 'k'})
+    response = client.post('/employees', json={'employee_ID': 2, 'name': 'Jane'}, headers={'Idempotency-Key': 'k'})
+
+    assert response.status_code == 422
+
+def test_idempotency_key_reused_on_another_endpoint(mock_db):
+    client = app.test_client()
+    client.post('/employees', json={'employee_ID': 1, 'name': 'John Doe'}, headers={'Idempotency-Key': 'k'})
+    response = client.put('/employees/1', json={'employee_ID': 1, 'name': 'John Doe'}, headers={'Idempotency-Key': 'k'})
+
+    assert response.status_code == 422
+
+def test_idempotency_key_in_progress(mock_db):
+    body = b'{"name": "Updated Name"}'
+    idempotency_store.begin('k', idempotency.fingerprint('PUT', '/employees/1', body))
+    client = app.test_client()
+    response = client.put(
+        '/employees/1', data=body, content_type='application/json', headers={'Idempotency-Key': 'k'}
+    )
+
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+
+def test_pending_marker_outlives_its_ttl_while_held():
+    store = idempotency.IdempotencyStore(pending_ttl=0.06)
+    assert store.begin('k', 'f') == (None, None)
+
+    with store.held('k', 'f'):
+        time.sleep(0.2)
+        state, _ = store.begin('k', 'f')
+
+    assert state == idempotency.PENDING
+
+def test_held_keys_share_one_renewer():
+    store = idempotency.IdempotencyStore(pending_ttl=0.06)
+    store.begin('a', 'f')
+    store.begin('b', 'g')
+
+    with store.held('a', 'f'), store.held('b', 'g'):
+        renewer = store._renewer
+        time.sleep(0.2)
+        assert store.begin('b', 'g')[0] == idempotency.PENDING
+    store.complete('a', 'f', (201, b'{}', 'application/json'))
+    time.sleep(0.1)
+
+    assert store._renewer is None and not renewer.is_alive()
+    assert store.begin('a', 'f')[0] == idempotency.DONE
+
+def test_idempotency_key_released_after_server_error(mock_db):
+    mock_db.fetchone.return_value = None
+    app.config['STRICT_CONSISTENCY'] = True
+    try:
+        client = app.test_client()
+        failed = client.post('/employees', json={'employee_ID': 1, 'name': 'John'}, headers={'Idempotency-Key': 'k'})
+        mock_db.fetchone.return_value = (1, 'John')
+        retried = client.post('/employees', json={'employee_ID': 1, 'name': 'John'}, headers={'Idempotency-Key': 'k'})
+    finally:
+        app.config['STRICT_CONSISTENCY'] = False
+
+    assert failed.status_code == 500
+    assert retried.status_code == 201
+
+def test_search_clients(mock_db):
+    client_index.build([[(1, 'Jane Smith', 'jane@example.com', '555-0100'), (2, 'John Smith', 'john@example.com', '555-0200')]])
+    mock_db.fetchall.return_value = [
+        (2, 'John Smith', 'john@example.com', '555-0200', 1), (1, 'Jane Smith', 'jane@example.com', '555-0100', 1)
+    ]
+    client = app.test_client()
+    response = client.get('/clients/search?q=smith')
+
+    assert response.status_code == 200
+    assert [item['client_ID'] for item in response.get_json()] == [1, 2]
+    sql, params = mock_db.execute.call_args[0]
+    assert "WHERE Client_ID IN (%s, %s)" in sql
+    assert params == (1, 2)
+
+def test_search_clients_requires_query(mock_db):
+    client = app.test_client()
+    response = client.get('/clients/search?q=')
+
+    assert response.status_code == 400
+
+def test_client_writes_update_search_index(mock_db):
+    client_index.build([[]])
+    client = app.test_client()
+    client.post('/clients', json={
+        'client_ID': 5, 'name': 'Ada Lovelace', 'email': 'ada@example.com',
+        'phone': '555-0500', 'client_Manager_Employee_ID': 1
+    })
+    assert client_index.search('love') == [5]
+
+    client.delete('/clients/5')
+    assert client_index.search('love') == []
+
+def test_hot_queries_are_the_statements_the_handlers_issue(mock_db):
+    queries = {description: (sql, params) for description, sql, params, _, _ in hot_queries()}
+    client = app.test_client()
+
+    client.get('/transactions?product_ID=1&after=0')
+    assert mock_db.execute.call_args[0] == queries["transaction pages by product"]
+    client.get('/clients/1/summary')
+    assert mock_db.execute.call_args[0] == queries["client summary"]
+    client.get('/transactions/flagged?after=0')
+    assert mock_db.execute.call_args[0] == queries["flagged transactions"]
+    assert "CAST(Transaction_Amount AS CHAR)" in queries["transaction pages by client"][0]
+
+def test_client_index_refresh_reads_only_logged_changes(mocker):
+    index = mocker.patch('app.client_index', search.PrefixIndex())
+    index.build([[(1, 'Jane Smith', 'jane@example.com', '1'), (2, 'John Smith', 'john@example.com', '2')]], 10)
+    cursor = mocker.MagicMock()
+    cursor.fetchone.return_value = (13,)
+    cursor.fetchall.side_effect = [
+        [(11, 2, 'update', '{"client_ID": 2, "name": "John Lovelace", "email": "j@example.com", "phone": "2"}'),
+         (12, 3, 'insert', '{"client_ID": 3, "name": "Ada Lovelace", "email": "ada@example.com", "phone": "3"}'),
+         (13, 1, 'delete', None)],
+        [],
+    ]
+    conn = mocker.MagicMock()
+    conn.cursor.return_value = cursor
+
+    update_client_index(conn)
+
+    assert index.position == 13
+    assert index.search('love') == [2, 3]
+    assert index.search('smith') == []
+    assert "FROM Clients" not in " ".join(str(call[0][0]) for call in cursor.execute.call_args_list)
+    assert cursor.execute.call_args_list[1][0][1] == (10, 13, 'clients', app.config['CLIENT_SEARCH_BATCH_SIZE'])
+
+def test_clients_expand_uses_one_query_per_relation(mock_db):
+    mock_db.description = None
+    mock_db.fetchall.side_effect = [
+        [(1, 'Jane', 'jane@example.com', '555', 10), (2, 'John', 'john@example.com', '556', 10)],
+        [(10, 'Manager Mia')],
+        [(7, 1, 3, Decimal('5.00'), '2024-12-11'), (8, 2, 3, Decimal('6.00'), '2024-12-10')],
+        [(3, 'Savings')],
+    ]
+    client = app.test_client()
+    response = client.get('/clients?expand=manager,transactions,product')
+
+    assert response.status_code == 200
+    clients = response.get_json()
+    assert clients[0]['manager'] == {'employee_ID': 10, 'name': 'Manager Mia'}
+    assert clients[1]['transactions'][0]['product'] == {'product_ID': 3, 'product_Type': 'Savings'}
+    assert mock_db.execute.call_count == 4
+    sql, params = mock_db.execute.call_args_list[2][0]
+    assert "ROW_NUMBER() OVER (PARTITION BY Client_ID" in sql
+    assert params == (1, 2, 10)
+
+def test_transactions_expand_client_and_product(mock_db):
+    mock_db.fetchall.side_effect = [
+        [(7, 1, 3, Decimal('5.00'), '2024-12-11'), (8, 1, 4, Decimal('6.00'), '2024-12-10')],
+        [(1, 'Jane', 'jane@example.com', '555', 10)],
+        [(3, 'Savings'), (4, 'Loan')],
+    ]
+    client = app.test_client()
+    response = client.get('/transactions?expand=client,product')
+
+    assert response.status_code == 200
+    transactions = response.get_json()
+    assert transactions[1]['client']['name'] == 'Jane'
+    assert transactions[1]['product']['product_Type'] == 'Loan'
+    assert mock_db.execute.call_args_list[1][0][1] == (1,)
+
+def test_expand_rejects_unknown_relation(mock_db):
+    client = app.test_client()
+    response = client.get('/transactions?expand=manager')
+
+    assert response.status_code == 400
+    assert b"'expand' must be a comma-separated list of: client, product" in response.data
+
+def test_get_client_by_id(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Jane', 'jane@example.com', '555', 10)]
+    client = app.test_client()
+    response = client.get('/clients/1')
+
+    assert response.status_code == 200
+    assert response.get_json()['email'] == 'jane@example.com'
+
+def test_get_transaction_by_id_not_found(mock_db):
+    client = app.test_client()
+    response = client.get('/transactions/999')
+
+    assert response.status_code == 404
+    assert b"Transaction not found" in response.data
+
+def test_batch_get_returns_request_order_with_misses(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Jane', 'jane@example.com', '555', 10), (3, 'Ann', 'ann@example.com', '557', 10)]
+    client = app.test_client()
+    response = client.post('/clients/batch-get', json={'ids': [3, 2, 1, 3]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [item and item['client_ID'] for item in body['items']] == [3, None, 1, 3]
+    assert body['missing'] == [2]
+    assert mock_db.execute.call_count == 1
+    assert mock_db.execute.call_args[0][1] == (1, 2, 3)
+
+def test_batch_get_products_uses_record_cache(mock_db):
+    mock_db.fetchall.return_value = [(1, 'Savings')]
+    client = app.test_client()
+    client.get('/products/1')
+    mock_db.fetchall.return_value = [(2, 'Loan')]
+    response = client.post('/products/batch-get', json={'ids': [1, 2]})
+
+    assert [item['product_Type'] for item in response.get_json()['items']] == ['Savings', 'Loan']
+    assert mock_db.execute.call_args[0][1] == (2,)
+
+def test_batch_get_limits(mock_db):
+    client = app.test_client()
+    app.config['BATCH_GET_MAX_IDS'] = 2
+    try:
+        too_many = client.post('/employees/batch-get', json={'ids': [1, 2, 3]})
+    finally:
+        app.config['BATCH_GET_MAX_IDS'] = 1000
+    not_ints = client.post('/employees/batch-get', json={'ids': ['1']})
+
+    assert too_many.status_code == 413
+    assert not_ints.status_code == 400
+
+@pytest.fixture
+def job_queue(mocker, tmp_path):
+    queue = jobs.JobQueue(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "results"), {})
+    mocker.patch.object(queue, "start")
+    mocker.patch.object(queue, "_submit")
+    mocker.patch("app.job_queue", queue)
+    return queue
+
+def test_job_queue_starts_on_first_request(mocker, monkeypatch, tmp_path):
+    mocker.patch('app._configured', False)
+    mocker.patch('app.job_queue', None)
+    queue_class = mocker.patch('jobs.JobQueue')
+    monkeypatch.setitem(app.config, 'JOBS_DIR', str(tmp_path))
+    monkeypatch.setitem(app.config, 'JOBS_MAX_WORKERS', 4)
+
+    app.test_client().get('/')
+
+    store_path, result_dir, _, max_workers = queue_class.call_args[0]
+    assert (store_path, result_dir, max_workers) == (
+        str(tmp_path / 'jobs.sqlite3'), str(tmp_path / 'results'), 4
+    )
+    queue_class.return_value.start.assert_called_once()
+
+def test_add_export_job(mock_db, job_queue):
+    client = app.test_client()
+    response = client.post('/jobs', json={
+        'kind': 'export', 'resource': 'transactions', 'format': 'ndjson',
+        'filters': {'client_ID': 5, 'from': '2024-01-01', 'min_amount': '10.50'}
+    })
+
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['status'] == 'queued'
+    assert response.headers['Location'] == f"/jobs/{body['job_ID']}"
+    job_queue._submit.assert_called_once_with(body['job_ID'])
+    spec = job_queue.store.get(body['job_ID'])['spec']
+    assert spec['conditions'] == ['Client_ID = %s', 'Transaction_Date >= %s', 'Transaction_Amount >= %s']
+    assert spec['params'] == [5, '2024-01-01', '10.50']
+    assert spec['resource'] == 'transactions'
+
+def test_add_job_validation(mock_db, job_queue):
+    client = app.test_client()
+
+    assert client.post('/jobs', json={'kind': 'rebuild'}).status_code == 400
+    assert client.post('/jobs', json={'kind': 'export', 'resource': 'accounts'}).status_code == 400
+    assert client.post('/jobs', json={'kind': 'report', 'group_by': 'week'}).status_code == 400
+    assert client.post('/jobs', json={'kind': 'report', 'filters': {'from': 'May'}}).status_code == 400
+    job_queue._submit.assert_not_called()
+
+def test_get_job_status_and_result(mock_db, job_queue, tmp_path):
+    client = app.test_client()
+    job_id = client.post('/jobs', json={'kind': 'report', 'group_by': 'month'}).get_json()['job_ID']
+
+    pending = client.get(f'/jobs/{job_id}/result')
+    assert pending.status_code == 409
+    assert pending.headers['Retry-After'] == '5'
+
+    result = tmp_path / "report.json"
+    result.write_text('[{"month": "2024-01"}]')
+    job_queue.store.claim(job_id)
+    job_queue.store.finish(job_id, str(result), 1)
+
+    status = client.get(f'/jobs/{job_id}').get_json()
+    assert status['status'] == 'succeeded'
+    assert status['progress'] == 1
+    assert status['result_URL'] == f'/jobs/{job_id}/result'
+    download = client.get(status['result_URL'])
+    assert download.status_code == 200
+    assert download.mimetype == 'application/json'
+    assert download.get_json() == [{'month': '2024-01'}]
+    assert client.get('/jobs/missing').status_code == 404
+
+def test_snapshot_report(tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'SNAPSHOT_DIR', str(tmp_path))
+    client = app.test_client()
+    assert client.get('/snapshots/reports/transactions').status_code == 404
+
+    snapshots.write_part(str(tmp_path / 'transactions' / '2024-01' / 'r000001'), snapshots.column_arrays(
+        snapshots.TRANSACTION_COLUMNS,
+        [(1, 1, 1, Decimal('10.00'), date(2024, 1, 2)), (2, 2, 1, Decimal('5.50'), date(2024, 1, 3)),
+         (3, 3, 2, Decimal('1.00'), date(2024, 1, 3))]
+    ))
+    snapshots.save_manifest(str(tmp_path), {
+        'run': 1, 'created_at': '2024-01-04T00:00:00+00:00',
+        'transactions': {'watermark_id': 3, 'open_from': '2024-01-01',
+                         'partitions': {'2024-01': [{'part': 'r000001', 'rows': 3}]}},
+    })
+
+    response = client.get('/snapshots/reports/transactions?group_by=client&product_ID=1&limit=1')
+    assert response.status_code == 200
+    assert response.get_json() == [{
+        'client_ID': 1, 'transaction_Count': 1, 'total_Amount': '10.00', 'average_Amount': '10.000000',
+        'min_Amount': '10.00', 'max_Amount': '10.00'
+    }]
+    assert response.headers['X-Next-Cursor'] == '1'
+    assert response.headers['X-Snapshot-Created'] == '2024-01-04T00:00:00+00:00'
+    after = client.get('/snapshots/reports/transactions?group_by=client&product_ID=1&after=1')
+    assert [group['client_ID'] for group in after.get_json()] == [2]
+    days = client.get('/snapshots/reports/transactions?group_by=day&after=2024-01-02')
+    assert [group['day'] for group in days.get_json()] == ['2024-01-03']
+    assert client.get('/snapshots/reports/transactions?group_by=day&after=soon').status_code == 400
+
+def test_add_transaction_stores_score(mock_db):
+    client = app.test_client()
+    response = client.post('/transactions', json={
+        'transaction_ID': 9, 'client_ID': 4, 'product_ID': 2, 'transaction_Amount': '10.00', 'transaction_Date': '2024-12-11'
+    })
+
+    assert response.status_code == 201
+    scores = [call[0][1] for call in mock_db.executemany.call_args_list if 'Transaction_Scores' in call[0][0]]
+    assert scores == [[(9, 4, None, 0)]]
+
+def test_transactions_expand_score(mock_db):
+    mock_db.fetchall.side_effect = [
+        [(1, 1, 2, Decimal('5000.00'), '2024-12-11'), (2, 1, 2, Decimal('50.00'), '2024-12-12')],
+        [(1, 8.25, 1, '2024-12-11 10:00:00')],
+    ]
+    client = app.test_client()
+    response = client.get('/transactions?expand=score')
+
+    items = response.get_json()
+    assert items[0]['score'] == {'score': 8.25, 'flagged': True, 'scored_At': '2024-12-11 10:00:00'}
+    assert items[1]['score'] is None
+    assert 'FROM Transaction_Scores WHERE Transaction_ID IN' in mock_db.execute.call_args[0][0]
+
+def test_get_flagged_transactions(mock_db):
+    mock_db.fetchall.return_value = [
+        (5, 1, 2, Decimal('5000.00'), '2024-12-11', 8.25, '2024-12-11 10:00:00'),
+        (7, 1, 2, Decimal('6000.00'), '2024-12-12', 9.5, '2024-12-12 10:00:00'),
+    ]
+    client = app.test_client()
+    response = client.get('/transactions/flagged?client_ID=1&limit=1')
+
+    assert response.status_code == 200
+    assert response.get_json() == [{
+        'transaction_ID': 5, 'client_ID': 1, 'product_ID': 2, 'transaction_Amount': '5000.00',
+        'transaction_Date': '2024-12-11', 'score': {'score': 8.25, 'flagged': True, 'scored_At': '2024-12-11 10:00:00'}
+    }]
+    assert response.headers['X-Next-Cursor'] == '5'
+    assert mock_db.execute.call_args[0][1] == (1, 2)
+
+def test_writes_log_changes(mock_db):
+    client = app.test_client()
+    client.post('/transactions', json={
+        'transaction_ID': 7, 'client_ID': 1, 'product_ID': 1, 'transaction_Amount': 100, 'transaction_Date': '2024-12-11'
+    })
+    mock_db.rowcount = 0
+    client.delete('/products/9')
+
+    logged = [call[0][1] for call in mock_db.executemany.call_args_list if 'Change_Log' in call[0][0]]
+    assert logged == [[('transactions', 7, 'insert', '{"transaction_ID":7,"client_ID":1,"product_ID":1,'
+                        '"transaction_Amount":100,"transaction_Date":"2024-12-11"}')]]
+
+def test_get_changes(mock_db):
+    mock_db.fetchall.return_value = [
+        (1, 'clients', 4, 'update', '{"client_ID": 4}', datetime(2024, 12, 11, 9, 30), 1),
+        (2, 'clients', 4, 'delete', None, datetime(2024, 12, 11, 9, 31), 1),
+    ]
+    client = app.test_client()
+    response = client.get('/changes?since=0&limit=2')
+
+    assert response.status_code == 200
+    assert response.headers['X-Next-Cursor'] == '2'
+    assert response.get_json()[0]['data'] == {'client_ID': 4}
+    assert response.get_json()[1]['action'] == 'delete'
+    assert client.get('/changes?since=-1').status_code == 400
+
+def test_stream_changes_resumes_from_last_event_id(mock_db, mocker, monkeypatch):
+    monkeypatch.setitem(app.config, "CHANGES_STREAM_SECONDS", 0.05)
+    feed = mocker.patch('app.change_feed')
+    feed.poll_seconds = 1.0
+    batches = [[{'change_ID': 6, 'resource': 'products', 'record_ID': 2, 'action': 'update', 'data': None}]]
+    feed.wait.side_effect = lambda since, timeout: batches.pop() if batches else []
+
+    response = app.test_client().get('/changes/stream?since=1', headers={'Last-Event-ID': '5'})
+
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert body.startswith('retry: 1000\n\n')
+    assert 'id: 6\ndata: {"change_ID":6,' in body
+    assert feed.wait.call_args_list[0][0][0] == 5
+    assert feed.wait.call_args_list[1][0][0] == 6
+    feed.unsubscribe.assert_called_once()
+
+def test_scans_are_shed_before_writes(mock_db, mocker):
+    control = admission.AdmissionControl({
+        'writes': {'slots': 1}, 'reads': {'slots': 1}, 'scans': {'slots': 1, 'retry_after': 5},
+        'streams': {'slots': 1},
+    })
+    mocker.patch('app.admission_control', control)
+    control.pools['scans'].acquire()
+    client = app.test_client()
+
+    response = client.get('/transactions')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
+    assert client.put('/employees/1', json={'name': 'Updated Name'}).status_code == 200
+    assert control.pools['writes'].stats()['in_use'] == 0
+    assert client.get('/metrics').status_code == 200
+
+def test_rate_limit_by_client_header(mock_db, mocker, monkeypatch):
+    monkeypatch.setitem(app.config, 'ADMISSION_CLIENT_HEADER', 'X-Api-Key')
+    mocker.patch('app.admission_control', admission.AdmissionControl(rate=1, burst=1))
+    client = app.test_client()
+
+    assert client.put('/employees/1', json={'name': 'A'}, headers={'X-Api-Key': 'a'}).status_code == 200
+    response = client.put('/employees/1', json={'name': 'A'}, headers={'X-Api-Key': 'a'})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+    assert client.put('/employees/1', json={'name': 'B'}, headers={'X-Api-Key': 'b'}).status_code == 200
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'admission_shed_total{class="writes",reason="rate_limited"} 1' in text
+    assert 'admission_admitted_total{class="writes"} 2' in text
+
+def test_reference_cache_settings_apply_after_import(mock_db, mocker, monkeypatch):
+    mocker.patch('app._configured', False)
+    monkeypatch.setitem(app.config, 'REFERENCE_CACHE_TTL', 7)
+    monkeypatch.setitem(app.config, 'REFERENCE_CACHE_MAX_ENTRIES', 3)
+    monkeypatch.setattr(reference_cache.local, 'ttl', reference_cache.local.ttl)
+    monkeypatch.setattr(reference_cache.local, 'max_entries', reference_cache.local.max_entries)
+    monkeypatch.setattr(reference_cache, 'ttl', reference_cache.ttl)
+
+    app.test_client().get('/')
+
+    assert (reference_cache.ttl, reference_cache.local.ttl, reference_cache.local.max_entries) == (7, 7, 3)
+
+def test_client_search_max_age_applies_after_import(mocker, monkeypatch):
+    mocker.patch('app._configured', False)
+    monkeypatch.setitem(app.config, 'CLIENT_SEARCH_MAX_AGE', 30)
+    monkeypatch.setattr(client_index, 'max_age', client_index.max_age)
+
+    app.test_client().get('/')
+
+    assert client_index.max_age == 30
+
+def test_change_feed_settings_apply_after_import(mocker, monkeypatch):
+    mocker.patch('app._configured', False)
+    feed = mocker.patch('app.change_feed')
+    monkeypatch.setitem(app.config, 'CHANGES_SETTLE_SECONDS', 2)
+    monkeypatch.setitem(app.config, 'CHANGES_POLL_SECONDS', 0.5)
+
+    app.test_client().get('/')
+
+    assert (feed.settle_seconds, feed.poll_seconds) == (2, 0.5)
+
+def test_anomaly_settings_apply_after_import(mocker, monkeypatch, tmp_path):
+    mocker.patch('app._configured', False)
+    scorer = mocker.patch('app.anomaly_scorer')
+    monkeypatch.setitem(app.config, 'ANOMALY_FEATURES_PATH', str(tmp_path / 'features.npz'))
+    monkeypatch.setitem(app.config, 'ANOMALY_THRESHOLD', 4.0)
+
+    app.test_client().get('/')
+
+    assert (scorer.path, scorer.threshold) == (str(tmp_path / 'features.npz'), 4.0)
+
+def test_index_check_runs_on_first_request(mocker, monkeypatch):
+    mocker.patch('app._configured', False)
+    check = mocker.patch('schema.check_indexes', return_value=[])
+    mocker.patch('app.pool')
+    client = app.test_client()
+
+    client.get('/')
+    client.get('/')
+    assert check.call_count == 1
+
+    mocker.patch('app._configured', False)
+    monkeypatch.setitem(app.config, 'CHECK_INDEXES_ON_STARTUP', False)
+    client.get('/')
+    assert check.call_count == 1
+
+def test_rate_limit_settings_apply_after_import(mock_db, mocker, monkeypatch):
+    mocker.patch('app._configured', False)
+    mocker.patch('app.admission_control', None)
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_PER_SECOND', 1)
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_BURST', 1)
+    client = app.test_client()
+
+    assert client.put('/employees/1', json={'name': 'A'}).status_code == 200
+    assert client.put('/employees/1', json={'name': 'A'}).status_code == 429
+
+def test_registered_resource_validates_field_types(mock_db):
+    client = app.test_client()
+    response = client.post('/clients', json={
+        'client_ID': 5, 'name': 'Ada Lovelace', 'email': 'ada@example.com',
+        'phone': '555-0500', 'client_Manager_Employee_ID': 'Mia'
+    })
+
+    assert response.status_code == 400
+    assert b"Invalid client_Manager_Employee_ID" in response.data
+    mock_db.execute.assert_not_called()
+
+def test_registered_resource_reads_by_key_with_one_statement(mock_db):
+    mock_db.fetchall.return_value = [(4, 'Savings')]
+    client = app.test_client()
+    response = client.get('/products/4')
+
+    assert response.get_json() == {'product_ID': 4, 'product_Type': 'Savings'}
+    assert mock_db.execute.call_args[0] == ("SELECT Product_ID, Product_Type FROM Products WHERE Product_ID = %s", (4,))
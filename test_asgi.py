@@ -0,0 +1,141 @@
+import asyncio
+import json
+from decimal import Decimal
+
+import pytest
+
+import asgi
+from app import reference_cache, report_cache
+
+
+class FakeDatabase:
+    # Stands in for AsyncDatabase: answers queries from a list of
+    # (SQL fragment, rows) pairs and records the peak number of queries in
+    # flight at once.
+    def __init__(self, results):
+        self.results = results
+        self.queries = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetchall(self, sql, params=()):
+        self.queries.append((sql, params))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        for fragment, rows in self.results:
+            if fragment in sql:
+                return rows
+        return []
+
+    async def fetchone(self, sql, params=()):
+        rows = await self.fetchall(sql, params)
+        return rows[0] if rows else None
+
+
+def call(application, path, query_string=b"", headers=()):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query_string,
+        "root_path": "", "headers": list(headers), "server": ("testserver", 80), "client": ("127.0.0.1", 1234),
+    }
+    asyncio.run(application(scope, receive, send))
+    start = sent[0]
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    return start["status"], {name.decode(): value.decode() for name, value in start["headers"]}, body
+
+
+@pytest.fixture
+def make_app():
+    reference_cache.clear()
+    report_cache.clear()
+
+    def make(results=()):
+        database = FakeDatabase(list(results))
+        return asgi.AsyncApp(asgi.api.app, database), database
+    return make
+
+def test_list_page_sets_next_cursor(make_app):
+    application, database = make_app([
+        ("FROM Transactions", [(i, 1, 2, Decimal('10.00'), '2024-01-0%d' % i) for i in range(1, 4)]),
+    ])
+    status, headers, body = call(application, "/transactions", b"limit=2&client_ID=1")
+
+    assert status == 200
+    assert headers["x-next-cursor"] == "2"
+    items = json.loads(body)
+    assert [item["transaction_ID"] for item in items] == [1, 2]
+    assert items[0]["transaction_Amount"] == "10.00"
+    sql, params = database.queries[0]
+    assert "Client_ID = %s" in sql
+    assert params == (1, 3)
+
+def test_list_page_invalid_argument(make_app):
+    application, _ = make_app()
+    status, _, body = call(application, "/transactions", b"limit=0")
+
+    assert status == 400
+    assert b"'limit' must be between" in body
+
+def test_list_page_uses_the_resource_query(make_app):
+    application, database = make_app()
+    status, _, body = call(application, "/cash_flows", b"limit=5&from=2024-01-01")
+
+    assert status == 404
+    assert b"No cash flows found" in body
+    sql, params = database.queries[0]
+    assert sql == asgi.resources.CASH_FLOWS.list_query(["Cash_Flow_Date >= %s"], [], None, 6)[0]
+
+def test_cached_list_revalidates_with_etag(make_app):
+    application, database = make_app([("FROM Products", [(1, 'Savings')])])
+    status, headers, _ = call(application, "/products")
+    assert status == 200
+
+    status, _, body = call(application, "/products", headers=[(b"if-none-match", headers["etag"].encode())])
+
+    assert status == 304
+    assert body == b""
+    assert len(database.queries) == 1
+
+def test_client_balance_queries_run_concurrently(make_app):
+    application, database = make_app([
+        ("FROM Client_Balances", [(Decimal('150.00'), 3)]),
+        ("FROM Client_Product_Balances", [(1, Decimal('100.00'), 2), (2, Decimal('50.00'), 1)]),
+    ])
+    status, _, body = call(application, "/clients/1/balance")
+
+    assert status == 200
+    assert json.loads(body)["balance"] == "150.00"
+    assert database.max_in_flight == 2
+
+def test_client_summary_not_found(make_app):
+    application, _ = make_app()
+    status, _, body = call(application, "/clients/1/summary")
+
+    assert status == 404
+    assert b"No transactions found for client" in body
+
+def test_other_routes_fall_back_to_flask(make_app):
+    application, database = make_app()
+    status, _, body = call(application, "/")
+
+    assert status == 200
+    assert b"WELCOME TO PRIVATE BANKING DATABASE" in body
+    assert database.queries == []
@@ -0,0 +1,54 @@
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import balances
+
+
+def test_collect_deltas_nets_out_moves():
+    deltas = balances.collect_deltas(
+        added=[(1, 1, '10.00'), (1, 2, 5)],
+        removed=[(1, 1, '10.00'), (2, 1, 3)]
+    )
+
+    assert deltas == {(1, 2): (Decimal('5'), 1), (2, 1): (Decimal('-3'), -1)}
+
+def test_apply_deltas_skips_noop():
+    cursor = MagicMock()
+    balances.apply_deltas(cursor, added=[(1, 1, 10)], removed=[(1, 1, 10)])
+
+    cursor.executemany.assert_not_called()
+
+def test_apply_deltas_rolls_up_per_client():
+    cursor = MagicMock()
+    balances.apply_deltas(cursor, added=[(2, 1, 10), (1, 1, 4), (1, 2, 6)])
+
+    client_rows = cursor.executemany.call_args_list[0][0][1]
+    assert client_rows == [(1, Decimal('10'), 2), (2, Decimal('10'), 1)]
+
+def test_verify_reports_mismatches():
+    conn = MagicMock()
+    batch_cursor, cursor = MagicMock(), MagicMock()
+    conn.cursor.side_effect = [cursor, batch_cursor]
+    batch_cursor.fetchall.side_effect = [[(1,), (2,)], [(1,), (2,)], [], []]
+    cursor.fetchall.side_effect = [
+        [(1, 1, Decimal('10'), 1), (2, 1, Decimal('5'), 1)],
+        [(1, 1, Decimal('10'), 1), (2, 1, Decimal('7'), 1)],
+        [(1, Decimal('10'), 1), (2, Decimal('5'), 1)],
+    ]
+
+    mismatches = balances.verify(conn, echo=lambda message: None)
+
+    assert mismatches == [(2, 1)]
+
+def test_client_batches_cover_transactions_without_a_client_row():
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [
+        [(1,), (2,)], [(1,), (2,), (3,)],
+        [(4,)], [(5,)],
+        [], [],
+    ]
+
+    assert list(balances.client_batches(cursor, 3)) == [(1, 3), (4, 5)]
+    sql, params = cursor.execute.call_args_list[3][0]
+    assert sql == "SELECT DISTINCT Client_ID FROM Transactions WHERE Client_ID > %s ORDER BY Client_ID LIMIT %s"
+    assert params == (3, 3)
@@ -0,0 +1,47 @@
+import random
+
+from bench import compare, run, seed
+
+
+def test_seed_data_is_deterministic():
+    first = list(seed.transactions(random.Random(7), 50, client_count=10, product_count=3))
+    second = list(seed.transactions(random.Random(7), 50, client_count=10, product_count=3))
+
+    assert first == second
+    assert [row[0] for row in first] == list(range(1, 51))
+    assert all(1 <= row[1] <= 10 and 1 <= row[2] <= 3 for row in first)
+
+def test_summarize_reports_percentiles():
+    summary = run.summarize([i / 1000 for i in range(1, 101)], errors=2, elapsed=10)
+
+    assert summary["requests"] == 100
+    assert summary["rps"] == 10
+    assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]) == (50, 95, 99)
+    assert summary["errors"] == 2
+
+def test_workload_deletes_rows_it_created():
+    workload = run.Workload(10, 100, 5, 1000, 100)
+    rng = random.Random(0)
+    method, path, body, created = workload.create("clients", rng)
+    workload.remember(*created)
+
+    assert (method, path) == ("POST", "/clients")
+    assert workload.delete("clients", rng)[:2] == ("DELETE", f"/clients/{body['client_ID']}")
+    assert workload.delete("clients", rng)[0] == "POST"
+
+def test_compare_flags_regressions():
+    baseline = {"overall": {"rps": 100, "p95_ms": 10}, "operations": {"client_balance": {"rps": 50, "p95_ms": 5}}}
+    candidate = {"overall": {"rps": 80, "p95_ms": 10.5}, "operations": {"client_balance": {"rps": 50, "p95_ms": 8}}}
+    _, regressions = compare.compare(baseline, candidate, threshold=10)
+
+    assert [(name, metric) for name, metric, _ in regressions] == [("overall", "rps"), ("client_balance", "p95_ms")]
+
+def test_workload_polls_the_jobs_it_submitted():
+    workload = run.Workload(10, 100, 5, 1000, 100)
+    rng = random.Random(0)
+    method, path, body, created = workload.job_status(rng)
+
+    assert (method, path, created) == ("POST", "/jobs", ("jobs", None))
+    assert body["kind"] in ("export", "report")
+    workload.remember("jobs", "/jobs/abc")
+    assert workload.job_status(rng)[:2] == ("GET", "/jobs/abc")
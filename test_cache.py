@@ -0,0 +1,85 @@
+import time
+
+import cache
+
+
+def test_ttl_cache_expires_entries():
+    store = cache.TTLCache(max_entries=10, ttl=0.01)
+    store.set('a', 1)
+    assert store.get('a') == 1
+    time.sleep(0.02)
+    assert store.get('a') is None
+
+def test_ttl_cache_evicts_least_recently_used():
+    store = cache.TTLCache(max_entries=2)
+    store.set('a', 1)
+    store.set('b', 2)
+    store.get('a')
+    store.set('c', 3)
+
+    assert store.get('b') is None
+    assert store.get('a') == 1
+    assert len(store) == 2
+
+def test_invalidate_drops_record_and_list_pages():
+    reference = cache.Cache()
+    list_key = reference.list_key('products', 'limit=10')
+    reference.set(list_key, 'page')
+    reference.set(reference.record_key('products', 1), 'one')
+    reference.set(reference.record_key('products', 2), 'two')
+
+    reference.invalidate('products', 1)
+
+    assert reference.get(reference.list_key('products', 'limit=10')) is None
+    assert reference.get(reference.record_key('products', 1)) is None
+    assert reference.get(reference.record_key('products', 2)) == 'two'
+
+def test_shared_backend_visible_across_instances():
+    backend = cache.LocalBackend()
+    first = cache.Cache(backend=backend)
+    second = cache.Cache(backend=backend)
+
+    key = first.list_key('employees', '')
+    first.set(key, 'page')
+    assert second.get(second.list_key('employees', '')) == 'page'
+
+    second.invalidate('employees')
+    assert first.list_key('employees', '') != key
+
+def test_invalidation_reaches_other_processes_local_entries():
+    backend = cache.LocalBackend()
+    first = cache.Cache(backend=backend)
+    second = cache.Cache(backend=backend)
+    first.set(first.record_key('products', 1), 'old')
+    assert first.local.get(first.record_key('products', 1)) == 'old'
+
+    second.invalidate('products', 1)
+
+    assert first.get(first.record_key('products', 1)) is None
+
+def test_fill_started_before_a_write_is_not_served():
+    reference = cache.Cache(backend=cache.LocalBackend())
+    key = reference.record_key('employees', 3)
+
+    reference.invalidate('employees', 3)
+    reference.set(key, 'read before the write')
+
+    assert reference.get(reference.record_key('employees', 3)) is None
+
+def test_local_generations_are_bounded():
+    reference = cache.Cache(max_entries=2)
+    stale = reference.record_key('employees', 1)
+    for record_id in range(1, 6):
+        reference.invalidate('employees', record_id)
+    reference.set(stale, 'read before the write')
+
+    assert len(reference._generations) == 2
+    assert reference.get(reference.record_key('employees', 1)) is None
+    assert reference.record_key('employees', 1) != stale
+
+def test_add_only_sets_missing_keys():
+    ttl_cache = cache.TTLCache(max_entries=10, ttl=60)
+
+    assert ttl_cache.add('k', 1)
+    assert not ttl_cache.add('k', 2)
+    assert ttl_cache.get('k') == 1
@@ -0,0 +1,47 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+import cash_flows
+
+
+def test_collect_deltas_splits_inflow_and_outflow():
+    deltas = cash_flows.collect_deltas(added=[(1, '100.00', '2024-03-05'), (1, '-20.50', '2024-03-20')])
+
+    assert deltas[(1, 'day', date(2024, 3, 5))] == (Decimal('100.00'), Decimal('0'), 1)
+    assert deltas[(1, 'month', date(2024, 3, 1))] == (Decimal('100.00'), Decimal('20.50'), 2)
+
+def test_collect_deltas_moving_a_flow_between_months():
+    deltas = cash_flows.collect_deltas(
+        added=[(1, '10.00', '2024-04-01')], removed=[(1, '10.00', '2024-03-31')]
+    )
+
+    assert deltas[(1, 'month', date(2024, 4, 1))] == (Decimal('10.00'), Decimal('0'), 1)
+    assert deltas[(1, 'month', date(2024, 3, 1))] == (Decimal('-10.00'), Decimal('0'), -1)
+
+def test_compute_buckets_matches_incremental_path():
+    flows = [
+        (1, Decimal('100.10'), date(2024, 3, 5)),
+        (1, Decimal('-20.05'), date(2024, 3, 5)),
+        (1, Decimal('5.00'), date(2024, 4, 2)),
+        (2, Decimal('-7.25'), date(2024, 3, 31)),
+    ]
+    client_ids, amounts, dates = zip(*flows)
+    batch = {row[:3]: row[3:] for row in cash_flows.compute_buckets(client_ids, amounts, dates)}
+    incremental = cash_flows.collect_deltas(added=flows)
+
+    assert batch == incremental
+
+def test_as_date_reads_the_whole_string():
+    assert cash_flows.as_date('2024-03-05') == date(2024, 3, 5)
+    assert cash_flows.as_date(datetime(2024, 3, 5, 10, 30)) == date(2024, 3, 5)
+    with pytest.raises(ValueError):
+        cash_flows.as_date('2024-03-05; nonsense')
+
+def test_compute_buckets_keeps_cents_exact():
+    # Past 2**53 cents a float can no longer hold every cent.
+    amounts = (Decimal('123456789012345.67'), Decimal('0.01'))
+    rows = cash_flows.compute_buckets((1, 1), amounts, (date(2024, 3, 5), date(2024, 3, 5)))
+
+    assert rows[0][3] == Decimal('123456789012345.68')
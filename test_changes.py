@@ -0,0 +1,96 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import changes
+
+
+class FakeCursor:
+    # Answers each execute() with the next canned result set.
+    def __init__(self, results):
+        self.results = list(results)
+        self.statements = []
+        self.many = []
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params))
+        self._rows = self.results.pop(0)
+
+    def executemany(self, sql, rows):
+        self.many.append((sql, rows))
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakePool:
+    def __init__(self, results):
+        self.cursor_obj = FakeCursor(results)
+        self.released = 0
+
+    def acquire(self):
+        return self
+
+    def cursor(self):
+        return self.cursor_obj
+
+    def release(self, conn):
+        self.released += 1
+
+
+def change(change_id, settled=False):
+    return (change_id, "transactions", change_id, "insert", '{"transaction_ID": %d}' % change_id,
+            datetime(2024, 12, 11, 9, 30), int(settled))
+
+
+def test_record_serializes_data():
+    cursor = FakeCursor([])
+
+    changes.record(cursor, "transactions", changes.INSERTED, [
+        (7, {"transaction_Amount": Decimal("10.50"), "transaction_Date": date(2024, 12, 11)}),
+    ])
+    changes.record(cursor, "clients", changes.DELETED, [(3, None)])
+
+    assert cursor.many[0][1] == [
+        ("transactions", 7, "insert", '{"transaction_Amount":"10.50","transaction_Date":"2024-12-11"}')
+    ]
+    assert cursor.many[1][1] == [("clients", 3, "delete", None)]
+
+def test_read_waits_at_a_gap_until_it_settles():
+    cursor = FakeCursor([
+        [change(11), change(12), change(14), change(15)],
+        [change(14, settled=True), change(16)],
+    ])
+
+    first = changes.read(cursor, 10, 100)
+    second = changes.read(cursor, 12, 100)
+
+    # 13 may still be committing, so the first read stops before it; once
+    # 14 is old enough, 13 is taken to be rolled back and skipped.
+    assert [item["change_ID"] for item in first] == [11, 12]
+    assert first[0]["data"] == {"transaction_ID": 11}
+    assert [item["change_ID"] for item in second] == [14]
+    assert cursor.statements[0][1] == (changes.SETTLE_SECONDS, 10, 100)
+
+def test_feed_buffers_recent_changes():
+    pool = FakePool([
+        [(10,)],
+        [change(11), change(12)],
+        [change(13)],
+    ])
+    feed = changes.ChangeFeed(pool, buffer_size=2, batch_size=2)
+
+    feed.poll()
+
+    assert [item["change_ID"] for item in feed.wait(11, 0)] == [12, 13]
+    assert [item["change_ID"] for item in feed.wait(12, 0)] == [13]
+    # 11 has been evicted, so a subscriber at 10 has to read it itself.
+    assert feed.wait(10, 0) is None
+    assert feed.wait(13, 0) == []
+    assert pool.released == 3
+    assert [params for _, params in pool.cursor_obj.statements[1:]] == [
+        (changes.SETTLE_SECONDS, 10, 2), (changes.SETTLE_SECONDS, 12, 2)
+    ]
@@ -0,0 +1,241 @@
+import threading
+import time
+
+import pytest
+
+import db
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+        self.rollbacks = 0
+
+    def ping(self):
+        if not self.healthy:
+            raise OSError("server has gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections():
+    return []
+
+
+@pytest.fixture
+def make_pool(connections):
+    def factory(**kwargs):
+        def connect():
+            conn = FakeConnection()
+            connections.append(conn)
+            return conn
+        return db.ConnectionPool(connect, **kwargs)
+    return factory
+
+
+def test_reuses_released_connection(make_pool, connections):
+    pool = make_pool(min_size=0, max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+
+    assert pool.acquire() is conn
+    assert len(connections) == 1
+    assert conn.rollbacks == 1
+
+def test_warms_up_min_size(make_pool, connections):
+    pool = make_pool(min_size=3, max_size=5)
+    pool.acquire()
+
+    assert len(connections) == 3
+    assert pool.stats()["idle"] == 2
+
+def test_bounded_and_times_out(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+    pool.acquire()
+
+    with pytest.raises(db.PoolTimeout):
+        pool.acquire(timeout=0.05)
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["in_use"] == 1
+
+def test_waiter_gets_released_connection(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(conn,)).start()
+
+    assert pool.acquire(timeout=2) is conn
+    assert pool.stats()["wait_seconds_max"] > 0
+
+def test_replaces_connection_failing_health_check(make_pool, connections):
+    pool = make_pool(min_size=0, max_size=1)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.healthy = False
+
+    replacement = pool.acquire()
+    assert replacement is not conn
+    assert conn.closed
+    stats = pool.stats()
+    assert stats["health_check_failures"] == 1
+    assert stats["size"] == 1
+
+def test_retires_connections_past_max_lifetime(make_pool):
+    pool = make_pool(min_size=0, max_size=1, max_lifetime=0.01)
+    conn = pool.acquire()
+    time.sleep(0.02)
+    pool.release(conn)
+
+    assert conn.closed
+    assert pool.acquire() is not conn
+    assert pool.stats()["size"] == 1
+
+def test_failed_connect_frees_slot(make_pool):
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("connection refused")
+        return FakeConnection()
+
+    pool = db.ConnectionPool(connect, min_size=0, max_size=1)
+    with pytest.raises(OSError):
+        pool.acquire()
+    assert pool.acquire(timeout=0.05)
+
+def test_settings_from_env():
+    settings = db.settings_from_env({"MYSQL_HOST": "db.internal", "MYSQL_DB": "bank", "MYSQL_POOL_MAX_SIZE": "20"})
+
+    assert settings["host"] == "db.internal"
+    assert settings["database"] == "bank"
+    assert settings["max_size"] == 20
+
+class ReplicaConnection(FakeConnection):
+    # Answers SHOW REPLICA STATUS with the lag of the replica it belongs to.
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+        self.description = [("Replica_IO_Running",), ("Seconds_Behind_Source",)]
+        self.lag_checks = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        self.lag_checks += 1
+
+    def fetchone(self):
+        return ("Yes", self.status["lag"])
+
+
+@pytest.fixture
+def replica_set():
+    # Two replica instances with their own pools, and a clock the test moves.
+    clock = [1000.0]
+    statuses = {"a": {"lag": 0}, "b": {"lag": 0}}
+
+    def make(strategy=db.ROUND_ROBIN, max_size=2):
+        def pool(name):
+            return db.ConnectionPool(lambda: ReplicaConnection(statuses[name]), min_size=0, max_size=max_size)
+        return db.ReplicaSet(
+            [("a", pool("a")), ("b", pool("b"))], strategy=strategy, max_lag=5, check_interval=1,
+            clock=lambda: clock[0]
+        )
+    return make, statuses, clock
+
+
+def test_replicas_take_turns_and_cache_lag_checks(replica_set):
+    make, statuses, clock = replica_set
+    replicas = make()
+
+    names = []
+    for _ in range(4):
+        replica, conn = replicas.acquire()
+        names.append(replica.name)
+        replica.pool.release(conn)
+
+    assert names == ["a", "b", "a", "b"]
+    assert conn.lag_checks == 1
+
+def test_lagging_replica_is_skipped_until_it_catches_up(replica_set):
+    make, statuses, clock = replica_set
+    replicas = make()
+    statuses["a"]["lag"] = 30
+
+    for _ in range(3):
+        replica, conn = replicas.acquire()
+        assert replica.name == "b"
+        replica.pool.release(conn)
+    statuses["b"]["lag"] = None
+    clock[0] += 1
+
+    assert replicas.acquire() == (None, None)
+    assert replicas.fallbacks == 1
+    statuses["a"]["lag"] = 0
+    clock[0] += 1
+    assert replicas.acquire()[0].name == "a"
+    stats = dict(replicas.stats()["replicas"])
+    assert stats["b"]["lag_seconds"] == -1
+    assert stats["a"]["usable"] == 1
+
+def test_reads_after_a_write_wait_for_the_replica_to_apply_it(replica_set):
+    make, statuses, clock = replica_set
+    replicas = make()
+    statuses["a"]["lag"] = statuses["b"]["lag"] = 2
+    replicas.acquire()
+    replicas.acquire()
+
+    assert replicas.acquire(written_at=clock[0]) == (None, None)
+    clock[0] += 3
+    assert replicas.acquire(written_at=clock[0] - 3)[0] is not None
+    assert replicas.catch_up_seconds() == 7
+
+def test_least_loaded_prefers_idle_replica(replica_set):
+    make, statuses, clock = replica_set
+    replicas = make(strategy=db.LEAST_LOADED)
+    busy, _ = replicas.acquire()
+
+    for _ in range(2):
+        replica, conn = replicas.acquire()
+        assert replica.name == "b"
+        replica.pool.release(conn)
+    assert busy.name == "a"
+
+def test_full_or_unreachable_replica_is_skipped():
+    def refuse():
+        raise OSError("connection refused")
+
+    replicas = db.ReplicaSet([
+        ("down", db.ConnectionPool(refuse, min_size=0)),
+        ("up", db.ConnectionPool(lambda: ReplicaConnection({"lag": 0}), min_size=0, max_size=1)),
+    ])
+
+    replica, conn = replicas.acquire()
+    assert replica.name == "up"
+    assert replicas.acquire() == (None, None)
+    assert replicas.replicas[0].skipped == 2
+
+def test_full_replica_is_used_again_once_a_connection_is_released(replica_set):
+    make, statuses, clock = replica_set
+    replicas = make(max_size=1)
+    held = [replicas.acquire() for _ in range(2)]
+
+    assert replicas.acquire() == (None, None)
+    for replica, conn in held:
+        replica.pool.release(conn)
+    assert replicas.acquire()[0] is not None
+    assert [replica.lag for replica in replicas.replicas] == [0, 0]
+
+def test_replica_settings_from_env():
+    replicas = db.replica_settings_from_env({"MYSQL_REPLICAS": "r1.internal, r2.internal:3307", "MYSQL_DB": "bank"})
+
+    assert [(settings["host"], settings["port"]) for settings in replicas] == [("r1.internal", 3306), ("r2.internal", 3307)]
+    assert replicas[1]["database"] == "bank"
+    assert db.ReplicaSet.from_env({}) is None
@@ -0,0 +1,185 @@
+import json
+import os
+import time
+from datetime import date
+from decimal import Decimal
+
+import jobs
+
+
+class FakeCursor:
+    # Answers each execute() with the next canned result set.
+    def __init__(self, results):
+        self.results = list(results)
+        self.statements = []
+        self.description = None
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params))
+        self._rows = self.results.pop(0)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakeConnection:
+    def __init__(self, results):
+        self.cursor_obj = FakeCursor(results)
+        self.rolled_back = False
+
+    def cursor(self):
+        return self.cursor_obj
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def test_store_claims_a_job_once(tmp_path):
+    store = jobs.JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create("export", {"kind": "export"}, {"format": "csv"})
+
+    assert store.get(job_id)["status"] == jobs.QUEUED
+    assert store.claim(job_id)
+    assert not store.claim(job_id)
+    assert store.get(job_id)["status"] == jobs.RUNNING
+    assert store.get("missing") is None
+
+
+def test_store_recovers_queued_and_orphaned_jobs(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = jobs.JobStore(path)
+    queued = store.create("report", {}, {})
+    orphaned = store.create("report", {}, {})
+    active = store.create("report", {}, {})
+    store.claim(orphaned)
+    store.claim(active)
+    store._update("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time() - 600, orphaned))
+
+    # A new process sees the same state.
+    recovered = jobs.JobStore(path).recoverable(stale_after=300)
+
+    assert recovered == [queued, orphaned]
+    assert store.get(orphaned)["status"] == jobs.QUEUED
+    assert store.get(active)["status"] == jobs.RUNNING
+
+
+def test_queue_starts_its_pool_only_for_a_job(tmp_path, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(jobs.JobQueue, "_submit", lambda queue, job_id: submitted.append(job_id))
+    path = str(tmp_path / "jobs" / "jobs.sqlite3")
+
+    jobs.JobQueue(path, str(tmp_path / "results"), {}).start()
+    assert os.listdir(tmp_path) == []
+
+    queued = jobs.JobStore(path).create("report", {}, {})
+    queue = jobs.JobQueue(path, str(tmp_path / "results"), {})
+    queue.start()
+    queue.start()
+    assert submitted == [queued]
+    assert queue._executor is None
+
+
+def test_store_purges_old_results(tmp_path):
+    store = jobs.JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create("export", {}, {"format": "csv"})
+    result = tmp_path / "result.csv"
+    result.write_text("x")
+    store.claim(job_id)
+    store.finish(job_id, str(result), 1)
+    store._update("UPDATE jobs SET finished_at = ? WHERE id = ?", (time.time() - 100, job_id))
+
+    assert store.purge(older_than=50) == 1
+    assert store.get(job_id) is None
+    assert not result.exists()
+
+
+def test_export_writes_chunks_and_reports_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "CHUNK_SIZE", 2)
+    conn = FakeConnection([
+        [(1, 5)],
+        [(1, "Ana", "ana@example.com", "555", 7), (3, "Ben", "ben@example.com", "556", 7)],
+        [(5, "Carla", "carla@example.com", "557", 7)],
+        [],
+    ])
+    spec = {
+        "resource": "clients", "conditions": ["Client_Manager_Employee_ID = %s"], "params": [7], "format": "ndjson"
+    }
+    progress = []
+
+    rows = jobs.run_export(conn, spec, str(tmp_path / "out"), lambda *args: progress.append(args))
+
+    assert rows == 3
+    lines = (tmp_path / "out").read_text().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["Ana", "Ben", "Carla"]
+    assert json.loads(lines[0]) == {
+        "client_ID": 1, "name": "Ana", "email": "ana@example.com", "phone": "555", "client_Manager_Employee_ID": 7
+    }
+    assert progress == [(0.5, 2), (1.0, 3)]
+    sql, params = conn.cursor_obj.statements[2]
+    assert "Client_Manager_Employee_ID = %s AND Client_ID > %s ORDER BY Client_ID LIMIT %s" in sql
+    assert params == (7, 3, 2)
+
+
+def test_report_merges_yearly_chunks(tmp_path):
+    conn = FakeConnection([
+        [(date(2023, 6, 1), date(2024, 3, 1))],
+        [(1, 2, Decimal("30.00"), Decimal("10.00"), Decimal("20.00"))],
+        [(1, 1, Decimal("5.00"), Decimal("5.00"), Decimal("5.00")),
+         (2, 1, Decimal("7.50"), Decimal("7.50"), Decimal("7.50"))],
+    ])
+    spec = {
+        "expression": "Client_ID", "field": "client_ID", "conditions": [], "params": [], "format": "json"
+    }
+    progress = []
+
+    groups = jobs.run_report(conn, spec, str(tmp_path / "out"), lambda *args: progress.append(args))
+
+    assert groups == 2
+    assert json.loads((tmp_path / "out").read_text()) == [
+        {"client_ID": 1, "transaction_Count": 3, "total_Amount": "35.00", "average_Amount": "11.666667",
+         "min_Amount": "5.00", "max_Amount": "20.00"},
+        {"client_ID": 2, "transaction_Count": 1, "total_Amount": "7.50", "average_Amount": "7.500000",
+         "min_Amount": "7.50", "max_Amount": "7.50"},
+    ]
+    assert progress == [(0.5, 2), (1.0, 4)]
+    assert conn.cursor_obj.statements[1][1] == (date(2023, 6, 1), date(2024, 1, 1))
+    assert conn.cursor_obj.statements[2][1] == (date(2024, 1, 1), date(2025, 1, 1))
+
+
+def test_execute_records_failures(tmp_path):
+    store = jobs.JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create("export", {}, {"resource": "clients", "conditions": [], "params": [], "format": "csv"})
+    conn = FakeConnection([])
+
+    jobs.execute(store, job_id, conn, str(tmp_path))
+
+    job = store.get(job_id)
+    assert job["status"] == jobs.FAILED
+    assert job["error"].startswith("IndexError")
+    assert conn.rolled_back
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+
+def test_long_query_is_not_taken_for_orphaned(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "HEARTBEAT_INTERVAL", 0.01)
+    store = jobs.JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create("report", {}, {"format": "json"})
+    requeued = []
+
+    def slow_report(conn, spec, path, progress):
+        # One query, no progress, for longer than stale_after.
+        time.sleep(0.3)
+        requeued.extend(store.recoverable(stale_after=0.1))
+        with open(path, "w") as f:
+            f.write("[]")
+        return 0
+
+    monkeypatch.setitem(jobs.RUNNERS, "report", slow_report)
+    jobs.execute(store, job_id, FakeConnection([]), str(tmp_path))
+
+    assert requeued == []
+    assert store.get(job_id)["status"] == jobs.SUCCEEDED
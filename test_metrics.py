@@ -0,0 +1,86 @@
+import logging
+from decimal import Decimal
+
+import metrics
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.executed = []
+        self.rowcount = len(self.rows)
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3):
+        registry.observe("latency_seconds", {"route": "/clients"}, value)
+    text = registry.render()
+
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="/clients",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/clients",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{route="/clients",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/clients"} 4' in text
+
+def test_counter_labels_are_escaped():
+    registry = metrics.Registry()
+    registry.counter("requests_total", "Requests.")
+    registry.inc("requests_total", {"route": 'a"b'})
+
+    assert 'requests_total{route="a\\"b"} 1' in registry.render()
+
+def test_instrumented_cursor_counts_statements_and_rows():
+    stats = metrics.RequestStats()
+    cursor = metrics.InstrumentedCursor(FakeCursor([(1,), (2,)]), stats)
+    cursor.execute("SELECT 1", (1,))
+    rows = cursor.fetchall()
+
+    assert rows == [(1,), (2,)]
+    assert cursor.rowcount == 2
+    assert (stats.statements, stats.rows) == (1, 2)
+
+def test_slow_query_log_redacts_parameters(caplog):
+    stats = metrics.RequestStats(slow_query_seconds=0)
+    cursor = metrics.InstrumentedCursor(FakeCursor([]), stats)
+    with caplog.at_level(logging.WARNING, logger="private_banking.slow_queries"):
+        cursor.execute("SELECT * FROM Clients\n WHERE Name = %s AND Balance > %s", ("Jane Smith", Decimal("10")))
+
+    message = caplog.records[0].getMessage()
+    assert "SELECT * FROM Clients WHERE Name = %s AND Balance > %s" in message
+    assert "['str', 'Decimal']" in message
+    assert "Jane Smith" not in message
+
+def test_slow_query_log_disabled_by_default(caplog):
+    cursor = metrics.InstrumentedCursor(FakeCursor([]), metrics.RequestStats())
+    with caplog.at_level(logging.WARNING, logger="private_banking.slow_queries"):
+        cursor.execute("SELECT 1")
+
+    assert caplog.records == []
+
+def test_render_replicas_labels_each_replica():
+    stats = {
+        "replicas": [
+            ("r1:3306", {"in_use": 1, "checkouts": 4, "lag_seconds": 0.0, "usable": 1, "skipped": 0}),
+            ("r2:3306", {"in_use": 0, "checkouts": 0, "lag_seconds": -1, "usable": 0, "skipped": 3}),
+        ],
+        "fallbacks": 2,
+    }
+
+    text = metrics.render_replicas(stats)
+
+    assert text.count("# TYPE db_replica_lag_seconds gauge") == 1
+    assert 'db_replica_lag_seconds{replica="r1:3306"} 0.0' in text
+    assert 'db_replica_skipped_total{replica="r2:3306"} 3' in text
+    assert "db_replica_fallbacks_total 2" in text
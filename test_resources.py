@@ -0,0 +1,62 @@
+from datetime import date
+
+import resources
+
+
+def test_statements_are_compiled_from_the_declaration():
+    transactions = resources.TRANSACTIONS
+
+    assert transactions.insert_sql == (
+        "INSERT INTO Transactions (Transaction_ID, Client_ID, Product_ID, Transaction_Amount, Transaction_Date) "
+        "VALUES (%s, %s, %s, %s, %s)"
+    )
+    assert transactions.update_sql == (
+        "UPDATE Transactions SET Client_ID = %s, Product_ID = %s, Transaction_Amount = %s, Transaction_Date = %s "
+        "WHERE Transaction_ID = %s"
+    )
+    assert transactions.lock_sql == (
+        "SELECT Transaction_ID, Client_ID, Product_ID, Transaction_Amount, Transaction_Date FROM Transactions "
+        "WHERE Transaction_ID = %s FOR UPDATE"
+    )
+    assert transactions.select_sql == (
+        "SELECT Transaction_ID, Client_ID, Product_ID, CAST(Transaction_Amount AS CHAR) AS Transaction_Amount, "
+        "Transaction_Date FROM Transactions"
+    )
+    assert transactions.select_list("t").startswith("t.Transaction_ID, t.Client_ID")
+    assert resources.CASH_FLOWS.delete_sql == "DELETE FROM Cash_Flows WHERE Cash_Flow_ID = %s"
+    assert resources.CASH_FLOWS.plural == "cash flows"
+
+def test_list_query_reuses_sql_per_filter_combination():
+    clients = resources.CLIENTS
+    condition = clients.filters[0][1]
+
+    first_sql, first_params = clients.list_query([condition], [7], 10, 101)
+    second_sql, second_params = clients.list_query([condition], [8], 20, 101)
+
+    assert first_sql is second_sql
+    assert first_sql == (
+        "SELECT Client_ID, Name, Email, Phone, Client_Manager_Employee_ID FROM Clients "
+        "WHERE Client_Manager_Employee_ID = %s AND Client_ID > %s ORDER BY Client_ID LIMIT %s"
+    )
+    assert (first_params, second_params) == ((7, 10, 101), (8, 20, 101))
+    assert clients.list_query([], [], None) == (clients.select_sql + " ORDER BY Client_ID", ())
+
+def test_validation_follows_field_types():
+    cash_flows = resources.CASH_FLOWS
+    row = cash_flows.row({'cash_Flow_ID': 1, 'client_ID': '2', 'cash_Flow_Amount': '10.50', 'cash_Flow_Date': '2024-12-11'})
+
+    assert cash_flows.validate(row) is None
+    assert cash_flows.validate(row[:3] + ('someday',)) == "Invalid cash_Flow_Date"
+    assert cash_flows.validate(row[:3] + ('2024-01-01; nonsense',)) == "Invalid cash_Flow_Date"
+    assert cash_flows.validate(row[:3] + (20240101,)) == "Invalid cash_Flow_Date"
+    assert cash_flows.validate(row[:2] + ('NaN',) + row[3:]) == "Invalid cash_Flow_Amount"
+    assert cash_flows.validate((True,) + row[1:]) == "Invalid cash_Flow_ID"
+    assert cash_flows.validate(row[:3] + (date(2024, 12, 11),)) is None
+    assert cash_flows.missing(cash_flows.row({'client_ID': 2})) == ['cash_Flow_ID', 'cash_Flow_Amount', 'cash_Flow_Date']
+
+def test_update_takes_the_key_from_the_url():
+    employees = resources.EMPLOYEES
+
+    assert employees.row({'employee_ID': 9, 'name': 'Ana'}, key=3) == (3, 'Ana')
+    assert employees.validate(employees.row({}, key=3), update=True) == "Name is required"
+    assert employees.validate(employees.row([]), update=False) == "Employee ID and name are required"
@@ -0,0 +1,84 @@
+from unittest.mock import MagicMock
+
+import schema
+
+
+def test_split_statements_drops_comments():
+    statements = schema.split_statements(
+        "-- header; not a statement\nCREATE TABLE a (\n    id INT\n);\n\nCREATE INDEX i ON a (id);\n"
+    )
+
+    assert statements == ["CREATE TABLE a (\n    id INT\n)", "CREATE INDEX i ON a (id)"]
+
+def test_shipped_migrations_are_ordered():
+    migrations = schema.load_migrations()
+
+    assert [version for version, _, _ in migrations] == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert all(statements for _, _, statements in migrations)
+
+def test_migrate_skips_applied_versions_and_existing_indexes(tmp_path):
+    (tmp_path / "0001_tables.sql").write_text("CREATE TABLE IF NOT EXISTS a (id INT);\n")
+    (tmp_path / "0002_indexes.sql").write_text("CREATE INDEX idx_a ON a (id);\nCREATE INDEX idx_b ON a (id);\n")
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.fetchall.return_value = [(1,)]
+    cursor.fetchone.side_effect = [(1,), None]
+
+    applied = schema.migrate(conn, directory=str(tmp_path), echo=lambda message: None)
+
+    assert applied == [2]
+    executed = [call[0][0] for call in cursor.execute.call_args_list]
+    assert "CREATE TABLE IF NOT EXISTS a (id INT)" not in executed
+    assert "CREATE INDEX idx_a ON a (id)" not in executed
+    assert "CREATE INDEX idx_b ON a (id)" in executed
+    assert cursor.execute.call_args_list[-1][0][1] == (2, "indexes")
+
+def test_pending_lists_unapplied_migrations(tmp_path):
+    (tmp_path / "0001_tables.sql").write_text("CREATE TABLE IF NOT EXISTS a (id INT);\n")
+    (tmp_path / "0002_indexes.sql").write_text("CREATE INDEX idx_a ON a (id);\n")
+    conn = MagicMock()
+    conn.cursor.return_value.fetchall.return_value = [(1,)]
+
+    assert schema.pending(conn, directory=str(tmp_path)) == ["0002_indexes"]
+
+QUERIES = [
+    ("clients by manager", "SELECT 1", (), {"Clients": {"idx_clients_manager"}}, True),
+    ("transactions by client", "SELECT 2", (), {"Transactions": {"idx_transactions_client_id"}}, True),
+    ("transactions by product", "SELECT 3", (), {"Transactions": {"idx_transactions_product_id"}}, True),
+    ("client summary", "SELECT 4", (), {"Transactions": {"idx_transactions_client_date"}}, False),
+]
+
+def test_check_indexes_warns_on_unexpected_plan():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.description = [("id",), ("table",), ("type",), ("key",), ("Extra",)]
+    cursor.fetchall.side_effect = [
+        [(1, "Clients", "ref", "idx_clients_manager", None)],
+        [(1, "Transactions", "ALL", None, "Using where; Using filesort")],
+        [(1, None, None, None, "no matching row in const table")],
+    ]
+    warnings = []
+
+    schema.check_indexes(conn, QUERIES[:3], warn=warnings.append)
+
+    assert len(warnings) == 1
+    assert warnings[0].startswith("transactions by client: Transactions is read with no index")
+
+def test_check_indexes_warns_when_a_page_is_sorted():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.description = [("id",), ("table",), ("type",), ("key",), ("Extra",)]
+    cursor.fetchall.side_effect = [
+        [(1, "Clients", "ref", "idx_clients_manager", "Using where; Using filesort")],
+        [(1, "Transactions", "range", "idx_transactions_client_id", "Using where")],
+        [(1, "Transactions", "ref", "idx_transactions_product_id", None)],
+        [(1, "Transactions", "ref", "idx_transactions_client_date", "Using index; Using filesort")],
+    ]
+    warnings = []
+
+    schema.check_indexes(conn, QUERIES, warn=warnings.append)
+
+    assert warnings == [
+        "clients by manager: Clients rows are sorted after reading them with idx_clients_manager "
+        "(Using filesort); run the schema migrations"
+    ]
@@ -0,0 +1,99 @@
+import search
+
+
+def build_index(rows):
+    index = search.PrefixIndex()
+    index.build([rows])
+    return index
+
+def test_prefix_matches_name_email_and_phone():
+    index = build_index([
+        (1, 'Jane Smith', 'jane@example.com', '+1 (555) 010-2000'),
+        (2, 'John Smithers', 'john@example.com', '555-0300'),
+        (3, 'Ann Lee', 'ann.lee@example.org', '555-0400'),
+    ])
+
+    assert index.search('smi') == [1, 2]
+    assert index.search('ann.l') == [3]
+    assert index.search('1555010') == [1]
+    assert index.search('555-03') == [2]
+
+def test_all_tokens_must_match():
+    index = build_index([
+        (1, 'Jane Smith', 'jane@example.com', '1'),
+        (2, 'John Smith', 'john@example.com', '2'),
+    ])
+
+    assert index.search('smith jo') == [2]
+    assert index.search('smith x') == []
+
+def test_results_follow_term_order_and_limit():
+    index = build_index([(i, f'Client {name}', f'{name}@example.com', str(i)) for i, name in enumerate('dcba', 1)])
+
+    assert index.search('client', limit=2) == [1, 2]
+    assert index.search('a') == [4]
+
+def test_writes_update_the_index():
+    index = build_index([(1, 'Jane Smith', 'jane@example.com', '1')])
+    index.add(2, 'Jane Doe', 'doe@example.com', '2')
+    index.add(1, 'Janet Smith', 'janet@example.com', '1')
+    index.remove(2)
+
+    assert index.search('jane') == [1]
+    assert index.search('doe') == []
+    assert len(index) == 1
+
+def test_writes_during_build_are_replayed():
+    index = search.PrefixIndex()
+
+    def batches():
+        yield [(1, 'Jane Smith', 'jane@example.com', '1')]
+        index.add(2, 'Jane Doe', 'doe@example.com', '2')
+        index.remove(1)
+
+    index.build(batches())
+
+    assert index.ready
+    assert index.search('jane') == [2]
+
+def test_writes_are_merged_from_the_overlay_until_compacted():
+    index = build_index([(1, 'Jane Smith', 'jane@example.com', '1'), (3, 'Jane Roe', 'roe@example.com', '3')])
+    index.add(2, 'Jane Doe', 'doe@example.com', '2')
+    index.add(3, 'Janet Roe', 'roe@example.com', '3')
+    main_keys = index._keys
+
+    assert index._keys is main_keys
+    assert index.search('jane') == [1, 2, 3]
+    assert index.search('roe') == [3]
+
+    assert index.compact()
+    assert index._overlay == [] and not index._outdated
+    assert index.search('jane') == [1, 2, 3]
+    assert index.search('janet') == [3]
+
+def test_bulk_writes_are_applied_in_one_merge():
+    index = build_index([(i, f'Client {i}', f'c{i}@example.com', str(i)) for i in range(0, 200, 2)])
+    index.add_many([(i, f'Client {i}', f'c{i}@example.com', str(i)) for i in range(1, 200, 2)])
+    index.remove_many(range(100, 200))
+
+    assert len(index) == 100
+    assert index.search('client', limit=200) == list(range(100))
+    assert index.needs_compaction() is False
+    index.max_overlay = 10
+    assert index.needs_compaction()
+
+def test_writes_during_compaction_are_replayed(monkeypatch):
+    index = build_index([(1, 'Jane Smith', 'jane@example.com', '1')])
+    index.add(2, 'Jane Doe', 'doe@example.com', '2')
+    original_merge = search.heapq.merge
+
+    def merge(*iterables):
+        index.remove(1)
+        index.add(3, 'Jane Roe', 'roe@example.com', '3')
+        return original_merge(*iterables)
+
+    monkeypatch.setattr(search.heapq, 'merge', merge)
+    index.compact()
+    monkeypatch.undo()
+
+    assert index.search('jane') == [2, 3]
@@ -0,0 +1,53 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+
+import serialization
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def json_app(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    app = Flask(__name__)
+    app.json = serialization.FastJSONProvider(app)
+    return app
+
+@pytest.fixture
+def provider(json_app):
+    return json_app.json
+
+def test_encodes_decimal_and_dates(provider):
+    encoded = provider.dumps({'amount': Decimal('100.50'), 'on': date(2024, 12, 11), 'at': datetime(2024, 12, 11, 9, 30)})
+
+    assert provider.loads(encoded) == {'amount': '100.50', 'on': '2024-12-11', 'at': '2024-12-11T09:30:00'}
+
+def test_response_is_json(json_app, provider):
+    with json_app.app_context():
+        response = provider.response([{'id': 1}])
+
+    assert response.mimetype == 'application/json'
+    assert provider.loads(response.get_data()) == [{'id': 1}]
+
+def test_row_mapper_uses_cursor_description():
+    class Cursor:
+        description = (('Transaction_ID', 3), ('Transaction_Amount', 246), ('Transaction_Date', 10))
+
+    mapper = serialization.RowMapper(['transaction_ID', 'transaction_Amount', 'transaction_Date'])
+    rows = [(1, Decimal('10.00'), date(2024, 1, 1)), (2, None, date(2024, 1, 2))]
+
+    assert mapper.map(rows, Cursor()) == [
+        {'transaction_ID': 1, 'transaction_Amount': '10.00', 'transaction_Date': date(2024, 1, 1)},
+        {'transaction_ID': 2, 'transaction_Amount': None, 'transaction_Date': date(2024, 1, 2)},
+    ]
+    assert list(mapper._compiled.values()) == [(1,)]
+
+def test_row_mapper_without_description():
+    mapper = serialization.RowMapper(['product_ID', 'product_Type'])
+
+    assert mapper.map([(1, 'Savings')]) == [{'product_ID': 1, 'product_Type': 'Savings'}]
+    assert mapper.map([]) == []
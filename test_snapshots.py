@@ -0,0 +1,215 @@
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+import snapshots
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+
+
+class SQLiteCursor:
+    # Runs the snapshot queries (MySQL paramstyle) against SQLite.
+    def __init__(self, conn):
+        self.cursor = conn.cursor()
+
+    def execute(self, sql, params=()):
+        self.cursor.execute(sql.replace("%s", "?"), params)
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+
+class SQLiteConnection:
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+        self.conn.executescript("""
+            CREATE TABLE Transactions (Transaction_ID INT, Client_ID INT, Product_ID INT,
+                                       Transaction_Amount TEXT, Transaction_Date DATE);
+            CREATE TABLE Clients (Client_ID INT, Name TEXT, Email TEXT, Phone TEXT,
+                                  Client_Manager_Employee_ID INT);
+            CREATE TABLE Products (Product_ID INT, Product_Type TEXT);
+            CREATE TABLE Transaction_IDs (Transaction_ID INT, Inserted_At TIMESTAMP);
+        """)
+        self.conn.executemany("INSERT INTO Clients VALUES (?, ?, ?, ?, ?)", [
+            (1, "Ana Garcia", "ana@example.com", "555", 1), (2, "Ben Tan", "ben@example.com", "556", 1),
+        ])
+        self.conn.executemany("INSERT INTO Products VALUES (?, ?)", [(1, "Savings"), (2, "Loan")])
+        self.conn.commit()
+        self.clock = datetime(2024, 7, 1, 9)
+
+    def insert(self, *rows, inserted_at=None):
+        # Claims the IDs as the app does, stamped with a clock that moves
+        # an hour per call unless a time is given.
+        if inserted_at is None:
+            self.clock += timedelta(hours=1)
+            inserted_at = self.clock
+        self.conn.executemany("INSERT INTO Transactions VALUES (?, ?, ?, ?, ?)", rows)
+        self.conn.executemany("INSERT INTO Transaction_IDs VALUES (?, ?)", [(row[0], inserted_at) for row in rows])
+        self.conn.commit()
+
+    def cursor(self):
+        return SQLiteCursor(self.conn)
+
+    def rollback(self):
+        self.conn.rollback()
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    monkeypatch.setattr(snapshots, "CHUNK_SIZE", 2)
+    conn = SQLiteConnection()
+    conn.insert(
+        (1, 1, 1, "100.00", date(2024, 1, 5)),
+        (2, 2, 1, "50.25", date(2024, 1, 20)),
+        (3, 1, 2, "10.10", date(2024, 1, 20)),
+        (4, 1, 1, "7.00", date(2024, 3, 1)),
+        (5, 2, 2, "1.50", date(2024, 6, 30)),
+    )
+    return conn
+
+
+def test_dump_and_report(conn, tmp_path):
+    manifest = snapshots.dump(conn, str(tmp_path), today=date(2024, 7, 15), echo=lambda line: None)
+
+    assert manifest["transactions"]["watermark_at"] == "2024-07-01 10:00:00"
+    assert manifest["transactions"]["open_from"] == "2024-06-01"
+    assert sorted(manifest["transactions"]["partitions"]) == ["2024-01", "2024-03", "2024-06"]
+
+    snapshot = snapshots.Snapshot(str(tmp_path))
+    assert snapshot.transaction_report("client") == [
+        {"client_ID": 1, "transaction_Count": 3, "total_Amount": Decimal("117.10"),
+         "average_Amount": Decimal("39.033333"), "min_Amount": Decimal("7.00"), "max_Amount": Decimal("100.00")},
+        {"client_ID": 2, "transaction_Count": 2, "total_Amount": Decimal("51.75"),
+         "average_Amount": Decimal("25.875000"), "min_Amount": Decimal("1.50"), "max_Amount": Decimal("50.25")},
+    ]
+    by_month = snapshot.transaction_report("month", from_date=date(2024, 1, 10), product_id=1)
+    assert [(group["month"], group["transaction_Count"]) for group in by_month] == [("2024-01", 1), ("2024-03", 1)]
+    assert [group["day"] for group in snapshot.transaction_report("day", to_date=date(2024, 1, 31))] == [
+        "2024-01-05", "2024-01-20"
+    ]
+    assert list(snapshot.table("clients")["Name"]) == ["Ana Garcia", "Ben Tan"]
+    # A single partition is served straight from the memory map.
+    march = snapshot.transactions(from_date=date(2024, 3, 1), to_date=date(2024, 3, 31))
+    assert isinstance(march["Client_ID"], np.memmap)
+
+
+def test_incremental_dump(conn, tmp_path):
+    snapshots.dump(conn, str(tmp_path), today=date(2024, 7, 15), echo=lambda line: None)
+    conn.insert((6, 1, 1, "2.00", date(2024, 1, 31)), (7, 2, 1, "3.00", date(2024, 7, 1)))
+    conn.conn.execute("UPDATE Transactions SET Transaction_Amount = '9.50' WHERE Transaction_ID = 5")
+    conn.conn.commit()
+
+    manifest = snapshots.dump(conn, str(tmp_path), today=date(2024, 7, 20), echo=lambda line: None)
+
+    partitions = manifest["transactions"]["partitions"]
+    # January was closed: the back-dated row is a second part; June was open
+    # and was re-read; March was not touched.
+    assert partitions["2024-01"] == [{"part": "r000001", "rows": 3}, {"part": "r000002", "rows": 1}]
+    assert partitions["2024-03"] == [{"part": "r000001", "rows": 1}]
+    assert partitions["2024-06"] == [{"part": "r000002", "rows": 1}]
+    assert partitions["2024-07"] == [{"part": "r000002", "rows": 1}]
+    assert not os.path.exists(tmp_path / "transactions" / "2024-06" / "r000001")
+    assert not os.path.exists(tmp_path / "clients" / "r000001")
+
+    report = snapshots.Snapshot(str(tmp_path)).transaction_report("product")
+    assert [(group["product_ID"], group["total_Amount"]) for group in report] == [
+        (1, Decimal("162.25")), (2, Decimal("19.60"))
+    ]
+
+
+def test_incremental_dump_finds_low_ids(conn, tmp_path):
+    # IDs are chosen by the caller, so a back-dated insert can have an ID
+    # below everything copied so far.
+    conn.insert((100, 1, 1, "1.00", date(2024, 7, 2)))
+    snapshots.dump(conn, str(tmp_path), today=date(2024, 7, 15), echo=lambda line: None)
+    conn.insert((50, 2, 2, "4.00", date(2024, 3, 10)))
+
+    manifest = snapshots.dump(conn, str(tmp_path), today=date(2024, 7, 15), echo=lambda line: None)
+
+    assert manifest["transactions"]["partitions"]["2024-03"] == [
+        {"part": "r000001", "rows": 1}, {"part": "r000002", "rows": 1}
+    ]
+    ids = snapshots.Snapshot(str(tmp_path)).transactions(columns=["Transaction_ID"])["Transaction_ID"]
+    assert sorted(ids.tolist()) == [1, 2, 3, 4, 5, 50, 100]
+
+
+def test_incremental_dump_settles_late_commits(conn, tmp_path):
+    conn.insert((6, 1, 1, "2.00", date(2024, 1, 31)))
+    snapshots.dump(conn, str(tmp_path), today=date(2024, 7, 15), echo=lambda line: None)
+    # Claimed its ID before the last run's watermark but committed after
+    # that run read the table.
+    conn.insert((7, 2, 1, "3.00", date(2024, 1, 2)), inserted_at=conn.clock - timedelta(minutes=5))
+
+    manifest = snapshots.dump(conn, str(tmp_path), today=date(2024, 7, 15), echo=lambda line: None)
+
+    # Row 6 is inside the settle window too but January already holds it.
+    assert manifest["transactions"]["partitions"]["2024-01"] == [
+        {"part": "r000001", "rows": 4}, {"part": "r000002", "rows": 1}
+    ]
+    ids = snapshots.Snapshot(str(tmp_path)).transactions(columns=["Transaction_ID"])["Transaction_ID"]
+    assert sorted(ids.tolist()) == [1, 2, 3, 4, 5, 6, 7]
+
+
+def test_old_manifest_starts_over(conn, tmp_path):
+    snapshots.dump(conn, str(tmp_path), today=date(2024, 7, 15), echo=lambda line: None)
+    manifest = snapshots.load_manifest(str(tmp_path))
+    manifest["transactions"]["watermark_id"] = manifest["transactions"].pop("watermark_at")
+    snapshots.save_manifest(str(tmp_path), manifest)
+
+    manifest = snapshots.dump(conn, str(tmp_path), today=date(2024, 7, 15), echo=lambda line: None)
+
+    assert manifest["transactions"]["partitions"]["2024-01"] == [{"part": "r000002", "rows": 3}]
+
+
+def test_frame(conn, tmp_path):
+    snapshots.dump(conn, str(tmp_path), today=date(2024, 7, 15), echo=lambda line: None)
+
+    frame = snapshots.Snapshot(str(tmp_path)).frame(columns=["Client_ID", "Transaction_Amount_Cents"])
+
+    assert frame.groupby("Client_ID")["Transaction_Amount_Cents"].sum().to_dict() == {1: 11710, 2: 5175}
+
+
+def test_group_totals_dense_and_sorted_agree():
+    rng = np.random.default_rng(1)
+    keys = rng.integers(0, 50, 1000)
+    amounts = rng.integers(-500, 500, 1000)
+
+    dense = snapshots.group_totals(keys, amounts)
+    sparse = snapshots.group_totals(keys * 10_000_000, amounts)
+
+    assert np.array_equal(dense[0] * 10_000_000, sparse[0])
+    for expected, actual in zip(dense[1:], sparse[1:]):
+        assert np.array_equal(expected, actual)
+
+
+def test_report_pages_merge_parts(conn, tmp_path, monkeypatch):
+    snapshots.dump(conn, str(tmp_path), today=date(2024, 7, 15), echo=lambda line: None)
+    conn.insert((6, 3, 1, "2.00", date(2024, 1, 31)), (7, 1, 2, "3.00", date(2024, 3, 2)))
+    snapshots.dump(conn, str(tmp_path), today=date(2024, 7, 20), echo=lambda line: None)
+    snapshot = snapshots.Snapshot(str(tmp_path))
+    full = snapshot.transaction_report("client")
+    # Pages never copy the parts into one array.
+    monkeypatch.setattr(snapshots, "concatenate", None)
+
+    first = snapshot.transaction_report("client", limit=2)
+    rest = snapshot.transaction_report("client", after=first[-1]["client_ID"], limit=2)
+
+    assert first + rest == full
+    assert [group["client_ID"] for group in full] == [1, 2, 3]
+    assert full[0]["transaction_Count"] == 4
+    months = snapshot.transaction_report("month", after=date(2024, 1, 1))
+    assert [group["month"] for group in months] == ["2024-03", "2024-06"]
+
+
+def test_missing_snapshot(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        snapshots.Snapshot(str(tmp_path))